@@ -0,0 +1,67 @@
+"""
+Benchmark for the monitored address index: exact set vs Bloom filter.
+
+Reports memory per million addresses, lookups per second and the measured
+false-positive rate, to choose MONITOR_FILTER_MODE / MONITOR_FILTER_FP_RATE.
+
+    python bench_address_filter.py --count 1000000 --fp-rate 0.001
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from services.address_filter import BloomFilter
+
+
+def random_keys(count):
+    return [os.urandom(20) for _ in range(count)]
+
+
+def measure(build, keys, probes):
+    tracemalloc.start()
+    structure = build(keys)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    hits = sum(1 for key in probes if key in structure)
+    elapsed = time.perf_counter() - started
+    return memory, len(probes) / elapsed, hits
+
+
+def build_bloom(fp_rate):
+    def build(keys):
+        bloom = BloomFilter(len(keys), fp_rate)
+        bloom.update(keys)
+        return bloom
+    return build
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000, help="monitored addresses")
+    parser.add_argument("--probes", type=int, default=200_000, help="lookups of unmonitored addresses")
+    parser.add_argument("--fp-rate", type=float, default=0.001, help="Bloom filter false-positive rate")
+    args = parser.parse_args()
+
+    keys = random_keys(args.count)
+    probes = random_keys(args.probes)
+    per_million = 1_000_000 / args.count
+
+    print(f"{args.count} monitored addresses, {args.probes} lookups of unmonitored addresses")
+    structures = (
+        # The exact index holds its own copy of every key, so build it from copies
+        ("exact set", lambda keys: {bytes(bytearray(key)) for key in keys}),
+        (f"bloom p={args.fp_rate}", build_bloom(args.fp_rate)),
+    )
+    for name, build in structures:
+        memory, rate, hits = measure(build, keys, probes)
+        print(
+            f"{name:>16}: {memory * per_million / 2**20:8.1f} MiB per million addresses, "
+            f"{rate:12,.0f} lookups/s, false positives {hits / len(probes):.4%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
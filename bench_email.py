@@ -0,0 +1,157 @@
+"""
+Benchmark for email delivery: a new SMTP connection per email vs the SMTP pool.
+
+Starts a local stub SMTP server (asyncio, speaking just enough SMTP for smtplib:
+EHLO, AUTH PLAIN, MAIL/RCPT/DATA, NOOP, RSET, QUIT; --rtt delays every reply to mimic
+a remote server) and reports messages per second for:
+- per-connection: connect, login, send one message and quit for every email (the
+  previous send_email_notification), OUTBOX_CONCURRENCY emails at a time from a thread pool
+- pooled: queue_email_notification, which batches concurrent emails (SMTP_BATCH_SIZE)
+  over the pooled connections of services.smtp_pool (SMTP_POOL_SIZE)
+
+The stub doesn't do STARTTLS, so SMTP_STARTTLS is off here; against a real server the
+pooled path also skips a TLS handshake per email. No database is used.
+
+    python bench_email.py --emails 1000 --concurrency 8 --rtt 0.005
+"""
+import argparse
+import asyncio
+import base64
+import os
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class StubSMTPServer:
+    """Accepts every message; counts them"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.messages = 0
+        self.connections = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+
+        async def reply(line: str):
+            if self.rtt:
+                await asyncio.sleep(self.rtt)
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        await reply("220 stub ESMTP")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip().upper()
+                if command.startswith(("EHLO", "HELO")):
+                    await reply("250-stub\r\n250-AUTH PLAIN\r\n250 8BITMIME")
+                elif command.startswith("AUTH PLAIN"):
+                    base64.b64decode(command.split()[-1])
+                    await reply("235 2.7.0 Authentication successful")
+                elif command.startswith("DATA"):
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b""):
+                        pass
+                    self.messages += 1
+                    await reply("250 2.0.0 OK")
+                elif command.startswith("QUIT"):
+                    await reply("221 Bye")
+                    break
+                else:  # MAIL, RCPT, NOOP, RSET
+                    await reply("250 OK")
+        finally:
+            writer.close()
+
+
+def synthetic_events(count):
+    # Lazy import: the SMTP settings are read from the environment set in main()
+    from models import TxHistory
+    return [
+        TxHistory(
+            tx_hash=f"0xe3a1{i:060x}",
+            from_address="0x00000000000000000000000000000000000000B1",
+            to_address="0x00000000000000000000000000000000000000A1",
+            token_symbol="ETH",
+            amount=1.0,
+            chain="sepolia",
+            status="success",
+            created_at=datetime.utcnow(),
+        )
+        for i in range(count)
+    ]
+
+
+def _send_with_new_connection(tx):
+    """The previous path: connect, login, send, quit"""
+    from services import notification
+    msg = notification._email_message(tx, tx.to_address, "user@example.com")
+    server = smtplib.SMTP(os.environ["SMTP_HOST"], int(os.environ["SMTP_PORT"]))
+    server.login(os.environ["SMTP_USER"], os.environ["SMTP_PASSWORD"])
+    server.send_message(msg)
+    server.quit()
+    return True
+
+
+async def bench_per_connection(events, concurrency):
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = await asyncio.gather(*(loop.run_in_executor(executor, _send_with_new_connection, tx) for tx in events))
+    return sum(results) / (time.perf_counter() - started)
+
+
+async def bench_pooled(events, concurrency):
+    from services import notification
+    # The outbox dispatcher lets a batch's worth of emails wait per send slot
+    semaphore = asyncio.Semaphore(concurrency * notification.SMTP_BATCH_SIZE)
+
+    async def send(tx):
+        async with semaphore:
+            return await notification.queue_email_notification(tx, tx.to_address, "user@example.com")
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(send(tx) for tx in events))
+    return sum(bool(result) for result in results) / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=1000, help="emails per run")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("OUTBOX_CONCURRENCY", "8")), help="sends in flight")
+    parser.add_argument("--rtt", type=float, default=0.0, help="stub server delay per reply, in seconds")
+    parser.add_argument("--port", type=int, default=8025, help="stub server port")
+    args = parser.parse_args()
+
+    os.environ.update(
+        SMTP_HOST="127.0.0.1",
+        SMTP_PORT=str(args.port),
+        SMTP_USER="bench",
+        SMTP_PASSWORD="bench",
+        SMTP_FROM_EMAIL="bench@example.com",
+        SMTP_STARTTLS="false",
+    )
+    from services import smtp_pool
+
+    stub = StubSMTPServer(args.rtt)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", args.port)
+    try:
+        events = synthetic_events(args.emails)
+        unpooled = await bench_per_connection(events, args.concurrency)
+        connections = stub.connections
+        pooled = await bench_pooled(events, args.concurrency)
+        print(f"{'per-connection':>14}: {unpooled:10,.0f} msgs/s ({connections} connections)")
+        print(f"{'pooled':>14}: {pooled:10,.0f} msgs/s ({stub.connections - connections} connections; "
+              f"{args.emails} emails, concurrency {args.concurrency}, rtt {args.rtt * 1000:.0f}ms)")
+    finally:
+        await asyncio.to_thread(smtp_pool.get_pool().close)
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
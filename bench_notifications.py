@@ -0,0 +1,120 @@
+"""
+Benchmark for webhook delivery: requests.post per event vs the shared async client.
+
+Starts a local stub webhook server (aiohttp, optional --delay per request to mimic a
+remote endpoint) and reports events per second for:
+- requests: one requests.post per event with no session (the previous delivery path,
+  a new connection each time), OUTBOX_CONCURRENCY events at a time from a thread pool
+- pooled: send_webhook_notification over services.http_client (keep-alive connections
+  from one per-host pool), OUTBOX_CONCURRENCY events at a time on the event loop
+
+The stub speaks plain HTTP on localhost, so the saved handshake is TCP only; against
+a real HTTPS endpoint (--url) the pooled path also skips DNS and the TLS handshake.
+No database is used: the events are built in memory.
+
+    python bench_notifications.py --events 2000 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from aiohttp import web
+
+from models import TxHistory
+from services import http_client, notification
+
+
+def synthetic_events(count):
+    return [
+        TxHistory(
+            tx_hash=f"0xbe0c{i:060x}",
+            from_address="0x00000000000000000000000000000000000000B1",
+            to_address="0x00000000000000000000000000000000000000A1",
+            token_symbol="ETH",
+            amount=1.0,
+            chain="sepolia",
+            status="success",
+            created_at=datetime.utcnow(),
+        )
+        for i in range(count)
+    ]
+
+
+async def start_stub(port, delay):
+    received = {"count": 0}
+
+    async def handle(request):
+        await request.read()
+        received["count"] += 1
+        if delay:
+            await asyncio.sleep(delay)
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_post("/notify", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, received
+
+
+def _post_without_session(url, tx):
+    """The previous path: requests.post with no session"""
+    payload = {"event": "transaction_success", "transaction": {"tx_hash": tx.tx_hash, "amount": tx.amount}}
+    response = requests.post(url, json=payload, headers={"Content-Type": "application/json"}, timeout=10)
+    return response.status_code == 200
+
+
+async def bench_requests(url, events, concurrency):
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = await asyncio.gather(*(loop.run_in_executor(executor, _post_without_session, url, tx) for tx in events))
+    return sum(results) / (time.perf_counter() - started)
+
+
+async def bench_pooled(events, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(tx):
+        async with semaphore:
+            return await notification.send_webhook_notification(tx, tx.to_address)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(send(tx) for tx in events))
+    return sum(results) / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000, help="events per run")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("OUTBOX_CONCURRENCY", "8")), help="events in flight")
+    parser.add_argument("--delay", type=float, default=0.0, help="stub server latency per request, in seconds")
+    parser.add_argument("--port", type=int, default=8099, help="stub server port")
+    parser.add_argument("--url", help="webhook URL to benchmark instead of the local stub")
+    args = parser.parse_args()
+
+    runner = None
+    url = args.url
+    if not url:
+        runner, _ = await start_stub(args.port, args.delay)
+        url = f"http://127.0.0.1:{args.port}/notify"
+    notification.WEBHOOK_URL = url
+    try:
+        events = synthetic_events(args.events)
+        unpooled = await bench_requests(url, events, args.concurrency)
+        pooled = await bench_pooled(events, args.concurrency)
+        print(f"{'requests.post':>14}: {unpooled:10,.0f} events/s")
+        print(f"{'pooled async':>14}: {pooled:10,.0f} events/s ({args.events} events, concurrency {args.concurrency})")
+    finally:
+        await http_client.close()
+        if runner is not None:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
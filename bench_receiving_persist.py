@@ -0,0 +1,88 @@
+"""
+Benchmark for recording detected deposits: one transaction per transfer vs bulk.
+
+Runs a synthetic backfill against the configured database (DB_* / INSTANCE_CONNECTION_NAME)
+and reports rows per second for:
+- per transfer: detect_incoming_transaction, i.e. existence SELECT + INSERT + commit each
+- bulk: record_incoming_transfers, one IN (...) check and one multi-row
+  INSERT ... ON CONFLICT DO NOTHING RETURNING per chunk, one commit per chunk
+
+The synthetic rows (tx_hash prefixed 0xbe0c) are deleted afterwards. Notifications
+are disabled for the run.
+
+    python bench_receiving_persist.py --count 10000 --chunk 500
+"""
+import argparse
+import os
+import time
+
+os.environ["ENABLE_NOTIFICATIONS"] = "false"
+
+from database import SessionLocal
+from models import TxHistory
+from services.receiving import detect_incoming_transaction, record_incoming_transfers
+
+TX_HASH_PREFIX = "0xbe0c"
+RECIPIENT = "0x00000000000000000000000000000000000000A1"
+SENDER = "0x00000000000000000000000000000000000000B1"
+INSO = "0x724c5ECcB208992747E30ea6BB5E558F8bF770d5"
+
+
+def synthetic_transfers(count, offset):
+    return [
+        {
+            "tx_hash": f"{TX_HASH_PREFIX}{offset + i:060x}",
+            "from_address": SENDER,
+            "to_address": RECIPIENT,
+            "value": 10 ** 18,
+            "block_number": 1_000_000 + (offset + i) // 10,
+            # Every other deposit is an INSO transfer (metadata from TOKEN_CONFIG)
+            "token_address": INSO if i % 2 else None,
+        }
+        for i in range(count)
+    ]
+
+
+def bench_per_transfer(db, transfers):
+    started = time.perf_counter()
+    for transfer in transfers:
+        detect_incoming_transaction(db=db, chain="sepolia", **transfer)
+    return len(transfers) / (time.perf_counter() - started)
+
+
+def bench_bulk(db, transfers, chunk):
+    started = time.perf_counter()
+    for start in range(0, len(transfers), chunk):
+        record_incoming_transfers(db, "sepolia", transfers[start:start + chunk])
+    return len(transfers) / (time.perf_counter() - started)
+
+
+def cleanup(db):
+    db.query(TxHistory).filter(TxHistory.tx_hash.like(f"{TX_HASH_PREFIX}%")).delete(synchronize_session=False)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=10_000, help="transfers in the bulk backfill")
+    parser.add_argument("--per-transfer-count", type=int, default=1_000, help="transfers recorded one by one")
+    parser.add_argument("--chunk", type=int, default=500, help="transfers per bulk chunk (a block or backfill chunk)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        cleanup(db)
+        per_transfer = bench_per_transfer(db, synthetic_transfers(args.per_transfer_count, 0))
+        bulk = bench_bulk(db, synthetic_transfers(args.count, args.per_transfer_count), args.chunk)
+        # Re-running a range only finds existing rows
+        rerun = bench_bulk(db, synthetic_transfers(args.count, args.per_transfer_count), args.chunk)
+        print(f"{'per transfer':>16}: {per_transfer:10,.0f} rows/s ({args.per_transfer_count} transfers)")
+        print(f"{'bulk':>16}: {bulk:10,.0f} rows/s ({args.count} transfers, {args.chunk} per chunk)")
+        print(f"{'bulk, existing':>16}: {rerun:10,.0f} rows/s")
+    finally:
+        cleanup(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
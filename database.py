@@ -43,4 +43,27 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def add_missing_columns(bind, metadata):
+    """
+    create_all() only creates missing tables. Add the columns that were added to
+    existing models since their table was created (as nullable columns), plus their indexes.
+    """
+    inspector = sqlalchemy.inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            added = set()
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(sqlalchemy.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                added.add(column.name)
+            for index in table.indexes:
+                if added & {column.name for column in index.columns}:
+                    index.create(conn, checkfirst=True)
@@ -1,23 +1,25 @@
 from fastapi import FastAPI, Request, status, Depends
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from routers import evm, common, swap, receiving, xrp
+from routers import evm, common, swap, receiving, xrp, admin, notifications
 from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 from services.networks import evm as evm_service
+from services import pending_index, backfill, outbox
+from services.scheduler import add_leader_job, leader
 from database import get_db, engine
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from dotenv import load_dotenv
+import asyncio
 import os
 
 load_dotenv()
 
 scheduler = BackgroundScheduler()
 
-def scheduled_task():
+def scheduled_task(deadline=None):
     print("Task executed")
-    evm_service.update_transaction_status()
+    evm_service.update_transaction_status(deadline=deadline)
 # Base.metadata.create_all(bind=engine)
 app = FastAPI(title="Non-Custodial Wallet API")
 
@@ -48,6 +50,8 @@ app.include_router(swap.router, prefix="/swap", tags=["Swap"])
 app.include_router(common.router, prefix="/common", tags=["Common"])
 app.include_router(receiving.router, prefix="/receiving", tags=["Receiving"])
 app.include_router(xrp.router, prefix="/xrp", tags=["XRP"])
+app.include_router(notifications.router, prefix="/notifications", tags=["Notifications"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 @app.get("/")
 def root():
@@ -97,12 +101,45 @@ def warmup():
 
 @app.on_event("startup")
 async def startup_event():
-    # Schedule tasks to run at specific intervals
-    scheduler.add_job(
+    # With a separate worker (python -m worker) the API process stays request-only
+    if os.getenv("RUN_BACKGROUND_JOBS", "true").lower() != "true":
+        return
+    # Schedule tasks to run at specific intervals.
+    # Status polling runs only on the instance holding the scheduler leader lock.
+    status_period = int(os.getenv("TRANSACTION_STATUS_UPDATE_PERIOD_SECONDS", "30"))
+    add_leader_job(
+        scheduler,
         scheduled_task,
-        # trigger=CronTrigger.from_crontab("*/5 * * * *"),  # Every 5 minutes
-        trigger=IntervalTrigger(seconds=int(os.getenv("TRANSACTION_STATUS_UPDATE_PERIOD_SECONDS", "30"))),
-        id="scheduled_task",
-        replace_existing=True,
+        seconds=status_period,
+        job_id="scheduled_task",
+        budget_seconds=float(os.getenv("TRANSACTION_STATUS_UPDATE_BUDGET_SECONDS", str(status_period * 0.8))),
     )
-    scheduler.start()
\ No newline at end of file
+    # Keep the block watcher's in-memory pending tx index in sync with the DB
+    try:
+        pending_index.load_pending_hashes()
+    except Exception as e:
+        print(f"Failed to load pending tx index: {str(e)}")
+    # The index is per process, so every instance re-syncs its own copy
+    add_leader_job(
+        scheduler,
+        pending_index.resync_pending_hashes,
+        seconds=int(os.getenv("PENDING_INDEX_RESYNC_SECONDS", "300")),
+        job_id="resync_pending_index",
+        leader_only=False,
+    )
+    # Restart address check jobs whose process stopped mid-scan
+    add_leader_job(
+        scheduler,
+        backfill.resume_stale_jobs,
+        seconds=int(os.getenv("BACKFILL_RESUME_PERIOD_SECONDS", "60")),
+        job_id="resume_backfill_jobs",
+    )
+    scheduler.start()
+    # Send the notifications enqueued in the outbox
+    asyncio.create_task(outbox.run_dispatcher())
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+    leader.release()
\ No newline at end of file
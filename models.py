@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Float, DateTime, Integer
+from sqlalchemy import Column, String, Float, DateTime, Integer, BigInteger, Boolean, UniqueConstraint
 from datetime import datetime
-from database import Base, engine
+from database import Base, engine, add_missing_columns
 
 class TokenBalance(Base):
     __tablename__ = "token_balances"
@@ -25,8 +25,16 @@ class TxHistory(Base):
     amount = Column(Float)
     tx_hash = Column(String, unique=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    status = Column(String, index=True)
+    status = Column(String, index=True)                       # pending -> included -> success / failed (mempool deposits: incoming -> success / dropped)
     chain = Column(String)
+    block_number = Column(Integer, index=True, nullable=True)  # block the tx was included in
+    block_hash = Column(String, nullable=True)
+    confirmed_at = Column(DateTime, nullable=True)            # set once CONFIRMATION_DEPTH is reached
+    gas_used = Column(BigInteger, nullable=True)              # receipt-derived fields, recorded once on inclusion
+    effective_gas_price = Column(BigInteger, nullable=True)   # wei
+    block_timestamp = Column(DateTime, nullable=True)
+    received_amount = Column(Float, nullable=True)            # amount actually received, decoded from Transfer logs
+    seen_pending_at = Column(DateTime, nullable=True)         # incoming deposit first seen in the mempool (see services/mempool.py)
     
 class SwapHistory(Base):
     __tablename__ = "swap_histories"
@@ -38,7 +46,126 @@ class SwapHistory(Base):
     from_amount = Column(Float, default=0.0)
     to_amount = Column(Float, default=0.0)
     created_at = Column(DateTime, default=datetime.now)
-    status = Column(String, index=True)
+    status = Column(String, index=True)                       # pending -> included -> success / failed
+    block_number = Column(Integer, index=True, nullable=True)
+    block_hash = Column(String, nullable=True)
+    confirmed_at = Column(DateTime, nullable=True)
+    gas_used = Column(BigInteger, nullable=True)
+    effective_gas_price = Column(BigInteger, nullable=True)
+    block_timestamp = Column(DateTime, nullable=True)
+    actual_to_amount = Column(Float, nullable=True)
     
+class MonitoredAddress(Base):
+    __tablename__ = "monitored_addresses"
+    __table_args__ = (UniqueConstraint("address", "chain", name="uq_monitored_address_chain"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    address = Column(String, index=True)                      # lowercase 0x-prefixed
+    chain = Column(String, default="", index=True)            # "" = all chains
+    active = Column(Boolean, default=True)                    # removals are soft so watchers see them
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class ChainCursor(Base):
+    __tablename__ = "chain_cursors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    chain = Column(String, unique=True, index=True)
+    block_number = Column(Integer)                            # last fully processed block
+    block_hash = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class BackfillJob(Base):
+    __tablename__ = "backfill_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    address = Column(String, index=True)                      # checksum address being scanned
+    chain = Column(String)
+    from_block = Column(Integer)
+    to_block = Column(Integer)
+    scanned_through = Column(Integer, nullable=True)          # checkpoint: every block up to here is scanned
+    detected_count = Column(Integer, default=0)
+    status = Column(String, index=True, default="queued")     # queued, running, completed, failed
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+class WorkerLease(Base):
+    __tablename__ = "worker_leases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    worker_id = Column(String, unique=True, index=True)       # ingestion worker holding a share of the addresses
+    started_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, default=datetime.utcnow, index=True)  # lease expires WORKER_LEASE_TTL_SECONDS after this
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (UniqueConstraint("event_type", "tx_hash", name="uq_notification_outbox_event_tx"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String)                               # transaction_success, swap_success, payment_incoming
+    tx_hash = Column(String, index=True)                      # TxHistory / SwapHistory row the event is about
+    recipient_address = Column(String, nullable=True)
+    status = Column(String, index=True, default="pending")    # pending -> sending -> sent (out of attempts: moved to notification_dead_letters)
+    attempts = Column(Integer, default=0)
+    retry_channels = Column(String, nullable=True)            # comma-separated channels that failed and are retried (null: all)
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    claimed_at = Column(DateTime, nullable=True)              # when a dispatcher took it (status sending)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+class NotificationDeadLetter(Base):
+    __tablename__ = "notification_dead_letters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, index=True)
+    tx_hash = Column(String, index=True)
+    recipient_address = Column(String, nullable=True)
+    channels = Column(String, nullable=True)                  # channels that were never delivered (null: all)
+    attempts = Column(Integer)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime)                             # when the notification was first enqueued
+    dead_at = Column(DateTime, default=datetime.utcnow, index=True)
+    replayed_at = Column(DateTime, nullable=True, index=True) # set when an admin put it back in the outbox
+
+
+class NotificationContact(Base):
+    __tablename__ = "notification_contacts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    address = Column(String, unique=True, index=True)         # lowercase 0x-prefixed wallet address
+    email = Column(String, nullable=True)
+    phone = Column(String, nullable=True)
+    device_tokens = Column(String, nullable=True)             # comma-separated push device tokens
+    channels = Column(String, nullable=True)                  # comma-separated channels the user opted into (null: all)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class WebhookSubscription(Base):
+    __tablename__ = "webhook_subscriptions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String)                                     # partner the endpoint belongs to
+    url = Column(String)
+    secret = Column(String)                                   # HMAC-SHA256 signing secret
+    chains = Column(String, nullable=True)                    # comma-separated chain filter (null: all chains)
+    event_types = Column(String, nullable=True)               # comma-separated event filter (null: all events)
+    max_concurrency = Column(Integer, nullable=True)          # requests in flight to this endpoint (null: WEBHOOK_SUBSCRIBER_CONCURRENCY)
+    active = Column(Boolean, default=True)                    # removals are soft so every instance's index sees them
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+class WebhookSubscriptionAddress(Base):
+    __tablename__ = "webhook_subscription_addresses"
+    __table_args__ = (UniqueConstraint("subscription_id", "address", name="uq_webhook_subscription_address"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    subscription_id = Column(Integer, index=True)
+    address = Column(String, index=True)                      # lowercase 0x-prefixed; a subscription without rows gets every address
+
 
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, Base.metadata)
@@ -0,0 +1,228 @@
+from fastapi import APIRouter, Depends, HTTPException, Header
+from sqlalchemy.orm import Session
+from database import get_db
+from schemas.admin import ReplayDeadLettersRequest, WebhookSubscriptionRequest
+from services import outbox, webhook_subscriptions
+from web3 import Web3
+from typing import Optional
+import secrets
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+
+
+def require_admin_key(x_admin_key: Optional[str] = Header(None)):
+    """Admin endpoints need the X-Admin-Key header to match ADMIN_API_KEY"""
+    if not ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=503,
+            detail="Admin API is disabled (ADMIN_API_KEY is not set)"
+        )
+    if not x_admin_key or not secrets.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid admin key"
+        )
+
+
+router = APIRouter(dependencies=[Depends(require_admin_key)])
+
+
+@router.get("/notifications/dead-letters")
+def list_dead_letters(event_type: Optional[str] = None, include_replayed: bool = False, limit: int = 100, db: Session = Depends(get_db)):
+    """
+    Notifications that ran out of delivery attempts, most recent first.
+    """
+    try:
+        letters = outbox.get_dead_letters(db, event_type, include_replayed, min(limit, 1000))
+        return {
+            "count": len(letters),
+            "dead_letters": [
+                {
+                    "id": letter.id,
+                    "event_type": letter.event_type,
+                    "tx_hash": letter.tx_hash,
+                    "recipient_address": letter.recipient_address,
+                    "channels": letter.channels.split(",") if letter.channels else None,
+                    "attempts": letter.attempts,
+                    "last_error": letter.last_error,
+                    "created_at": letter.created_at.isoformat() if letter.created_at else None,
+                    "dead_at": letter.dead_at.isoformat() if letter.dead_at else None,
+                    "replayed_at": letter.replayed_at.isoformat() if letter.replayed_at else None
+                }
+                for letter in letters
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Error listing dead letters: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error listing dead letters: {str(e)}"
+        )
+
+
+@router.post("/notifications/dead-letters/replay")
+def replay_dead_letters(req: ReplayDeadLettersRequest, db: Session = Depends(get_db)):
+    """
+    Put dead-lettered notifications back in the outbox; the dispatcher sends them
+    as new notifications, on the channels that never delivered.
+    """
+    try:
+        replayed = outbox.replay_dead_letters(db, req.ids, req.event_type, req.limit)
+        return {
+            "message": f"{replayed} notification(s) queued for delivery",
+            "replayed": replayed
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error replaying dead letters: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error replaying dead letters: {str(e)}"
+        )
+
+
+def _validate_subscription(req: WebhookSubscriptionRequest):
+    if not req.url.startswith(("http://", "https://")):
+        raise HTTPException(
+            status_code=400,
+            detail="Webhook URL must be http(s)"
+        )
+    invalid = [address for address in req.addresses or [] if not Web3.is_address(address)]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid address format: {', '.join(invalid[:5])}"
+        )
+    unknown = set(req.event_types or []) - set(outbox.EVENTS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown event type(s): {', '.join(sorted(unknown))}; expected {', '.join(outbox.EVENTS)}"
+        )
+    if req.max_concurrency is not None and req.max_concurrency < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="max_concurrency must be at least 1"
+        )
+
+
+def _subscription_response(db: Session, subscription):
+    return {
+        "id": subscription.id,
+        "name": subscription.name,
+        "url": subscription.url,
+        "addresses": [Web3.to_checksum_address(address) for address in webhook_subscriptions.subscription_addresses(db, subscription.id)],
+        "chains": subscription.chains.split(",") if subscription.chains is not None else None,
+        "event_types": subscription.event_types.split(",") if subscription.event_types is not None else None,
+        "max_concurrency": subscription.max_concurrency or webhook_subscriptions.WEBHOOK_SUBSCRIBER_CONCURRENCY,
+        "created_at": subscription.created_at.isoformat() if subscription.created_at else None,
+        "updated_at": subscription.updated_at.isoformat() if subscription.updated_at else None
+    }
+
+
+@router.post("/webhooks", status_code=201)
+def create_webhook_subscription(req: WebhookSubscriptionRequest, db: Session = Depends(get_db)):
+    """
+    Subscribe a partner endpoint to the events of its addresses (all addresses
+    without a filter). The signing secret is only returned here.
+    """
+    try:
+        _validate_subscription(req)
+        secret = req.secret or secrets.token_hex(32)
+        subscription = webhook_subscriptions.save_subscription(
+            db, None, req.name, req.url, secret, req.addresses, req.chains, req.event_types, req.max_concurrency
+        )
+        return {
+            **_subscription_response(db, subscription),
+            "secret": secret
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error creating webhook subscription: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error creating webhook subscription: {str(e)}"
+        )
+
+
+@router.get("/webhooks")
+def list_webhook_subscriptions(db: Session = Depends(get_db)):
+    """
+    Active webhook subscriptions.
+    """
+    try:
+        subscriptions = webhook_subscriptions.list_subscriptions(db)
+        return {
+            "count": len(subscriptions),
+            "subscriptions": [_subscription_response(db, subscription) for subscription in subscriptions]
+        }
+    except Exception as e:
+        logger.error(f"Error listing webhook subscriptions: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error listing webhook subscriptions: {str(e)}"
+        )
+
+
+@router.put("/webhooks/{subscription_id}")
+def update_webhook_subscription(subscription_id: int, req: WebhookSubscriptionRequest, db: Session = Depends(get_db)):
+    """
+    Replace a subscription's endpoint, filters and limits. The secret is kept
+    unless a new one is given.
+    """
+    try:
+        _validate_subscription(req)
+        subscription = webhook_subscriptions.get_subscription(db, subscription_id)
+        if subscription is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Webhook subscription not found"
+            )
+        subscription = webhook_subscriptions.save_subscription(
+            db, subscription, req.name, req.url, req.secret or subscription.secret,
+            req.addresses, req.chains, req.event_types, req.max_concurrency
+        )
+        return _subscription_response(db, subscription)
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error updating webhook subscription {subscription_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error updating webhook subscription: {str(e)}"
+        )
+
+
+@router.delete("/webhooks/{subscription_id}")
+def delete_webhook_subscription(subscription_id: int, db: Session = Depends(get_db)):
+    """
+    Stop sending events to a subscription.
+    """
+    try:
+        subscription = webhook_subscriptions.get_subscription(db, subscription_id)
+        if subscription is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Webhook subscription not found"
+            )
+        webhook_subscriptions.remove_subscription(db, subscription)
+        return {
+            "message": "Webhook subscription removed",
+            "id": subscription_id
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error removing webhook subscription {subscription_id}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error removing webhook subscription: {str(e)}"
+        )
@@ -0,0 +1,115 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from database import get_db
+from routers.admin import require_admin_key
+from schemas.notifications import ContactRequest
+from services import contacts
+from web3 import Web3
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(dependencies=[Depends(require_admin_key)])
+
+
+def _contact_response(address: str, contact: contacts.Contact):
+    return {
+        "address": Web3.to_checksum_address(address),
+        "email": contact.email,
+        "phone": contact.phone,
+        "device_tokens": list(contact.device_tokens),
+        "channels": sorted(contact.channels) if contact.channels is not None else None
+    }
+
+
+@router.put("/contacts/{address}")
+def set_contact(address: str, req: ContactRequest, db: Session = Depends(get_db)):
+    """
+    Set where an address's email, SMS and push notifications go, and which of
+    those channels it wants. Replaces the previous details.
+    """
+    try:
+        if not Web3.is_address(address):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid address format"
+            )
+        unknown = set(req.channels or []) - set(contacts.USER_CHANNELS)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown channel(s): {', '.join(sorted(unknown))}; expected {', '.join(contacts.USER_CHANNELS)}"
+            )
+        contacts.upsert_contact(db, address, req.email, req.phone, req.device_tokens, req.channels)
+        return {
+            "message": "Contact details saved",
+            **_contact_response(address, contacts.get_contact(db, address))
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error saving contact for {address}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error saving contact: {str(e)}"
+        )
+
+
+@router.get("/contacts/{address}")
+def get_contact(address: str, db: Session = Depends(get_db)):
+    """
+    Contact details of an address.
+    """
+    try:
+        if not Web3.is_address(address):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid address format"
+            )
+        contact = contacts.get_contact(db, address)
+        if contact is None:
+            raise HTTPException(
+                status_code=404,
+                detail="No contact details for this address"
+            )
+        return _contact_response(address, contact)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting contact for {address}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error getting contact: {str(e)}"
+        )
+
+
+@router.delete("/contacts/{address}")
+def delete_contact(address: str, db: Session = Depends(get_db)):
+    """
+    Remove an address's contact details; it then only gets webhook notifications.
+    """
+    try:
+        if not Web3.is_address(address):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid address format"
+            )
+        if not contacts.delete_contact(db, address):
+            raise HTTPException(
+                status_code=404,
+                detail="No contact details for this address"
+            )
+        return {
+            "message": "Contact details removed",
+            "address": address
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error deleting contact for {address}: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error deleting contact: {str(e)}"
+        )
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from database import get_db
-from services.receiving import check_address_for_incoming, get_monitored_addresses, detect_incoming_transaction
+from services.receiving import check_address_for_incoming, get_monitored_addresses, detect_incoming_transaction, add_monitored_address as monitor_address, remove_monitored_address
 from schemas.receiving import MonitorAddressRequest, CheckAddressRequest, IncomingTransactionResponse
 from services.networks.evm import _get_w3
-from models import TxHistory
+from models import TxHistory, BackfillJob
+from services import backfill
 from web3 import Web3
 from typing import Optional
 import logging
@@ -18,8 +19,7 @@ router = APIRouter()
 def add_monitored_address(req: MonitorAddressRequest, db: Session = Depends(get_db)):
     """
     Add an address to monitor for incoming transactions.
-    Note: Currently uses existing transaction history. 
-    For production, consider adding a dedicated MonitoredAddress table.
+    The block watchers pick it up on their next block.
     """
     try:
         # Validate address format
@@ -30,13 +30,11 @@ def add_monitored_address(req: MonitorAddressRequest, db: Session = Depends(get_
                 detail="Invalid address format"
             )
         
-        # Address will be automatically monitored if it appears in transaction history
-        # For now, we just return success
-        # In production, you'd add it to a MonitoredAddress table here
+        monitored = monitor_address(db, req.address, req.chain)
         return {
             "message": "Address will be monitored for incoming transactions",
-            "address": Web3.to_checksum_address(req.address),
-            "chain": req.chain or "all chains"
+            "address": Web3.to_checksum_address(monitored.address),
+            "chain": monitored.chain or "all chains"
         }
     except HTTPException:
         raise
@@ -49,15 +47,23 @@ def add_monitored_address(req: MonitorAddressRequest, db: Session = Depends(get_
 
 
 @router.get("/monitor")
-def get_monitored_addresses_list(db: Session = Depends(get_db)):
+def get_monitored_addresses_list(chain: Optional[str] = None, db: Session = Depends(get_db)):
     """
     Get list of addresses currently being monitored.
     """
     try:
-        addresses = get_monitored_addresses(db)
+        monitored = get_monitored_addresses(db, chain)
         return {
-            "monitored_addresses": addresses,
-            "count": len(addresses)
+            "monitored_addresses": [Web3.to_checksum_address(m.address) for m in monitored],
+            "count": len(monitored),
+            "details": [
+                {
+                    "address": Web3.to_checksum_address(m.address),
+                    "chain": m.chain or "all chains",
+                    "created_at": m.created_at.isoformat() if m.created_at else None
+                }
+                for m in monitored
+            ]
         }
     except Exception as e:
         logger.error(f"Error getting monitored addresses: {str(e)}")
@@ -67,11 +73,38 @@ def get_monitored_addresses_list(db: Session = Depends(get_db)):
         )
 
 
-@router.post("/check")
+@router.delete("/monitor/{address}")
+def delete_monitored_address(address: str, chain: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Stop monitoring an address (on one chain, or the all-chains entry if no chain is given).
+    """
+    try:
+        if not remove_monitored_address(db, address, chain):
+            raise HTTPException(
+                status_code=404,
+                detail="Address is not monitored"
+            )
+        return {
+            "message": "Address is no longer monitored",
+            "address": address,
+            "chain": chain or "all chains"
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error removing monitored address: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error removing monitored address: {str(e)}"
+        )
+
+
+@router.post("/check", status_code=202)
 def check_incoming_transactions(req: CheckAddressRequest, db: Session = Depends(get_db)):
     """
-    Manually check an address for incoming transactions.
-    Useful for initial sync or manual checks.
+    Start a background scan of an address for incoming transactions.
+    Useful for initial sync or manual checks. Returns a job id right away;
+    progress and results are at GET /check/{job_id}.
     """
     try:
         # Validate address
@@ -82,20 +115,43 @@ def check_incoming_transactions(req: CheckAddressRequest, db: Session = Depends(
                 detail="Invalid address format"
             )
         
-        address_checksum = Web3.to_checksum_address(req.address)
-        
-        # Check for incoming transactions
-        detected = check_address_for_incoming(
+        job = check_address_for_incoming(
             db=db,
-            address=address_checksum,
+            address=req.address,
             chain=req.chain,
             from_block=req.from_block
         )
-        
+        return _job_response(job)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error checking incoming transactions: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error checking incoming transactions: {str(e)}"
+        )
+
+
+@router.get("/check/{job_id}")
+def get_check_progress(job_id: int, db: Session = Depends(get_db)):
+    """
+    Progress of an address check, with the incoming transactions found so far.
+    """
+    try:
+        job = backfill.get_job(db, job_id)
+        if job is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Check job not found"
+            )
+        detected = backfill.get_job_transactions(db, job)
         return {
-            "address": address_checksum,
-            "chain": req.chain,
-            "detected_count": len(detected),
+            **_job_response(job),
             "transactions": [
                 {
                     "tx_hash": tx.tx_hash,
@@ -104,6 +160,7 @@ def check_incoming_transactions(req: CheckAddressRequest, db: Session = Depends(
                     "amount": tx.amount,
                     "token_symbol": tx.token_symbol,
                     "status": tx.status,
+                    "block_number": tx.block_number,
                     "created_at": tx.created_at.isoformat() if tx.created_at else None
                 }
                 for tx in detected
@@ -112,13 +169,32 @@ def check_incoming_transactions(req: CheckAddressRequest, db: Session = Depends(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error checking incoming transactions: {str(e)}")
+        logger.error(f"Error getting check job {job_id}: {str(e)}")
         raise HTTPException(
             status_code=500,
-            detail=f"Error checking incoming transactions: {str(e)}"
+            detail=f"Error getting check job: {str(e)}"
         )
 
 
+def _job_response(job: BackfillJob):
+    total = job.to_block - job.from_block + 1
+    scanned = 0 if job.scanned_through is None else job.scanned_through - job.from_block + 1
+    return {
+        "job_id": job.id,
+        "address": job.address,
+        "chain": job.chain,
+        "status": job.status,
+        "from_block": job.from_block,
+        "to_block": job.to_block,
+        "scanned_through": job.scanned_through,
+        "progress": round(scanned / total * 100, 1) if total > 0 else 100.0,
+        "detected_count": job.detected_count,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "completed_at": job.completed_at.isoformat() if job.completed_at else None
+    }
+
+
 @router.get("/incoming/{address}")
 def get_incoming_transactions(address: str, chain: Optional[str] = None, db: Session = Depends(get_db)):
     """
@@ -147,8 +223,10 @@ def get_incoming_transactions(address: str, chain: Optional[str] = None, db: Ses
                     "amount": tx.amount,
                     "token_symbol": tx.token_symbol,
                     "status": tx.status,
+                    "block_number": tx.block_number,
                     "chain": tx.chain,
-                    "created_at": tx.created_at.isoformat() if tx.created_at else None
+                    "created_at": tx.created_at.isoformat() if tx.created_at else None,
+                    "seen_pending_at": tx.seen_pending_at.isoformat() if tx.seen_pending_at else None
                 }
                 for tx in transactions
             ]
@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+class ReplayDeadLettersRequest(BaseModel):
+    ids: Optional[List[int]] = None  # Dead letters to replay, or None for all not yet replayed
+    event_type: Optional[str] = None  # Only replay this event type
+    limit: int = 1000  # Max dead letters replayed per request
+
+class WebhookSubscriptionRequest(BaseModel):
+    name: str  # Partner the endpoint belongs to
+    url: str  # Endpoint events are POSTed to
+    secret: Optional[str] = None  # HMAC signing secret; generated when not given
+    addresses: Optional[List[str]] = None  # Addresses to follow, or None for every address
+    chains: Optional[List[str]] = None  # Chains to follow, or None for every chain
+    event_types: Optional[List[str]] = None  # transaction_success, payment_incoming, swap_success; None for all
+    max_concurrency: Optional[int] = None  # Requests in flight to the endpoint (default WEBHOOK_SUBSCRIBER_CONCURRENCY)
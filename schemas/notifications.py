@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Optional, List
+
+class ContactRequest(BaseModel):
+    email: Optional[str] = None  # Email notifications go here
+    phone: Optional[str] = None  # SMS notifications go here (E.164, e.g. +1234567890)
+    device_tokens: Optional[List[str]] = None  # Push notification device tokens
+    channels: Optional[List[str]] = None  # Channels to notify on (email, sms, push), or None for all
@@ -0,0 +1,243 @@
+"""
+Monitored address index - in-memory sets of 20-byte address keys per chain.
+
+Loaded from the monitored_addresses table and kept up to date incrementally:
+each refresh only reads rows whose updated_at is past the last seen watermark
+(removals are soft, active=False, so they show up the same way). Membership
+checks on the block path are O(1) set lookups with no database access.
+
+With MONITOR_FILTER_MODE=bloom the exact sets are replaced by one Bloom filter per
+chain (see services.address_filter), for watch lists too large to keep in memory.
+Lookups then answer "maybe", and hits are confirmed per block with a batched
+IN (...) query (confirm_monitored). Additions go straight into the filter; a
+removal, or a filter grown past its capacity, rebuilds the filters from the table.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from models import MonitoredAddress, TxHistory
+from database import SessionLocal
+from services.address_filter import BloomFilter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALL_CHAINS = ""
+# Re-read rows this far behind the watermark, in case instances' clocks disagree
+REFRESH_LAG_SECONDS = int(os.getenv("MONITORED_ADDRESS_REFRESH_LAG_SECONDS", "60"))
+
+# "exact" (in-memory sets) or "bloom" (probabilistic filter + DB confirmation)
+MONITOR_FILTER_MODE = os.getenv("MONITOR_FILTER_MODE", "exact").lower()
+MONITOR_FILTER_FP_RATE = float(os.getenv("MONITOR_FILTER_FP_RATE", "0.001"))
+# Minimum number of addresses each chain's filter is sized for
+MONITOR_FILTER_CAPACITY = int(os.getenv("MONITOR_FILTER_CAPACITY", "100000"))
+# Addresses per IN (...) query when confirming filter hits
+CONFIRM_BATCH_SIZE = 500
+
+_lock = threading.Lock()
+_keys: Dict[str, Set[bytes]] = {}
+_filters: Dict[str, BloomFilter] = {}
+_watermark: Optional[datetime] = None
+_rebuilt_through: Optional[datetime] = None  # bloom mode: removals up to here are already reflected
+
+
+def normalize_address(address: str) -> str:
+    """Lowercase 0x-prefixed form used for storage"""
+    address = str(address).lower()
+    return address if address.startswith("0x") else f"0x{address}"
+
+
+def address_key(address) -> Optional[bytes]:
+    """20-byte key of an address (str, or a 32-byte indexed topic); None if it isn't one"""
+    if address is None:
+        return None
+    if isinstance(address, (bytes, bytearray)):
+        raw = bytes(address)
+        return raw[-20:] if len(raw) >= 20 else None
+    try:
+        raw = bytes.fromhex(str(address)[2:] if str(address).startswith(("0x", "0X")) else str(address))
+    except ValueError:
+        return None
+    return raw[-20:] if len(raw) >= 20 else None
+
+
+def seed_from_history(db: Session) -> int:
+    """
+    One-time migration: monitor every recipient in tx_histories (what the receiving
+    module watched before the table existed), on all chains.
+    """
+    addresses = {
+        normalize_address(address) for (address,) in db.query(TxHistory.to_address).distinct() if address
+    }
+    db.add_all(MonitoredAddress(address=address, chain=ALL_CHAINS) for address in addresses)
+    db.commit()
+    logger.info(f"Seeded {len(addresses)} monitored address(es) from transaction history")
+    return len(addresses)
+
+
+def refresh(db: Session = None) -> int:
+    """
+    Apply the monitored_addresses rows changed since the last refresh.
+
+    Args:
+        db: Database session (a new one is opened if not provided)
+
+    Returns:
+        Number of rows applied
+    """
+    global _watermark, _rebuilt_through
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        if _watermark is None and db.query(func.count(MonitoredAddress.id)).scalar() == 0:
+            seed_from_history(db)
+        if _watermark is None and MONITOR_FILTER_MODE == "bloom":
+            # First load: stream the table into the filters instead of reading every row at once
+            watermark = db.query(func.max(MonitoredAddress.updated_at)).scalar() or datetime(1970, 1, 1)
+            rebuild_filters(db)
+            with _lock:
+                _watermark = _rebuilt_through = watermark
+            return monitored_count()
+        query = db.query(MonitoredAddress.address, MonitoredAddress.chain, MonitoredAddress.active, MonitoredAddress.updated_at)
+        if _watermark is not None:
+            # Overlap with the previous refresh; re-applying a row is harmless
+            query = query.filter(MonitoredAddress.updated_at >= _watermark - timedelta(seconds=REFRESH_LAG_SECONDS))
+        rows = query.all()
+    finally:
+        if own_session:
+            db.close()
+
+    rebuild = False
+    with _lock:
+        for address, chain, active, updated_at in rows:
+            key = address_key(address)
+            if key is None:
+                continue
+            chain = chain or ALL_CHAINS
+            if MONITOR_FILTER_MODE == "bloom":
+                # Overlapping refreshes re-apply rows; don't count them twice
+                if active and key not in _filter_for(chain):
+                    _filters[chain].add(key)
+                elif not active and (_rebuilt_through is None or updated_at > _rebuilt_through):
+                    rebuild = True
+            elif active:
+                _keys.setdefault(chain, set()).add(key)
+            else:
+                _keys.get(chain, set()).discard(key)
+            if updated_at and (_watermark is None or updated_at > _watermark):
+                _watermark = updated_at
+        if _watermark is None:
+            _watermark = datetime(1970, 1, 1)
+        rebuild = rebuild or any(f.full for f in _filters.values())
+    if rebuild:
+        rebuild_filters()
+        with _lock:
+            _rebuilt_through = _watermark
+    return len(rows)
+
+
+def _filter_for(chain: str) -> BloomFilter:
+    if chain not in _filters:
+        _filters[chain] = BloomFilter(MONITOR_FILTER_CAPACITY, MONITOR_FILTER_FP_RATE)
+    return _filters[chain]
+
+
+def rebuild_filters(db: Session = None) -> None:
+    """Rebuild every chain's Bloom filter from the active rows, sized for twice the current count"""
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        counts = dict(
+            db.query(MonitoredAddress.chain, func.count(MonitoredAddress.id))
+            .filter(MonitoredAddress.active.is_(True))
+            .group_by(MonitoredAddress.chain)
+        )
+        filters = {
+            chain or ALL_CHAINS: BloomFilter(max(MONITOR_FILTER_CAPACITY, count * 2), MONITOR_FILTER_FP_RATE)
+            for chain, count in counts.items()
+        }
+        rows = db.query(MonitoredAddress.address, MonitoredAddress.chain).filter(
+            MonitoredAddress.active.is_(True)
+        ).yield_per(10000)
+        for address, chain in rows:
+            key = address_key(address)
+            if key is not None:
+                filters[chain or ALL_CHAINS].add(key)
+    finally:
+        if own_session:
+            db.close()
+    with _lock:
+        _filters.clear()
+        _filters.update(filters)
+    logger.info(f"Rebuilt monitored address filters: {sum(counts.values())} address(es)")
+
+
+def _chain_names(chain: str) -> Set[str]:
+    # Lazy import to avoid circular dependency
+    from services.pending_index import sibling_chains
+    return sibling_chains(chain) | {ALL_CHAINS}
+
+
+def _chain_sets(chain: str):
+    """Sets (or filters, in bloom mode) that apply to a chain"""
+    source = _filters if MONITOR_FILTER_MODE == "bloom" else _keys
+    return [source[name] for name in _chain_names(chain) if source.get(name)]
+
+
+def is_monitored(chain: str, address) -> bool:
+    """
+    Whether an address (str, bytes or indexed topic) is monitored on a chain (or its siblings).
+    In bloom mode a True may be a false positive; see confirm_monitored.
+    """
+    key = address_key(address)
+    if key is None:
+        return False
+    with _lock:
+        return any(key in keys for keys in _chain_sets(chain))
+
+
+def confirm_monitored(db: Session, chain: str, addresses: Iterable) -> Set[bytes]:
+    """
+    Keys of the given addresses that are really monitored on a chain.
+    Exact mode answers from memory; bloom mode checks the filter hits against the
+    table with batched IN (...) queries.
+    """
+    candidates = {key for key in (address_key(address) for address in addresses) if key is not None}
+    candidates = {key for key in candidates if is_monitored(chain, key)}
+    if MONITOR_FILTER_MODE != "bloom" or not candidates:
+        return candidates
+    chains = list(_chain_names(chain))
+    candidate_addresses = ["0x" + key.hex() for key in candidates]
+    confirmed = set()
+    for start in range(0, len(candidate_addresses), CONFIRM_BATCH_SIZE):
+        rows = db.query(MonitoredAddress.address).filter(
+            MonitoredAddress.address.in_(candidate_addresses[start:start + CONFIRM_BATCH_SIZE]),
+            MonitoredAddress.chain.in_(chains),
+            MonitoredAddress.active.is_(True)
+        )
+        confirmed |= {address_key(address) for (address,) in rows}
+    return confirmed
+
+
+def monitored_keys(chain: str) -> Optional[Set[bytes]]:
+    """Keys monitored on a chain (or its siblings); None in bloom mode, where they aren't held"""
+    if MONITOR_FILTER_MODE == "bloom":
+        return None
+    with _lock:
+        return set().union(*_chain_sets(chain))
+
+
+def has_addresses(chain: str) -> bool:
+    """Whether anything is monitored on a chain"""
+    with _lock:
+        return bool(_chain_sets(chain))
+
+
+def monitored_count() -> int:
+    with _lock:
+        return sum(len(keys) for keys in (_filters if MONITOR_FILTER_MODE == "bloom" else _keys).values())
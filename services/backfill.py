@@ -0,0 +1,283 @@
+"""
+Backfill engine - historical scans of an address for incoming transactions.
+
+A scan is a BackfillJob row. The block range is split into chunks of
+BACKFILL_CHUNK_BLOCKS that are scanned concurrently (BACKFILL_CONCURRENCY threads):
+native transfers from the chunk's full blocks, fetched with batched
+eth_getBlockByNumber requests, and ERC20 transfers from one eth_getLogs Transfer
+query per chunk (see services.token_transfers). All RPC calls of a chain go
+through a shared rate limiter (BACKFILL_RPC_PER_SECOND).
+
+Chunk results are recorded in block order, and the job's scanned_through
+checkpoint moves after each one, so an interrupted scan resumes where it stopped.
+Jobs that stop making progress (e.g. their process exited) are picked up again
+by resume_stale_jobs, which runs on the scheduler leader.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, update
+from models import BackfillJob, TxHistory
+from database import SessionLocal
+from services.token_transfers import get_transfer_logs
+from services.confirmation import _to_int
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_BLOCKS = int(os.getenv("BACKFILL_CHUNK_BLOCKS", "100"))
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+# Blocks per eth_getBlockByNumber batch (full blocks can be large)
+BACKFILL_BATCH_BLOCKS = int(os.getenv("BACKFILL_BATCH_BLOCKS", "10"))
+# RPC calls per second per chain, shared by every running scan
+BACKFILL_RPC_PER_SECOND = float(os.getenv("BACKFILL_RPC_PER_SECOND", "20"))
+# Largest range one job may scan
+BACKFILL_MAX_BLOCKS = int(os.getenv("BACKFILL_MAX_BLOCKS", "100000"))
+# Attempts per chunk before the job fails
+BACKFILL_CHUNK_ATTEMPTS = int(os.getenv("BACKFILL_CHUNK_ATTEMPTS", "3"))
+# A running job without progress for this long is considered abandoned and resumed
+BACKFILL_STALE_SECONDS = int(os.getenv("BACKFILL_STALE_SECONDS", "300"))
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` calls per second, shared between threads"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, count: int = 1) -> None:
+        """Block until `count` calls are allowed"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # A batch larger than the bucket may go once the bucket is full
+                if self.tokens >= min(count, self.rate):
+                    self.tokens -= count
+                    return
+                wait = (min(count, self.rate) - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, count: int = 1) -> bool:
+        """Take `count` calls if they are allowed right now, without waiting"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < count:
+                return False
+            self.tokens -= count
+            return True
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter(chain: str) -> RateLimiter:
+    with _limiters_lock:
+        if chain not in _limiters:
+            _limiters[chain] = RateLimiter(BACKFILL_RPC_PER_SECOND)
+        return _limiters[chain]
+
+
+def _fetch_blocks(w3, chain: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Full blocks [start, end] with batched eth_getBlockByNumber requests"""
+    blocks = []
+    for batch_start in range(start, end + 1, BACKFILL_BATCH_BLOCKS):
+        numbers = range(batch_start, min(batch_start + BACKFILL_BATCH_BLOCKS, end + 1))
+        _limiter(chain).acquire(len(numbers))
+        responses = w3.provider.make_batch_request(
+            [("eth_getBlockByNumber", [hex(number), True]) for number in numbers]
+        )
+        if not isinstance(responses, list):
+            raise ValueError(f"Batch block request failed: {responses.get('error')}")
+        for response in responses:
+            if response.get("error"):
+                raise ValueError(f"Block request failed: {response['error']}")
+            if response.get("result"):
+                blocks.append(response["result"])
+    return blocks
+
+
+def _scan_chunk(w3, chain: str, address: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """
+    Incoming transfers to `address` in blocks [start, end] (runs in a scan thread).
+
+    Returns:
+        detect_incoming_transaction arguments, in block order
+    """
+    # Lazy import to avoid circular dependency
+    from services.receiving import _topic_to_address
+
+    found = []
+    for block in _fetch_blocks(w3, chain, start, end):
+        for tx in block.get("transactions", []):
+            value = _to_int(tx.get("value")) or 0
+            if tx.get("to") and tx["to"].lower() == address.lower() and value > 0:
+                found.append({
+                    "tx_hash": tx["hash"],
+                    "from_address": tx.get("from"),
+                    "value": value,
+                    "block_number": _to_int(block["number"]),
+                    "block_hash": block.get("hash"),
+                    "token_address": None,
+                })
+    _limiter(chain).acquire()
+    for log in get_transfer_logs(w3, chain, start, end, recipients=[address]):
+        value = _to_int(log["data"]) if log["data"] != "0x" else 0
+        if value > 0:
+            found.append({
+                "tx_hash": log["transactionHash"],
+                "from_address": _topic_to_address(log["topics"][1]),
+                "value": value,
+                "block_number": log["blockNumber"],
+                "block_hash": log.get("blockHash"),
+                "token_address": log["address"],
+            })
+    return sorted(found, key=lambda transfer: transfer["block_number"])
+
+
+def _scan_chunk_with_retries(w3, chain: str, address: str, start: int, end: int) -> List[Dict[str, Any]]:
+    for attempt in range(BACKFILL_CHUNK_ATTEMPTS):
+        try:
+            return _scan_chunk(w3, chain, address, start, end)
+        except Exception as e:
+            if attempt == BACKFILL_CHUNK_ATTEMPTS - 1:
+                raise
+            logger.warning(f"Backfill of {chain} blocks {start}-{end} failed, retrying: {str(e)}")
+            time.sleep(2 ** attempt)
+
+
+def create_job(db: Session, address: str, chain: str, from_block: int, to_block: int) -> BackfillJob:
+    """Record a scan of blocks [from_block, to_block]; start it with start_job"""
+    job = BackfillJob(
+        address=address,
+        chain=chain,
+        from_block=from_block,
+        to_block=to_block,
+        detected_count=0,
+        status="queued",
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def run_job(job_id: int) -> None:
+    """Scan a job's remaining blocks, checkpointing after every chunk"""
+    # Lazy imports to avoid circular dependency
+    from services.networks.evm import _get_w3
+    from services.receiving import record_incoming_transfers
+
+    db = SessionLocal()
+    try:
+        job = db.query(BackfillJob).filter(BackfillJob.id == job_id).first()
+        if job is None or job.status in ("completed", "failed"):
+            return
+        job.status = "running"
+        db.commit()
+
+        w3 = _get_w3(job.chain)
+        chain, address = job.chain, job.address
+        start = job.from_block if job.scanned_through is None else job.scanned_through + 1
+        chunks = [
+            (chunk_start, min(chunk_start + BACKFILL_CHUNK_BLOCKS - 1, job.to_block))
+            for chunk_start in range(start, job.to_block + 1, BACKFILL_CHUNK_BLOCKS)
+        ]
+        logger.info(f"Backfill job {job_id}: scanning {address} on {chain}, blocks {start}-{job.to_block}")
+
+        executor = ThreadPoolExecutor(max_workers=BACKFILL_CONCURRENCY, thread_name_prefix=f"backfill-{job_id}")
+        try:
+            results = executor.map(
+                lambda chunk: _scan_chunk_with_retries(w3, chain, address, *chunk), chunks
+            )
+            # map() yields in chunk order, so the checkpoint only covers scanned prefixes.
+            # A chunk's rows, their notifications and its checkpoint are committed together.
+            for (_, chunk_end), transfers in zip(chunks, results):
+                recorded = record_incoming_transfers(
+                    db, chain, [dict(transfer, to_address=address) for transfer in transfers], commit=False
+                )
+                job.detected_count += len(recorded)
+                job.scanned_through = chunk_end
+                job.updated_at = datetime.utcnow()
+                db.commit()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        job.status = "completed"
+        job.completed_at = datetime.utcnow()
+        db.commit()
+        logger.info(f"Backfill job {job_id} completed: {job.detected_count} incoming transaction(s)")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Backfill job {job_id} failed: {str(e)}")
+        job = db.query(BackfillJob).filter(BackfillJob.id == job_id).first()
+        if job is not None:
+            job.status = "failed"
+            job.error = str(e)
+            db.commit()
+    finally:
+        db.close()
+
+
+def start_job(job_id: int) -> None:
+    """Run a job in a background thread"""
+    threading.Thread(target=run_job, args=(job_id,), name=f"backfill-{job_id}", daemon=True).start()
+
+
+def resume_stale_jobs() -> int:
+    """
+    Restart jobs that were queued or running but made no progress for
+    BACKFILL_STALE_SECONDS (their process stopped). Each job is claimed with a
+    conditional update, so only one instance resumes it.
+
+    Returns:
+        Number of jobs resumed
+    """
+    db = SessionLocal()
+    try:
+        stale_before = datetime.utcnow() - timedelta(seconds=BACKFILL_STALE_SECONDS)
+        stale = db.query(BackfillJob.id, BackfillJob.updated_at).filter(
+            BackfillJob.status.in_(["queued", "running"]),
+            or_(BackfillJob.updated_at.is_(None), BackfillJob.updated_at < stale_before)
+        ).all()
+        resumed = 0
+        for job_id, updated_at in stale:
+            claimed = db.execute(
+                update(BackfillJob)
+                .where(BackfillJob.id == job_id, BackfillJob.updated_at == updated_at)
+                .values(status="running", updated_at=datetime.utcnow())
+            ).rowcount
+            db.commit()
+            if claimed:
+                logger.info(f"Resuming backfill job {job_id}")
+                start_job(job_id)
+                resumed += 1
+        return resumed
+    finally:
+        db.close()
+
+
+def get_job(db: Session, job_id: int) -> Optional[BackfillJob]:
+    return db.query(BackfillJob).filter(BackfillJob.id == job_id).first()
+
+
+def get_job_transactions(db: Session, job: BackfillJob) -> List[TxHistory]:
+    """Incoming transactions recorded for the job's address in the blocks scanned so far"""
+    if job.scanned_through is None:
+        return []
+    return db.query(TxHistory).filter(
+        TxHistory.to_address == job.address,
+        TxHistory.chain == job.chain,
+        TxHistory.block_number.between(job.from_block, job.scanned_through)
+    ).order_by(TxHistory.block_number).all()
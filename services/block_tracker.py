@@ -0,0 +1,133 @@
+"""
+Block tracker - bounded ring buffer of recent block hashes per network.
+
+The ring is fed with every head the ingestion path sees. It detects reorgs
+(a known height with a new hash, or a head whose parent hash doesn't match the
+block we recorded below it) and lets status reads compute confirmations in memory.
+"""
+from collections import OrderedDict
+from typing import Dict, Optional
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of blocks a transaction needs before it is final (1 = final on inclusion)
+CONFIRMATION_DEPTH = max(1, int(os.getenv("CONFIRMATION_DEPTH", "12")))
+# Recent block hashes kept per network; always covers the confirmation window
+BLOCK_RING_SIZE = max(int(os.getenv("BLOCK_RING_SIZE", "128")), CONFIRMATION_DEPTH + 1)
+
+
+def normalize_hex(value) -> Optional[str]:
+    """Convert HexBytes/bytes/str to a lowercase 0x-prefixed hex string"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    value = str(value).lower()
+    return value if value.startswith("0x") else f"0x{value}"
+
+
+class BlockRing:
+    """Ring buffer of (block number -> block hash) for one network"""
+
+    def __init__(self, size: int = BLOCK_RING_SIZE):
+        self.size = size
+        self._hashes: "OrderedDict[int, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def head(self) -> Optional[int]:
+        """Highest block number seen"""
+        with self._lock:
+            return max(self._hashes) if self._hashes else None
+
+    def hash_at(self, block_number: int) -> Optional[str]:
+        """Recorded hash at a height, or None if it is outside the ring"""
+        with self._lock:
+            return self._hashes.get(block_number)
+
+    def observe(self, block_number: int, block_hash, parent_hash=None) -> Optional[int]:
+        """
+        Record a block.
+
+        Args:
+            block_number: Block number
+            block_hash: Block hash
+            parent_hash: Parent hash (enables detecting a reorg one block below)
+
+        Returns:
+            The lowest block number invalidated by a reorg, or None
+        """
+        block_hash = normalize_hex(block_hash)
+        parent_hash = normalize_hex(parent_hash)
+        reorg_from = None
+        with self._lock:
+            known = self._hashes.get(block_number)
+            if known is not None and known != block_hash:
+                reorg_from = block_number
+            parent_known = self._hashes.get(block_number - 1)
+            if parent_hash and parent_known is not None and parent_known != parent_hash:
+                reorg_from = block_number - 1
+
+            if reorg_from is not None:
+                for number in [n for n in self._hashes if n >= reorg_from]:
+                    del self._hashes[number]
+                if parent_hash and reorg_from == block_number - 1:
+                    self._hashes[block_number - 1] = parent_hash
+
+            self._hashes[block_number] = block_hash
+            for number in sorted(self._hashes):
+                if len(self._hashes) <= self.size:
+                    break
+                del self._hashes[number]
+
+        if reorg_from is not None:
+            logger.warning(f"Reorg detected at block {reorg_from} (new head {block_number} {block_hash})")
+        return reorg_from
+
+
+_rings: Dict[int, BlockRing] = {}
+_rings_lock = threading.Lock()
+
+
+def _network_key(chain: str) -> int:
+    """Chains sharing a chainId (sepolia/insoblok) share one ring"""
+    from services.networks.evm import NETWORK_CONFIGS
+    return NETWORK_CONFIGS[chain]["chainId"]
+
+
+def get_ring(chain: str) -> BlockRing:
+    """Get (or create) the ring of a chain's network"""
+    key = _network_key(chain)
+    with _rings_lock:
+        if key not in _rings:
+            _rings[key] = BlockRing()
+        return _rings[key]
+
+
+def observe_block(chain: str, block_number: int, block_hash, parent_hash=None) -> Optional[int]:
+    """Record a head for a chain; returns the reorg start block if one was detected"""
+    return get_ring(chain).observe(block_number, block_hash, parent_hash)
+
+
+def get_head(chain: str) -> Optional[int]:
+    """Latest block number seen for a chain, or None if nothing was observed yet"""
+    return get_ring(chain).head
+
+
+def get_confirmations(chain: str, block_number: Optional[int]) -> Optional[int]:
+    """
+    Confirmations of a block (1 = the head itself), computed in memory.
+    Returns None if the block or the chain head is unknown.
+    """
+    if block_number is None:
+        return None
+    try:
+        head = get_head(chain)
+    except KeyError:
+        return None
+    if head is None:
+        return None
+    return max(0, head - block_number + 1)
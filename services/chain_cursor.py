@@ -0,0 +1,30 @@
+"""
+Chain cursor - last fully processed block per chain.
+
+The cursor is written in the same transaction as the block's side effects, so a
+restart resumes right after the last block whose effects were committed.
+"""
+from sqlalchemy.orm import Session
+from models import ChainCursor
+from datetime import datetime
+from typing import Optional
+
+
+def get_cursor(db: Session, chain: str) -> Optional[ChainCursor]:
+    """Cursor of a chain, or None if nothing was processed yet"""
+    return db.query(ChainCursor).filter(ChainCursor.chain == chain).first()
+
+
+def set_cursor(db: Session, chain: str, block_number: int, block_hash: Optional[str]) -> ChainCursor:
+    """
+    Move a chain's cursor to a block. Not committed: the caller commits it
+    together with the block's side effects.
+    """
+    cursor = get_cursor(db, chain)
+    if cursor is None:
+        cursor = ChainCursor(chain=chain)
+        db.add(cursor)
+    cursor.block_number = block_number
+    cursor.block_hash = block_hash
+    cursor.updated_at = datetime.utcnow()
+    return cursor
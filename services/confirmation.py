@@ -0,0 +1,454 @@
+"""
+Confirmation engine - resolves pending TxHistory and SwapHistory rows from receipts.
+
+Receipts are fetched per block with a single eth_getBlockReceipts call, falling back
+to a batched eth_getTransactionReceipt request on nodes that don't support it. All
+pending rows found in a batch of receipts are resolved in one pass. (Incoming ERC20
+transfers are found with eth_getLogs instead, see services.token_transfers.)
+
+Status transitions are staged: pending -> included (receipt seen) -> success once the
+block is CONFIRMATION_DEPTH deep, with reorged blocks rolled back to pending.
+
+Receipts are handled as raw JSON-RPC results normalized into plain dicts
+(see _normalize_receipt), so the sync and async fetch paths share the same shape.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import update
+from models import TxHistory, SwapHistory
+from services.outbox import enqueue_notification
+from services import pending_index, block_tracker
+from services.block_tracker import normalize_hex
+from typing import Optional, Dict, Any, List, Iterable, Callable
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ERC20 Transfer(address,address,uint256) event signature
+TRANSFER_EVENT_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+# Max receipts requested in one JSON-RPC batch
+RECEIPT_BATCH_SIZE = 100
+
+# Chains whose node rejected eth_getBlockReceipts; we go straight to the fallback for them
+_block_receipts_unsupported = set()
+
+
+def _to_int(value) -> Optional[int]:
+    """Convert a hex quantity (or int) from a JSON-RPC result to int"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+def _normalize_receipt(receipt: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a raw (hex) or web3-formatted receipt into a plain dict"""
+    return {
+        "transactionHash": normalize_hex(receipt.get("transactionHash")),
+        "blockNumber": _to_int(receipt.get("blockNumber")),
+        "blockHash": normalize_hex(receipt.get("blockHash")),
+        "from": normalize_hex(receipt.get("from")),
+        "to": normalize_hex(receipt.get("to")),
+        "status": _to_int(receipt.get("status")),
+        "gasUsed": _to_int(receipt.get("gasUsed")),
+        "effectiveGasPrice": _to_int(receipt.get("effectiveGasPrice")),
+        "logs": [
+            {
+                "address": normalize_hex(log.get("address")),
+                "topics": [normalize_hex(topic) for topic in log.get("topics", [])],
+                "data": normalize_hex(log.get("data")) or "0x",
+                "logIndex": _to_int(log.get("logIndex")),
+                "transactionHash": normalize_hex(log.get("transactionHash") or receipt.get("transactionHash")),
+                "blockNumber": _to_int(log.get("blockNumber") or receipt.get("blockNumber")),
+            }
+            for log in receipt.get("logs", [])
+        ],
+    }
+
+
+def _is_unsupported_method(error: Dict[str, Any]) -> bool:
+    """Check whether a JSON-RPC error means the method isn't available on this node"""
+    message = str(error.get("message", "")).lower()
+    return error.get("code") == -32601 or any(
+        keyword in message for keyword in ["not supported", "does not exist", "not available", "method not found"]
+    )
+
+
+def _receipt_batches(tx_hashes: List[str]) -> List[List[tuple]]:
+    """Split receipt requests into JSON-RPC batches"""
+    requests = [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes]
+    return [requests[i:i + RECEIPT_BATCH_SIZE] for i in range(0, len(requests), RECEIPT_BATCH_SIZE)]
+
+
+def _collect_batch_results(responses) -> List[Dict[str, Any]]:
+    """Keep the non-null receipts from a batch response"""
+    if not isinstance(responses, list):
+        # A single error object means the whole batch was rejected
+        raise ValueError(f"Batch receipt request failed: {responses.get('error')}")
+    return [_normalize_receipt(r["result"]) for r in responses if r.get("result")]
+
+
+def fetch_receipts(w3, tx_hashes: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Fetch receipts for the given transactions with batched eth_getTransactionReceipt.
+    Transactions that aren't mined yet are simply absent from the result.
+
+    Args:
+        w3: Web3 instance (HTTP provider)
+        tx_hashes: Transaction hashes
+
+    Returns:
+        List of normalized receipts
+    """
+    tx_hashes = [normalize_hex(h) for h in tx_hashes]
+    receipts = []
+    for batch in _receipt_batches(tx_hashes):
+        receipts.extend(_collect_batch_results(w3.provider.make_batch_request(batch)))
+    return receipts
+
+
+async def async_fetch_receipts(w3, tx_hashes: Iterable[str]) -> List[Dict[str, Any]]:
+    """Async variant of fetch_receipts for AsyncWeb3 providers"""
+    tx_hashes = [normalize_hex(h) for h in tx_hashes]
+    receipts = []
+    for batch in _receipt_batches(tx_hashes):
+        receipts.extend(_collect_batch_results(await w3.provider.make_batch_request(batch)))
+    return receipts
+
+
+def fetch_block_receipts(w3, chain: str, block_number: int, tx_hashes: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch all receipts of a block with one eth_getBlockReceipts call.
+
+    Args:
+        w3: Web3 instance (HTTP provider)
+        chain: Chain name (used to remember nodes without eth_getBlockReceipts)
+        block_number: Block number
+        tx_hashes: Hashes to fetch individually if the method isn't supported
+                   (defaults to every transaction in the block)
+
+    Returns:
+        List of normalized receipts
+    """
+    if chain not in _block_receipts_unsupported:
+        response = w3.provider.make_request("eth_getBlockReceipts", [hex(block_number)])
+        if "error" not in response:
+            return [_normalize_receipt(r) for r in response.get("result") or []]
+        if not _is_unsupported_method(response["error"]):
+            raise ValueError(f"eth_getBlockReceipts failed for block {block_number}: {response['error']}")
+        logger.info(f"eth_getBlockReceipts not supported on {chain}, using batched receipt requests")
+        _block_receipts_unsupported.add(chain)
+
+    if tx_hashes is None:
+        tx_hashes = w3.eth.get_block(block_number)["transactions"]
+    return fetch_receipts(w3, tx_hashes)
+
+
+async def async_fetch_block_receipts(w3, chain: str, block_number: int, tx_hashes: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Async variant of fetch_block_receipts for AsyncWeb3 providers"""
+    if chain not in _block_receipts_unsupported:
+        response = await w3.provider.make_request("eth_getBlockReceipts", [hex(block_number)])
+        if "error" not in response:
+            return [_normalize_receipt(r) for r in response.get("result") or []]
+        if not _is_unsupported_method(response["error"]):
+            raise ValueError(f"eth_getBlockReceipts failed for block {block_number}: {response['error']}")
+        logger.info(f"eth_getBlockReceipts not supported on {chain}, using batched receipt requests")
+        _block_receipts_unsupported.add(chain)
+
+    if tx_hashes is None:
+        tx_hashes = (await w3.eth.get_block(block_number))["transactions"]
+    return await async_fetch_receipts(w3, tx_hashes)
+
+
+def fetch_block_timestamps(w3, block_numbers: Iterable[int]) -> Dict[int, int]:
+    """
+    Fetch the timestamps of several blocks with one batched eth_getBlockByNumber request
+    (headers only, no transactions).
+
+    Returns:
+        Dictionary of block number -> unix timestamp
+    """
+    block_numbers = sorted({n for n in block_numbers if n is not None})
+    if not block_numbers:
+        return {}
+    responses = w3.provider.make_batch_request([
+        ("eth_getBlockByNumber", [hex(n), False]) for n in block_numbers
+    ])
+    if not isinstance(responses, list):
+        raise ValueError(f"Batch block request failed: {responses.get('error')}")
+    return {
+        _to_int(r["result"]["number"]): _to_int(r["result"]["timestamp"])
+        for r in responses if r.get("result")
+    }
+
+
+def extract_transfer_logs(receipts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Get the ERC20 Transfer logs from successful receipts"""
+    return [
+        log
+        for receipt in receipts if receipt["status"] == 1
+        for log in receipt["logs"]
+        if len(log["topics"]) == 3 and log["topics"][0] == TRANSFER_EVENT_TOPIC
+    ]
+
+
+def _token_decimals(token_address: str) -> int:
+    """Decimals of a tracked token contract (from TOKEN_CONFIG), defaulting to 18"""
+    from services.swap import TOKEN_CONFIG
+    for chains in TOKEN_CONFIG.values():
+        for info in chains.values():
+            if info.get("token_address") and info["token_address"].lower() == token_address:
+                return info["decimals"]
+    return 18
+
+
+def _received_amount(receipt: Dict[str, Any], recipient: Optional[str]) -> Optional[float]:
+    """
+    Amount of tokens the recipient actually received in a receipt, decoded from its
+    Transfer logs. Returns None when the receipt has no Transfer to the recipient
+    (e.g. a native transfer, whose value isn't part of the receipt).
+    """
+    if not recipient:
+        return None
+    recipient_topic = "0x" + recipient.lower().replace("0x", "").rjust(64, "0")
+    amounts = [
+        int(log["data"], 16) / (10 ** _token_decimals(log["address"]))
+        for log in receipt["logs"]
+        if len(log["topics"]) == 3
+        and log["topics"][0] == TRANSFER_EVENT_TOPIC
+        and log["topics"][2] == recipient_topic
+        and log["data"] not in ("0x", None)
+    ]
+    return sum(amounts) if amounts else None
+
+
+def _record_receipt(row, receipt: Dict[str, Any], block_timestamps: Dict[int, int]) -> None:
+    """Copy the receipt-derived fields onto a TxHistory/SwapHistory row"""
+    row.block_number = receipt["blockNumber"]
+    row.block_hash = receipt["blockHash"]
+    row.gas_used = receipt["gasUsed"]
+    row.effective_gas_price = receipt["effectiveGasPrice"]
+    timestamp = block_timestamps.get(receipt["blockNumber"])
+    if timestamp is not None:
+        row.block_timestamp = datetime.utcfromtimestamp(timestamp)
+
+    succeeded = receipt["status"] == 1
+    if isinstance(row, TxHistory):
+        received = _received_amount(receipt, row.to_address)
+        row.received_amount = (received if received is not None else row.amount) if succeeded else 0.0
+    else:
+        received = _received_amount(receipt, row.address)
+        row.actual_to_amount = (received if received is not None else row.to_amount) if succeeded else 0.0
+
+
+def _swap_chain(swap: SwapHistory) -> str:
+    """Destination chain of a swap (lazy import to avoid circular dependency)"""
+    from services.swap import get_swap_chain
+    return get_swap_chain(swap.to_token_network)
+
+
+def _notify_success(db: Session, tx_rows: List[TxHistory], swap_rows: List[SwapHistory]) -> None:
+    """Enqueue the success notifications of rows reaching their final status, in the same transaction"""
+    for tx in tx_rows:
+        enqueue_notification(db, "transaction_success", tx.tx_hash, tx.to_address)
+    for swap in swap_rows:
+        enqueue_notification(db, "swap_success", swap.tx_hash, swap.address)
+
+
+def _reset_to_pending(rows: List) -> None:
+    """Move rows whose block was reorged out back to pending, dropping what the orphaned receipt recorded"""
+    for row in rows:
+        row.status = "pending"
+        row.block_number = None
+        row.block_hash = None
+        row.confirmed_at = None
+        row.block_timestamp = None
+        row.gas_used = None
+        row.effective_gas_price = None
+        if isinstance(row, TxHistory):
+            row.received_amount = None
+        else:
+            row.actual_to_amount = None
+
+
+def apply_receipts(db: Session, chain: str, receipts: List[Dict[str, Any]], block_timestamps: Optional[Dict[int, int]] = None) -> Dict[str, int]:
+    """
+    Resolve every pending TxHistory and SwapHistory row covered by the receipts in one pass.
+
+    Successful txs move to "included" and only become "success" once they are
+    CONFIRMATION_DEPTH blocks deep (see advance_confirmations). Reverted txs are
+    marked "failed" right away; their confirmed_at is set at the same depth.
+    The receipt-derived fields (block, gas, block timestamp, received amount) are
+    recorded on the row here, once, so status reads never go back to the chain.
+
+    Args:
+        db: Database session
+        chain: Chain the receipts come from
+        receipts: Normalized receipts (see fetch_block_receipts / fetch_receipts)
+        block_timestamps: Block number -> unix timestamp for the receipts' blocks
+
+    Returns:
+        Dictionary with the number of rows moved to each status
+    """
+    resolved = {"included": 0, "success": 0, "failed": 0}
+    receipts_by_hash = {r["transactionHash"]: r for r in receipts if r.get("transactionHash")}
+    if not receipts_by_hash:
+        return resolved
+
+    tx_rows = db.query(TxHistory).filter(
+        TxHistory.tx_hash.in_(list(receipts_by_hash)),
+        TxHistory.status == "pending"
+    ).all()
+    swap_rows = db.query(SwapHistory).filter(
+        SwapHistory.tx_hash.in_(list(receipts_by_hash)),
+        SwapHistory.status == "pending"
+    ).all()
+    if not tx_rows and not swap_rows:
+        return resolved
+
+    # With a depth of 1 a receipt is final as soon as it exists
+    final = block_tracker.CONFIRMATION_DEPTH <= 1
+    now = datetime.utcnow()
+    for row in tx_rows + swap_rows:
+        receipt = receipts_by_hash[row.tx_hash]
+        _record_receipt(row, receipt, block_timestamps or {})
+        if receipt["status"] == 1:
+            row.status = "success" if final else "included"
+        else:
+            row.status = "failed"
+        if final:
+            row.confirmed_at = now
+        resolved[row.status] += 1
+    if final:
+        _notify_success(
+            db,
+            [tx for tx in tx_rows if tx.status == "success"],
+            [swap for swap in swap_rows if swap.status == "success"]
+        )
+    resolved_hashes = [row.tx_hash for row in tx_rows + swap_rows]
+    db.commit()
+
+    for tx_hash in resolved_hashes:
+        pending_index.discard_pending_hash(tx_hash)
+
+    logger.info(f"Resolved pending transactions on {chain}: {resolved}")
+    return resolved
+
+
+def resolve_pending(db: Session, w3, chain: str, tx_hashes: Iterable[str]) -> Dict[str, int]:
+    """
+    Look up receipts (and their block timestamps) for pending txs and apply them.
+    Used by the read paths and the polling fallback, outside the block watcher.
+    """
+    receipts = fetch_receipts(w3, tx_hashes)
+    if not receipts:
+        return {"included": 0, "success": 0, "failed": 0}
+    block_timestamps = fetch_block_timestamps(w3, [r["blockNumber"] for r in receipts])
+    return apply_receipts(db, chain, receipts, block_timestamps)
+
+
+def _unconfirmed_rows(db: Session, chain: str, *conditions):
+    """Included/failed rows of a chain's network that aren't confirmed yet"""
+    chains = pending_index.sibling_chains(chain)
+    tx_rows = db.query(TxHistory).filter(
+        TxHistory.chain.in_(list(chains)),
+        TxHistory.status.in_(["included", "failed"]),
+        TxHistory.confirmed_at.is_(None),
+        TxHistory.block_number.isnot(None),
+        *[condition(TxHistory) for condition in conditions]
+    ).all()
+    swap_rows = [
+        swap for swap in db.query(SwapHistory).filter(
+            SwapHistory.status.in_(["included", "failed"]),
+            SwapHistory.confirmed_at.is_(None),
+            SwapHistory.block_number.isnot(None),
+            *[condition(SwapHistory) for condition in conditions]
+        ).all()
+        if _swap_chain(swap) in chains
+    ]
+    return tx_rows, swap_rows
+
+
+def rollback_reorged(db: Session, chain: str, from_block: int) -> int:
+    """
+    Move unconfirmed rows included at or above `from_block` back to pending after a reorg.
+
+    Returns:
+        Number of rows rolled back
+    """
+    tx_rows, swap_rows = _unconfirmed_rows(db, chain, lambda model: model.block_number >= from_block)
+    if not tx_rows and not swap_rows:
+        return 0
+    _reset_to_pending(tx_rows + swap_rows)
+    requeue = [(tx.chain, tx.tx_hash) for tx in tx_rows] + [(_swap_chain(swap), swap.tx_hash) for swap in swap_rows]
+    db.commit()
+    for row_chain, tx_hash in requeue:
+        pending_index.add_pending_hash(row_chain, tx_hash)
+    logger.warning(f"Rolled back {len(requeue)} transaction(s) on {chain} after reorg at block {from_block}")
+    return len(requeue)
+
+
+def advance_confirmations(db: Session, chain: str, head_number: Optional[int], get_block_hash: Optional[Callable[[int], Any]] = None) -> Dict[str, int]:
+    """
+    Finalize rows that are CONFIRMATION_DEPTH blocks deep.
+
+    Each row's block hash is checked against the canonical hash (from the block ring,
+    or `get_block_hash` for heights outside it) before it is confirmed; rows whose
+    block was replaced go back to pending.
+
+    Args:
+        db: Database session
+        chain: Chain name
+        head_number: Current head block number
+        get_block_hash: Optional callable returning the canonical hash of a block number
+
+    Returns:
+        Dictionary with the number of rows confirmed and rolled back
+    """
+    result = {"confirmed": 0, "rolled_back": 0}
+    if head_number is None:
+        return result
+    threshold = head_number - block_tracker.CONFIRMATION_DEPTH + 1
+    tx_rows, swap_rows = _unconfirmed_rows(db, chain, lambda model: model.block_number <= threshold)
+    if not tx_rows and not swap_rows:
+        return result
+
+    ring = block_tracker.get_ring(chain)
+    canonical_hashes: Dict[int, Optional[str]] = {}
+
+    def canonical_hash(block_number: int) -> Optional[str]:
+        if block_number not in canonical_hashes:
+            block_hash = ring.hash_at(block_number)
+            if block_hash is None and get_block_hash is not None:
+                try:
+                    block_hash = normalize_hex(get_block_hash(block_number))
+                except Exception as e:
+                    logger.warning(f"Could not fetch hash of block {block_number} on {chain}: {str(e)}")
+            canonical_hashes[block_number] = block_hash
+        return canonical_hashes[block_number]
+
+    now = datetime.utcnow()
+    confirmed_txs, confirmed_swaps, reorged_txs, reorged_swaps = [], [], [], []
+    for rows, confirmed, reorged in ((tx_rows, confirmed_txs, reorged_txs), (swap_rows, confirmed_swaps, reorged_swaps)):
+        for row in rows:
+            block_hash = canonical_hash(row.block_number)
+            if block_hash is not None and block_hash != row.block_hash:
+                reorged.append(row)
+                continue
+            row.confirmed_at = now
+            if row.status == "included":
+                row.status = "success"
+                confirmed.append(row)
+
+    _reset_to_pending(reorged_txs + reorged_swaps)
+    _notify_success(db, confirmed_txs, confirmed_swaps)
+    requeue = [(tx.chain, tx.tx_hash) for tx in reorged_txs] + [(_swap_chain(swap), swap.tx_hash) for swap in reorged_swaps]
+    db.commit()
+    for row_chain, tx_hash in requeue:
+        pending_index.add_pending_hash(row_chain, tx_hash)
+
+    result = {"confirmed": len(tx_rows) + len(swap_rows) - len(requeue), "rolled_back": len(requeue)}
+    logger.info(f"Confirmation depth reached on {chain} (head {head_number}): {result}")
+    return result
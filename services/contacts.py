@@ -0,0 +1,158 @@
+"""
+Recipient contact directory - where email, SMS and push notifications for a wallet go.
+
+A notification_contacts row per wallet address holds its email, phone number, push
+device tokens and the channels the user opted into. Lookups go through an in-process
+LRU cache (CONTACT_CACHE_SIZE addresses, misses included), so the dispatcher resolves
+the contacts of a whole batch of events with at most one IN (...) query for the
+addresses it hasn't seen recently. Entries expire after CONTACT_CACHE_TTL_SECONDS,
+which bounds how long another instance's change takes to be seen here; changes made
+through this module drop the entry right away.
+"""
+from sqlalchemy.orm import Session
+from models import NotificationContact
+from services.address_index import normalize_address
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTACT_CACHE_SIZE = int(os.getenv("CONTACT_CACHE_SIZE", "10000"))
+CONTACT_CACHE_TTL_SECONDS = float(os.getenv("CONTACT_CACHE_TTL_SECONDS", "300"))
+
+# Channels a user can opt into; webhooks go to the integrator, not the user
+USER_CHANNELS = ("email", "sms", "push")
+
+
+class Contact(NamedTuple):
+    address: str
+    email: Optional[str]
+    phone: Optional[str]
+    device_tokens: Tuple[str, ...]
+    channels: Optional[FrozenSet[str]]  # None: every channel
+
+    def wants(self, channel: str) -> bool:
+        return self.channels is None or channel in self.channels
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _to_contact(row: NotificationContact) -> Contact:
+    return Contact(
+        address=row.address,
+        email=row.email,
+        phone=row.phone,
+        device_tokens=tuple(_split(row.device_tokens)),
+        channels=frozenset(_split(row.channels)) if row.channels is not None else None,
+    )
+
+
+class ContactCache:
+    """LRU of address -> Contact (or None: no contact), with a TTL per entry"""
+
+    def __init__(self, size: int = CONTACT_CACHE_SIZE, ttl: float = CONTACT_CACHE_TTL_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Optional[Contact]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, addresses: Iterable[str]) -> Tuple[Dict[str, Optional[Contact]], List[str]]:
+        """(cached contacts, addresses that aren't cached)"""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for address in addresses:
+                entry = self._entries.get(address)
+                if entry is None or entry[0] < now:
+                    missing.append(address)
+                    continue
+                self._entries.move_to_end(address)
+                found[address] = entry[1]
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, contacts: Dict[str, Optional[Contact]]) -> None:
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for address, contact in contacts.items():
+                self._entries[address] = (expires, contact)
+                self._entries.move_to_end(address)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, address: str) -> None:
+        with self._lock:
+            self._entries.pop(address, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_cache = ContactCache()
+
+
+def resolve_contacts(db: Session, addresses: Iterable[Optional[str]]) -> Dict[str, Optional[Contact]]:
+    """
+    Contacts of the given addresses (None for addresses without one), keyed by
+    normalized address; uncached addresses are loaded with one query.
+    """
+    wanted = {normalize_address(address) for address in addresses if address}
+    found, missing = _cache.get_many(wanted)
+    if missing:
+        loaded: Dict[str, Optional[Contact]] = dict.fromkeys(missing)
+        for row in db.query(NotificationContact).filter(NotificationContact.address.in_(missing)):
+            loaded[row.address] = _to_contact(row)
+        _cache.put_many(loaded)
+        found.update(loaded)
+    return found
+
+
+def get_contact(db: Session, address: str) -> Optional[Contact]:
+    return resolve_contacts(db, [address]).get(normalize_address(address))
+
+
+def upsert_contact(
+    db: Session,
+    address: str,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    device_tokens: Optional[List[str]] = None,
+    channels: Optional[List[str]] = None,
+) -> NotificationContact:
+    """Create or replace an address's contact details"""
+    address = normalize_address(address)
+    row = db.query(NotificationContact).filter(NotificationContact.address == address).first()
+    if row is None:
+        row = NotificationContact(address=address)
+        db.add(row)
+    row.email = email
+    row.phone = phone
+    row.device_tokens = ",".join(device_tokens) if device_tokens else None
+    row.channels = ",".join(channels) if channels is not None else None
+    db.commit()
+    db.refresh(row)
+    _cache.invalidate(address)
+    return row
+
+
+def delete_contact(db: Session, address: str) -> bool:
+    """Remove an address's contact details; returns False if it had none"""
+    address = normalize_address(address)
+    deleted = db.query(NotificationContact).filter(NotificationContact.address == address).delete()
+    db.commit()
+    _cache.invalidate(address)
+    return bool(deleted)
+
+
+def cache_stats() -> Dict[str, int]:
+    return _cache.stats()
@@ -0,0 +1,91 @@
+"""
+Shared async HTTP client for notification delivery (webhooks, push).
+
+One aiohttp ClientSession per event loop, created on first use: connections are
+pooled per host (HTTP_POOL_PER_HOST, HTTP_POOL_SIZE in total) and kept alive for
+HTTP_KEEPALIVE_SECONDS, so consecutive events to the same endpoint skip the DNS
+lookup and the TCP/TLS handshakes. DNS answers are cached for HTTP_DNS_TTL_SECONDS.
+How many requests run at once is bounded by the caller (OUTBOX_CONCURRENCY).
+"""
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+import aiohttp
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "16"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+HTTP_DNS_TTL_SECONDS = int(os.getenv("HTTP_DNS_TTL_SECONDS", "300"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+
+
+class Response(NamedTuple):
+    status: int
+    text: str
+    headers: Mapping[str, str]
+
+
+_sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+
+def get_session() -> aiohttp.ClientSession:
+    """The running loop's shared session (aiohttp sessions can't be used across loops)"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+            ttl_dns_cache=HTTP_DNS_TTL_SECONDS,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS),
+        )
+        _sessions[loop] = session
+    return session
+
+
+async def post_json(url: str, payload: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    POST a JSON body over the shared session.
+
+    Returns:
+        Response(status code, response body, response headers)
+    """
+    async with get_session().post(url, json=payload, headers=headers) as response:
+        return Response(response.status, await response.text(), response.headers)
+
+
+async def post_body(url: str, body: bytes, headers: Dict[str, str]) -> Response:
+    """POST a body that is already serialized (e.g. because it is signed)"""
+    async with get_session().post(url, data=body, headers=headers) as response:
+        return Response(response.status, await response.text(), response.headers)
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """The delay a Retry-After header asks for (seconds or an HTTP date), if any"""
+    value = (headers or {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+async def close() -> None:
+    """Close the running loop's session (on shutdown)"""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
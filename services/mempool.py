@@ -0,0 +1,175 @@
+"""
+Mempool watcher - early "payment incoming" signals for deposits still pending.
+
+For the chains in PENDING_WATCH_CHAINS the worker subscribes to the node's
+newPendingTransactions stream (a pending transaction filter when polling over HTTP).
+The stream only announces hashes, and fetching every pending body isn't affordable
+at mainnet rate, so:
+- hashes are sampled (PENDING_WATCH_SAMPLE_RATE), decided from the hash itself so
+  every worker samples the same transactions
+- body fetches are capped at PENDING_WATCH_MAX_FETCH_PER_SECOND per chain; sampled
+  hashes over the cap are skipped, not queued
+
+A fetched transaction is matched in memory against the monitored address index:
+a native transfer to a monitored address, or a transfer(to, amount) call on a
+tracked token contract. A match is recorded as a TxHistory row with status
+"incoming" and seen_pending_at, which sends one payment_incoming event
+(see services.receiving.record_pending_transfers). When the block watcher detects
+the deposit, the row is completed with the block's data and goes through the
+confirmation depth like any other deposit.
+Sightings not included within PENDING_WATCH_TTL_SECONDS become "dropped".
+"""
+from sqlalchemy.orm import Session
+from models import TxHistory
+from database import SessionLocal
+from services import address_index, sharding
+from services.backfill import RateLimiter
+from services.pending_index import _normalize_hash
+from services.token_transfers import tracked_token_contracts
+from web3 import Web3
+from hexbytes import HexBytes
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Chains whose mempool is watched (comma separated chain names; empty = off)
+PENDING_WATCH_CHAINS = [name.strip() for name in os.getenv("PENDING_WATCH_CHAINS", "").split(",") if name.strip()]
+# Fraction of the announced pending transactions whose body is fetched
+PENDING_WATCH_SAMPLE_RATE = float(os.getenv("PENDING_WATCH_SAMPLE_RATE", "1.0"))
+PENDING_WATCH_MAX_FETCH_PER_SECOND = float(os.getenv("PENDING_WATCH_MAX_FETCH_PER_SECOND", "20"))
+# Sightings still not included after this long are marked dropped
+PENDING_WATCH_TTL_SECONDS = int(os.getenv("PENDING_WATCH_TTL_SECONDS", "3600"))
+
+# Recently announced hashes remembered per chain (nodes re-announce transactions)
+SEEN_HASHES_SIZE = 10000
+# transfer(address,uint256)
+TRANSFER_SELECTOR = bytes.fromhex("a9059cbb")
+
+
+def _sampled(tx_hash: str) -> bool:
+    """Deterministic sampling on the hash's last 4 bytes"""
+    if PENDING_WATCH_SAMPLE_RATE >= 1:
+        return True
+    return int(tx_hash[-8:], 16) < PENDING_WATCH_SAMPLE_RATE * 0x100000000
+
+
+class PendingWatcher:
+    """Samples one chain's pending transactions and records the deposits among them"""
+
+    def __init__(self, chain: str):
+        self.chain = chain
+        self.limiter = RateLimiter(PENDING_WATCH_MAX_FETCH_PER_SECOND)
+        self.token_contracts = set(tracked_token_contracts(chain))
+        self.stats = {"announced": 0, "sampled": 0, "skipped": 0, "fetched": 0, "matched": 0}
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._tasks = set()
+
+    async def on_pending(self, w3, chain: str, tx_hash) -> None:
+        """Pending consumer (see SubscriptionManager.add_pending_consumer)"""
+        tx_hash = _normalize_hash(tx_hash)
+        self.stats["announced"] += 1
+        if not address_index.has_addresses(chain) or not _sampled(tx_hash) or tx_hash in self._seen:
+            return
+        self._seen[tx_hash] = None
+        if len(self._seen) > SEEN_HASHES_SIZE:
+            self._seen.popitem(last=False)
+        self.stats["sampled"] += 1
+        # Over the rate cap, or with a second's worth of fetches still in flight: skip it
+        if len(self._tasks) >= max(1, int(PENDING_WATCH_MAX_FETCH_PER_SECOND)) or not self.limiter.try_acquire():
+            self.stats["skipped"] += 1
+            return
+        task = asyncio.create_task(self._fetch(w3, tx_hash))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, w3, tx_hash: str) -> None:
+        try:
+            tx = await w3.eth.get_transaction(tx_hash)
+        except Exception as e:
+            # Not propagated to this node yet, or already replaced
+            logger.debug(f"Pending transaction {tx_hash} on {self.chain} not fetched: {str(e)}")
+            return
+        self.stats["fetched"] += 1
+        # Already included: the block watcher records it
+        if tx.get("blockNumber") is not None:
+            return
+        transfer = self.match(tx)
+        if transfer is None or not sharding.owns(transfer["to_address"]):
+            return
+        self.stats["matched"] += 1
+        await asyncio.get_running_loop().run_in_executor(None, self._record, transfer)
+
+    def match(self, tx) -> Optional[Dict[str, Any]]:
+        """The deposit a pending transaction makes to a monitored address, if any"""
+        to_address = tx.get("to")
+        if not to_address:
+            return None
+        transfer = {"tx_hash": _normalize_hash(tx["hash"]), "from_address": tx.get("from")}
+        data = bytes(HexBytes(tx.get("input") or b""))
+        if to_address.lower() in self.token_contracts and data[:4] == TRANSFER_SELECTOR and len(data) >= 68:
+            recipient = Web3.to_checksum_address(data[16:36])
+            amount = int.from_bytes(data[36:68], "big")
+            if amount > 0 and address_index.is_monitored(self.chain, recipient):
+                return dict(transfer, to_address=recipient, value=amount, token_address=to_address)
+            return None
+        value = tx.get("value") or 0
+        if value > 0 and address_index.is_monitored(self.chain, to_address):
+            return dict(transfer, to_address=to_address, value=value, token_address=None)
+        return None
+
+    def _record(self, transfer: Dict[str, Any]) -> None:
+        # Lazy import to avoid circular dependency
+        from services.receiving import record_pending_transfers
+
+        db = SessionLocal()
+        try:
+            record_pending_transfers(db, self.chain, [transfer])
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error recording pending transaction {transfer['tx_hash']} on {self.chain}: {str(e)}")
+        finally:
+            db.close()
+
+
+_watchers: Dict[str, PendingWatcher] = {}
+
+
+def get_watcher(chain: str) -> PendingWatcher:
+    """Get (or create) the watcher of a chain"""
+    if chain not in _watchers:
+        _watchers[chain] = PendingWatcher(chain)
+    return _watchers[chain]
+
+
+def get_metrics() -> Dict[str, Dict[str, int]]:
+    return {chain: dict(watcher.stats) for chain, watcher in _watchers.items()}
+
+
+def expire_sightings(db: Session = None) -> int:
+    """
+    Mark the "incoming" deposits not included within PENDING_WATCH_TTL_SECONDS as
+    "dropped" (a dropped deposit that is included later is still completed).
+
+    Returns:
+        Number of sightings dropped
+    """
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        dropped = db.query(TxHistory).filter(
+            TxHistory.status == "incoming",
+            TxHistory.seen_pending_at < datetime.utcnow() - timedelta(seconds=PENDING_WATCH_TTL_SECONDS)
+        ).update({"status": "dropped"}, synchronize_session=False)
+        db.commit()
+        if dropped:
+            logger.info(f"Marked {dropped} pending deposit(s) not included within {PENDING_WATCH_TTL_SECONDS}s as dropped")
+        return dropped
+    finally:
+        if own_session:
+            db.close()
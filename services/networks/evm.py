@@ -13,7 +13,7 @@ from eth_account import Account
 from sqlalchemy.orm import Session
 from sqlalchemy import update, and_, func, func
 from models import SwapHistory, TokenBalance, TxHistory
-from services.notification import notify_transaction_success, notify_swap_success
+from services import pending_index, confirmation, block_tracker, subscriptions, chain_cursor, pipeline, address_index, token_transfers, sharding, mempool
 from schemas.evm import BalanceRequest, TransactionRequest, QuoteRequest
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -22,6 +22,8 @@ from fastapi import HTTPException
 import os
 import json
 import asyncio
+from typing import Optional
+import time
 from datetime import datetime
 import logging
 from decimal import Decimal, ROUND_DOWN
@@ -72,6 +74,13 @@ NETWORK_CONFIGS = {
     }
 }
 CACHE_TTL_SECONDS = int(os.getenv("BALANCE_CACHE_TTL", "60"))
+# Block pipeline: concurrent block fetches (also the catch-up parallelism), fetch retries
+# per block, and concurrent notification sends
+PIPELINE_FETCH_CONCURRENCY = int(os.getenv("PIPELINE_FETCH_CONCURRENCY", "8"))
+PIPELINE_FETCH_RETRIES = int(os.getenv("PIPELINE_FETCH_RETRIES", "2"))
+# Scan full block bodies for native transfers to monitored addresses. Without it
+# only tx hashes are fetched (for our pending txs) and deposits are ERC20 only.
+NATIVE_DEPOSIT_SCAN = os.getenv("NATIVE_DEPOSIT_SCAN", "true").lower() == "true"
 
 ERC20_ABI = [
     {"inputs": [], "stateMutability": "nonpayable", "type": "constructor"},
@@ -675,33 +684,19 @@ def send_transaction(db: Session, req: TransactionRequest):
     db.add(new_tx)
     db.commit()
     db.refresh(new_tx)
+    pending_index.add_pending_hash(req.chain, tx_hash_str)
 
     return new_tx
 
 def get_transaction(db: Session, tx_hash: str, chain: str):
     transaction = db.query(TxHistory).filter(TxHistory.tx_hash == tx_hash).first()
-    w3 = _get_w3(chain)
     if transaction.status == "pending":
         try:
-            receipt = w3.eth.get_transaction_receipt(tx_hash)
-            if receipt["status"] == 1:
-                db.query(TxHistory).filter(TxHistory.tx_hash==tx_hash).update(
-                    { "status": "success" }, synchronize_session=False
-                )
-                transaction.status = "success"
-                db.commit()  # Commit before sending notification
-                # Send notification to recipient
-                try:
-                    notify_transaction_success(transaction, transaction.to_address)
-                except Exception as e:
-                    logger.error(f"Error sending notification: {str(e)}")
-            elif receipt["status"] == 0:
-                db.query(TxHistory).filter(TxHistory.tx_hash==tx_hash).update(
-                    { "status": "failed" }, synchronize_session=False
-                )
-                transaction.status = "failed"
-            db.commit()
+            w3 = _get_w3(chain)
+            confirmation.resolve_pending(db, w3, chain, [tx_hash])
+            db.refresh(transaction)
         except Exception as e:
+            db.rollback()
             logger.warning(f"Error fetching transaction receipt: {str(e)}")
     print(transaction)
     return transaction
@@ -1079,6 +1074,7 @@ def transferERC20(db: Session, sender, recipient, amount, chain, pk, save=True):
             db.add(new_history)
             db.commit()
             db.refresh(new_history)
+            pending_index.add_pending_hash(chain, tx_hash_str)
         return new_history
     except HTTPException:
         raise
@@ -1089,142 +1085,382 @@ def transferERC20(db: Session, sender, recipient, amount, chain, pk, save=True):
             detail=f"Error transferring tokens: {str(e)}"
         )
     
-async def watch_block(network_name, config):
-    # Connect via WebSocket, NOT HTTP
-    db = SessionLocal()
-    async with AsyncWeb3(AsyncWeb3.WebSocketProvider(config["wss_url"], websocket_kwargs={'max_size': 10 * 1024 * 1024})) as w3:
-        w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
-        if await w3.is_connected():
-            print("Connect successfully.")
-        else:
-            print("connection failed.")
+def _apply_block_data(db, network_name, full_block, block_transactions, transfer_logs, pending_receipts):
+    """
+    Apply a block: track it in the block ring (rolling back reorged rows), record
+    incoming transfers, resolve our pending transactions and move the chain cursor.
+    The detections, resolved rows and cursor are committed together.
+    With sharded workers only the coordinator resolves pending rows and confirmations.
+    """
+    # Lazy import to avoid circular dependency
+    from services.receiving import process_block_transactions
+
+    block_number = full_block['number']
+    block_hash = block_tracker.normalize_hex(full_block['hash'])
+    coordinator = sharding.is_coordinator()
+    reorg_from = block_tracker.observe_block(network_name, block_number, block_hash, full_block.get('parentHash'))
+    if reorg_from is not None and coordinator:
+        confirmation.rollback_reorged(db, network_name, reorg_from)
+
+    # Incoming transactions to monitored addresses
+    if block_transactions or transfer_logs:
+        detected_count = process_block_transactions(
+            db=db,
+            block_transactions=block_transactions,
+            chain=network_name,
+            transfer_logs=transfer_logs,
+            commit=False
+        )
+        if detected_count > 0:
+            logger.info(f"Detected {detected_count} incoming transaction(s) in block {block_number}")
+
+    chain_cursor.set_cursor(db, sharding.cursor_name(network_name), block_number, block_hash)
+
+    if not coordinator:
+        db.commit()
+        return
+
+    # Resolve every pending TxHistory/SwapHistory row of this block in one pass
+    confirmation.apply_receipts(
+        db, network_name, pending_receipts,
+        block_timestamps={block_number: full_block['timestamp']}
+    )
+    db.commit()
+
+    # Finalize rows that reached the confirmation depth
+    try:
+        confirmation.advance_confirmations(db, network_name, block_number)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error advancing confirmations on {network_name}: {str(e)}")
+
+
+class BlockPipeline:
+    """
+    Block ingestion for one network, as a pipeline of bounded stages:
+
+    fetch   - the block, the Transfer logs of monitored addresses (eth_getLogs) and the
+              receipts of our pending txs (PIPELINE_FETCH_CONCURRENCY blocks at a time)
+    decode  - Transfer logs into plain dicts
+    match   - keep the txs/logs of monitored addresses and the receipts of our pending txs
+    persist - apply blocks strictly in order (reorder buffer), DB work in a thread; the
+              block's notifications go into the outbox in the same transaction (services.outbox)
+
+    A block that can't be fetched or persisted stops the in-order persist: later
+    blocks are discarded and everything from the failed block is submitted again
+    with the next head, so the chain cursor only ever covers a contiguous prefix.
+
+    When catching up, the Transfer logs of blocks at least CONFIRMATION_DEPTH below the
+    head are fetched with eth_getLogs range queries as blocks are submitted, rather
+    than one query per block.
+
+    The fetch stage only downloads what the block can matter for: full transaction
+    bodies only when native deposits are scanned (NATIVE_DEPOSIT_SCAN), tx hashes when
+    we have pending txs, no eth_getLogs when the block's logsBloom rules out our
+    Transfer logs, and nothing beyond the newHeads header when none of these apply.
+    """
+
+    def __init__(self, network_name):
+        self.network_name = network_name
+        self.next_submit = None   # next block number to queue
+        self.next_persist = None  # next block number the persist stage expects
+        self.generation = 0       # bumped on reset; items of older generations are dropped
+        self._buffer = {}
+        self._prefetched_logs = {}  # block number -> Transfer logs from a range query
+        self.pipeline = pipeline.Pipeline(f"blocks:{network_name}")
+        self.pipeline.add_stage("fetch", self._fetch, concurrency=PIPELINE_FETCH_CONCURRENCY)
+        self.pipeline.add_stage("decode", self._decode)
+        self.pipeline.add_stage("match", self._match)
+        self.pipeline.add_stage("persist", self._persist)
+
+    def start(self):
+        return self.pipeline.start()
+
+    def _reset(self, block_number):
+        """Drop everything in flight and continue from `block_number`"""
+        self.generation += 1
+        self._buffer.clear()
+        self._prefetched_logs.clear()
+        self.next_submit = block_number
+        self.next_persist = block_number
+
+    async def submit(self, w3, start, end, header=None):
+        """
+        Queue blocks [start, end), plus any gap before them; waits while the pipeline is full.
+        `header` is the newHeads header of the last block, if it came from the subscription.
+        """
+        rewind = sharding.take_rewind(self.network_name)
+        if rewind is not None and self.next_submit is not None and rewind < self.next_submit:
+            # A sharded worker left: re-process its unfinished blocks for the addresses we inherit
+            logger.info(f"Re-processing {self.network_name} from block {rewind} after a shard rebalance")
+            self._reset(rewind)
+        if self.next_submit is not None and start > self.next_submit:
+            start = self.next_submit
+        if self.next_persist is None:
+            self.next_persist = start
+        try:
+            # Pick up addresses added/removed through the API since the last head
+            await asyncio.get_running_loop().run_in_executor(None, address_index.refresh)
+        except Exception as e:
+            logger.error(f"Error refreshing monitored addresses: {str(e)}")
+        generation = self.generation
+        for number in range(start, end):
+            if number not in self._prefetched_logs and number < end - block_tracker.CONFIRMATION_DEPTH:
+                await self._prefetch_logs(w3, number, end - block_tracker.CONFIRMATION_DEPTH)
+            item = {"generation": generation, "number": number, "w3": w3}
+            if header is not None and header['number'] == number:
+                item["header"] = header
+            await self.pipeline.submit(item)
+            if generation != self.generation:
+                # Reset while we were waiting on a full queue; the next head resubmits
+                return
+            self.next_submit = number + 1
+
+    async def _prefetch_logs(self, w3, start, end):
+        """Fetch the Transfer logs of up to TRANSFER_LOGS_MAX_BLOCKS blocks from `start` (before `end`)"""
+        if not sharding.owns_any(self.network_name):
             return
-    # Subscribe to new blocks
-        subscription_id = await w3.eth.subscribe('newHeads')
-        print(subscription_id)
-        
-        print(f"Listening for new blocks in {network_name}")
-        log_info(f"Listening for new blocks in {network_name}")
-        async for response in w3.socket.process_subscriptions():
-            block = response["result"]
-            block_number = block['number']
-            print(f"New block: {block_number} in {network_name} at {datetime.now()}")
-            log_info(f"New block: {block_number} in {network_name} at {datetime.now()}")
-            # Get the full block with all transactions
-            full_block = await w3.eth.get_block(block_number, full_transactions=True)
-            
-            # Get monitored addresses for incoming transaction detection
-            # Lazy import to avoid circular dependency
+        last = min(start + token_transfers.TRANSFER_LOGS_MAX_BLOCKS, end) - 1
+        try:
+            logs = await token_transfers.async_get_transfer_logs(w3, self.network_name, start, last)
+        except Exception as e:
+            # The fetch stage queries these blocks one by one instead
+            logger.warning(f"Error fetching Transfer logs of blocks {start}-{last} in {self.network_name}: {str(e)}")
+            return
+        for number in range(start, last + 1):
+            self._prefetched_logs[number] = []
+        for log in logs:
+            self._prefetched_logs[log["blockNumber"]].append(log)
+
+    async def on_head(self, w3, network_name, header):
+        """Subscription consumer for new heads"""
+        number = header['number']
+        print(f"New block: {number} in {network_name} at {datetime.now()}")
+        log_info(f"New block: {number} in {network_name} at {datetime.now()}")
+        if self.next_submit is not None and number < self.next_submit:
+            # A head at a height we already queued: the chain reorganized
+            self._reset(number)
+        await self.submit(w3, number, number + 1, header=header)
+
+    async def backfill(self, w3, network_name, start, end):
+        """Subscription backfill for missed heads"""
+        await self.submit(w3, start, end)
+
+    async def _fetch(self, item, emit):
+        w3, number = item["w3"], item["number"]
+        for attempt in range(PIPELINE_FETCH_RETRIES + 1):
+            if item["generation"] != self.generation:
+                return
             try:
-                from services.receiving import process_block_transactions, get_monitored_addresses
-                monitored_addresses = get_monitored_addresses(db)
-                
-                # Process block for incoming transactions to monitored addresses
-                if monitored_addresses and full_block.get('transactions'):
-                    try:
-                        detected_count = process_block_transactions(
-                            db=db,
-                            block_transactions=full_block['transactions'],
-                            chain=network_name,
-                            monitored_addresses=monitored_addresses
-                        )
-                        if detected_count > 0:
-                            logger.info(f"Detected {detected_count} incoming transaction(s) in block {block_number}")
-                    except Exception as e:
-                        logger.error(f"Error processing block {block_number} for incoming transactions: {str(e)}")
-            except ImportError as e:
-                logger.warning(f"Receiving module not available: {str(e)}")
-            
-            # Check each transaction in the block for status updates
-            for tx in full_block['transactions']:
-                tx_hash = tx['hash'].hex()
-
-                # Check if this is a transaction we are waiting for
-                tx_record = db.query(TxHistory).filter_by(tx_hash=tx_hash).all()
-                if tx_record and len(tx_record) == 1 and tx_record[0].status == "pending":
-                    # Get the receipt to get the final status
-                    receipt = await w3.eth.get_transaction_receipt(tx_hash)
-                    status = "success" if receipt.status == 1 else "failed"
-
-                    # Update the database
-                    db.query(TxHistory).filter_by(tx_hash=tx_hash).update(
-                        {"status": status}
+                # With sharded workers: only this worker's addresses, and only the
+                # coordinator resolves our pending txs
+                monitoring = sharding.owns_any(self.network_name)
+                scan_native = monitoring and NATIVE_DEPOSIT_SCAN
+                resolving = sharding.is_coordinator() and pending_index.has_pending(self.network_name)
+                if "header" in item and not scan_native and not resolving:
+                    # Nothing to look for in the transactions: the header is all we need
+                    full_block = {**item["header"], "transactions": []}
+                else:
+                    full_block = await w3.eth.get_block(number, full_transactions=scan_native)
+                block_transactions = full_block.get('transactions', []) if scan_native else []
+                # Transactions in this block that we are waiting for.
+                # Intersect with the in-memory pending index so only our own txs hit the DB.
+                matched_hashes = set()
+                if resolving:
+                    matched_hashes = pending_index.match_pending_hashes(
+                        self.network_name,
+                        (tx['hash'] for tx in block_transactions) if scan_native else full_block.get('transactions', [])
                     )
-                    db.commit()
-                    print(f"Updated tx {tx_hash} to status: {status}")
-                    
-                    # Send notification if transaction succeeded
-                    if status == "success":
-                        try:
-                            notify_transaction_success(tx_record[0], tx_record[0].to_address)
-                        except Exception as e:
-                            logger.error(f"Error sending notification for tx {tx_hash}: {str(e)}")
-
-def watch_blocks():
-    for network_name, config in NETWORK_CONFIGS.items():
-        asyncio.create_task(watch_block(network_name, config))
-
-def update_transaction_status():
-    succeeded_ids = []
-    failed_ids = []
+                # ERC20 deposits come from eth_getLogs filtered on the monitored recipients;
+                # receipts are only needed to resolve our own pending txs
+                raw_logs = []
+                if monitoring:
+                    raw_logs = self._prefetched_logs.pop(number, None)
+                    if raw_logs is None:
+                        raw_logs = []
+                        if token_transfers.logs_may_match(self.network_name, full_block.get('logsBloom')):
+                            raw_logs = await token_transfers.async_get_block_transfer_logs(w3, self.network_name, full_block['hash'])
+                receipts = []
+                if matched_hashes:
+                    receipts = await confirmation.async_fetch_receipts(w3, matched_hashes)
+                item.update(
+                    full_block=full_block, block_transactions=block_transactions,
+                    matched_hashes=matched_hashes, receipts=receipts, raw_logs=raw_logs
+                )
+                break
+            except Exception as e:
+                if attempt == PIPELINE_FETCH_RETRIES:
+                    item["error"] = str(e)
+                else:
+                    await asyncio.sleep(2 ** attempt)
+        await emit(item)
+
+    async def _decode(self, item, emit):
+        if "error" not in item:
+            item["transfer_logs"] = token_transfers.decode_transfer_logs(item["raw_logs"])
+        await emit(item)
+
+    async def _match(self, item, emit):
+        if "error" not in item:
+            # Monitored recipients in this worker's shard (every recipient when not sharded)
+            item["block_transactions"] = [
+                tx for tx in item["block_transactions"]
+                if tx.get('to') and address_index.is_monitored(self.network_name, tx['to']) and sharding.owns(tx['to'])
+            ]
+            item["transfer_logs"] = [
+                log for log in item["transfer_logs"]
+                if len(log['topics']) > 2 and address_index.is_monitored(self.network_name, log['topics'][2])
+                and sharding.owns(log['topics'][2])
+            ]
+            item["pending_receipts"] = [r for r in item["receipts"] if r["transactionHash"] in item["matched_hashes"]]
+        await emit(item)
+
+    def _persist_block(self, item):
+        """Apply one block in its own session (runs in a thread)"""
+        db = SessionLocal()
+        try:
+            _apply_block_data(
+                db, self.network_name, item["full_block"], item["block_transactions"],
+                item["transfer_logs"], item["pending_receipts"]
+            )
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _persist(self, item, emit):
+        if item["generation"] != self.generation:
+            return
+        self._buffer[item["number"]] = item
+        while self.next_persist in self._buffer:
+            current = self._buffer.pop(self.next_persist)
+            generation, number = current["generation"], current["number"]
+            try:
+                if "error" in current:
+                    raise RuntimeError(current["error"])
+                await asyncio.get_running_loop().run_in_executor(None, self._persist_block, current)
+            except Exception as e:
+                logger.error(f"Error processing block {number} in {self.network_name}, retrying from it with the next head: {str(e)}")
+                if generation == self.generation:
+                    self._reset(number)
+                return
+            if generation != self.generation:
+                return
+            self.next_persist = number + 1
+
+
+def _stream_url(config) -> Optional[str]:
+    """Endpoint to watch a network on: its WebSocket, else its HTTP RPC (filter polling)"""
+    for key, schemes in (("wss_url", ("ws://", "wss://")), ("https_rpc_url", ("http://", "https://"))):
+        url = config.get(key) or ""
+        if "None" not in url and url.startswith(schemes):
+            return url
+    return None
+
+def watch_block(network_name, config):
+    """
+    Register a network's block pipeline with the subscription manager of its endpoint.
+    Processing resumes after the chain's cursor (this worker's, when sharded): the
+    first head triggers a catch-up of the blocks missed while the service was down.
+    Chains listed in PENDING_WATCH_CHAINS also get a mempool watcher (see services.mempool).
+    """
+    block_pipeline = BlockPipeline(network_name)
+    manager = subscriptions.get_manager(_stream_url(config))
+    manager.add_head_consumer(network_name, block_pipeline.on_head, backfill=block_pipeline.backfill)
+    if network_name in mempool.PENDING_WATCH_CHAINS:
+        manager.add_pending_consumer(network_name, mempool.get_watcher(network_name).on_pending)
     db = SessionLocal()
     try:
-        tx_histories = db.query(TxHistory).filter(TxHistory.status == "pending").all()
-        for tx in tx_histories:
-            chain = tx.chain
-            w3 = _get_w3(chain)
-            receipt = w3.eth.get_transaction_receipt(tx.tx_hash)
-            print(f"receipt: {receipt}")
-            if receipt["status"] == 1:
-                succeeded_ids.append(tx.id)
-            elif receipt["status"] == 0:
-                failed_ids.append(tx.id)
-                
-            if len(succeeded_ids) > 0:
-                query = update(TxHistory).where(TxHistory.id.in_(succeeded_ids)).values(status="success")
-                db.execute(query)
-                db.commit()
-                # Send notifications for successful transactions
-                for tx_id in succeeded_ids:
-                    tx = db.query(TxHistory).filter(TxHistory.id == tx_id).first()
-                    if tx:
-                        try:
-                            notify_transaction_success(tx, tx.to_address)
-                        except Exception as e:
-                            logger.error(f"Error sending notification for tx {tx.tx_hash}: {str(e)}")
-            if len(failed_ids) > 0:
-                query = update(TxHistory).where(TxHistory.id.in_(failed_ids)).values(status="failed")
-                db.execute(query)
-                db.commit()
-        succeeded_ids.clear()
-        failed_ids.clear()
-        swap_histories = db.query(SwapHistory).filter(SwapHistory.status == "pending").all()
-        for tx in swap_histories:
-            chain = tx.to_token_network
-            w3 = _get_w3(chain)
-            receipt = w3.eth.get_transaction_receipt(tx.tx_hash)
-            print(f"receipt: {receipt}")
-            if receipt["status"] == 1:
-                succeeded_ids.append(tx.id)
-            elif receipt["status"] == 0:
-                failed_ids.append(tx.id)
-                
-            if len(succeeded_ids) > 0:
-                query = update(SwapHistory).where(SwapHistory.id.in_(succeeded_ids)).values(status="success")
-                db.execute(query)
-                db.commit()
-                # Send notifications for successful swaps
-                for swap_id in succeeded_ids:
-                    swap = db.query(SwapHistory).filter(SwapHistory.id == swap_id).first()
-                    if swap:
-                        try:
-                            notify_swap_success(swap, swap.address)
-                        except Exception as e:
-                            logger.error(f"Error sending swap notification for tx {swap.tx_hash}: {str(e)}")
-            if len(failed_ids) > 0:
-                query = update(SwapHistory).where(SwapHistory.id.in_(failed_ids)).values(status="failed")
-                db.execute(query)
-                db.commit()
+        cursor = sharding.initial_cursor(db, network_name)
+        if cursor is not None:
+            manager.resume_from(cursor)
+    finally:
+        db.close()
+    return block_pipeline
+
+def watch_blocks(chains=None):
+    """
+    Start one subscription manager per distinct endpoint, and a block pipeline per
+    watched network. Networks without a WebSocket endpoint are watched by polling
+    filters over their HTTP RPC (see services.polling).
+    Networks sharing a chainId (sepolia/insoblok) are processed once, under the
+    first name: the pending index already matches the sibling chains' txs.
+
+    Args:
+        chains: Chain names to watch (default: every configured network)
+
+    Returns:
+        The manager and pipeline tasks
+    """
+    watched_ids = set()
+    tasks = []
+    for network_name in chains or NETWORK_CONFIGS:
+        config = NETWORK_CONFIGS[network_name]
+        if _stream_url(config) is None:
+            logger.warning(f"No RPC endpoint configured for {network_name}, not watching it")
+            continue
+        if config["chainId"] in watched_ids:
+            continue
+        watched_ids.add(config["chainId"])
+        tasks += watch_block(network_name, config).start()
+    return tasks + [asyncio.create_task(manager.run()) for manager in subscriptions.get_managers()]
+
+def update_transaction_status(deadline: Optional[float] = None):
+    """
+    Scheduled job: resolve pending TxHistory and SwapHistory rows and finalize
+    included ones that reached the confirmation depth.
+    Receipts are fetched with one batched request per chain instead of one call per row.
+
+    Args:
+        deadline: time.monotonic() value after which remaining chains are left for the next run
+    """
+    # Lazy import to avoid circular dependency
+    from services.swap import get_swap_chain
+
+    db = SessionLocal()
+    try:
+        pending_by_chain = {}
+        for tx_hash, chain in db.query(TxHistory.tx_hash, TxHistory.chain).filter(TxHistory.status == "pending"):
+            pending_by_chain.setdefault(chain, []).append(tx_hash)
+        for tx_hash, to_token_network in db.query(SwapHistory.tx_hash, SwapHistory.to_token_network).filter(SwapHistory.status == "pending"):
+            pending_by_chain.setdefault(get_swap_chain(to_token_network), []).append(tx_hash)
+
+        for chain in pending_by_chain:
+            if chain not in NETWORK_CONFIGS:
+                logger.warning(f"Skipping {len(pending_by_chain[chain])} pending transaction(s) on unsupported chain '{chain}'")
+        # Chains with rows waiting for confirmation depth need a head update too
+        unconfirmed_chains = {
+            chain for (chain,) in db.query(TxHistory.chain).filter(
+                TxHistory.confirmed_at.is_(None), TxHistory.block_number.isnot(None)
+            ).distinct()
+        }
+        unconfirmed_chains |= {
+            get_swap_chain(to_token_network) for (to_token_network,) in db.query(SwapHistory.to_token_network).filter(
+                SwapHistory.confirmed_at.is_(None), SwapHistory.block_number.isnot(None)
+            ).distinct()
+        }
+
+        for chain in sorted((set(pending_by_chain) | unconfirmed_chains) & set(NETWORK_CONFIGS)):
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning(f"Time budget exhausted, leaving {chain} and later chains for the next run")
+                break
+            try:
+                w3 = _get_w3(chain)
+                head = w3.eth.get_block("latest")
+                reorg_from = block_tracker.observe_block(chain, head["number"], head["hash"], head["parentHash"])
+                if reorg_from is not None:
+                    confirmation.rollback_reorged(db, chain, reorg_from)
+                if pending_by_chain.get(chain):
+                    confirmation.resolve_pending(db, w3, chain, pending_by_chain[chain])
+                confirmation.advance_confirmations(
+                    db, chain, head["number"],
+                    get_block_hash=lambda number: w3.eth.get_block(number)["hash"]
+                )
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error updating pending transactions on {chain}: {str(e)}")
     except Exception as e:
         print(str(e))
-        
\ No newline at end of file
+    finally:
+        db.close()
@@ -4,8 +4,10 @@ from web3.exceptions import TransactionNotFound
 from dotenv import load_dotenv
 import logging
 from typing import Dict, Optional, Union, Any
+from datetime import timezone
 from schemas.evm import BalanceRequest, TransactionRequest
 from sqlalchemy.orm import Session
+from models import TxHistory
 
 load_dotenv()
 
@@ -53,7 +55,8 @@ class InSoService:
             }
         ]
         
-        self.web3 = Web3(HTTPProvider(NETWORK_CONFIGS["sepolia"]["https_rpc_url"]))
+        self.logger = logging.getLogger(__name__)
+        self.w3 = Web3(HTTPProvider(NETWORK_CONFIGS["sepolia"]["https_rpc_url"]))
         if not self.w3.is_connected():
             raise ConnectionError("Failed to connect to blockchain network")
 
@@ -193,16 +196,44 @@ class InSoService:
             self.logger.error(f"Error sending ERC20 token: {str(e)}")
             return {"success": False, "error": str(e)}
     
-    def get_transaction(self, tx_hash: str) -> Dict[str, Any]:
+    def _transaction_from_history(self, tx: TxHistory, chain: str) -> Dict[str, Any]:
+        """Build the transaction response from a recorded TxHistory row (no RPC calls)"""
+        from services import block_tracker
+        return {
+            "success": True,
+            "tx_hash": tx.tx_hash,
+            "status": "confirmed" if tx.status == "success" else tx.status,
+            "block_number": tx.block_number,
+            "gas_used": tx.gas_used,
+            "from_address": tx.from_address,
+            "to_address": tx.to_address,
+            "value": tx.amount,
+            "received_amount": tx.received_amount,
+            "gas_price": tx.effective_gas_price,
+            "block_timestamp": int(tx.block_timestamp.replace(tzinfo=timezone.utc).timestamp()) if tx.block_timestamp else None,
+            "confirmations": block_tracker.get_confirmations(chain, tx.block_number) or 0,
+        }
+
+    def get_transaction(self, db: Session, tx_hash: str, chain: Optional[str] = None) -> Dict[str, Any]:
         """
         Get transaction status and details
         
+        Transactions we recorded are answered from their TxHistory row once a
+        receipt has been applied; only unknown or pending ones go to the chain.
+        
         Args:
+            db: Database session
             tx_hash: Transaction hash to check
+            chain: Chain name (defaults to sepolia)
             
         Returns:
             Dictionary with transaction status and details
         """
+        chain = chain or "sepolia"
+        tx = db.query(TxHistory).filter(TxHistory.tx_hash == tx_hash).first()
+        if tx and tx.status != "pending":
+            return self._transaction_from_history(tx, chain)
+
         try:
             # Get transaction receipt
             receipt = self.w3.eth.get_transaction_receipt(tx_hash)
@@ -235,6 +266,15 @@ class InSoService:
                 "confirmations": self.w3.eth.block_number - receipt.blockNumber if receipt.blockNumber else 0
             }
             
+            # Record the receipt on our own pending row so later reads stay off the chain
+            if tx:
+                try:
+                    from services import confirmation
+                    confirmation.resolve_pending(db, self.w3, tx.chain or chain, [tx_hash])
+                except Exception as e:
+                    db.rollback()
+                    self.logger.warning(f"Could not record transaction receipt: {str(e)}")
+            
             # Check if it's a token transfer
             if transaction.to and transaction.input and len(transaction.input) > 2:
                 result["is_token_transfer"] = True
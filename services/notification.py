@@ -1,13 +1,31 @@
 """
 Notification service for sending notifications when transactions succeed.
 Supports multiple channels: email, SMS, webhook, push notifications.
+The notify_* functions are called by the outbox dispatcher (services/outbox.py);
+code that changes a status enqueues its notification there instead of sending it.
+Webhook and push requests go through the shared async HTTP client (services/http_client.py);
+emails are sent in batches over pooled SMTP connections (services/smtp_pool.py), and the
+blocking SMS client runs in a thread.
+
+Each channel reports True (sent), False (failed, the outbox retries it) or None
+(not applicable: channel not configured, or no contact for the recipient). Email,
+SMS and push go to the recipient's contact (services/contacts.py), which the
+dispatcher resolves for its whole batch. Besides the global WEBHOOK_URL, every event
+goes to the partner webhook subscriptions that match it (services/webhook_subscriptions.py),
+each reported as its own "webhook:<id>" channel.
 """
 import os
-import requests
+import json
+import asyncio
 import logging
-from typing import Optional, Dict, Any
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Iterable, List, Tuple
 from dotenv import load_dotenv
 from models import TxHistory, SwapHistory
+from services import http_client, smtp_pool, webhook_subscriptions
+from services.smtp_pool import SMTP_HOST, SMTP_USER, SMTP_PASSWORD
+from services.contacts import Contact
 
 load_dotenv()
 
@@ -20,13 +38,15 @@ NOTIFICATION_CHANNELS = os.getenv("NOTIFICATION_CHANNELS", "webhook").split(",")
 # Webhook configuration
 WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
 WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Batched delivery (opt-in): events to the same URL are posted together as one "batch" event
+WEBHOOK_BATCH_ENABLED = os.getenv("WEBHOOK_BATCH_ENABLED", "false").lower() == "true"
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))  # max events per POST
+WEBHOOK_BATCH_WAIT_MS = int(os.getenv("WEBHOOK_BATCH_WAIT_MS", "200"))  # max time an event waits for its batch
 
-# Email configuration (using SMTP)
-SMTP_HOST = os.getenv("SMTP_HOST", "")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USER = os.getenv("SMTP_USER", "")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+# Email configuration (using SMTP; connection settings are in services/smtp_pool.py)
 SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL", "")
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "20"))  # max emails sent over one connection at a time
+SMTP_BATCH_WAIT_MS = int(os.getenv("SMTP_BATCH_WAIT_MS", "50"))  # max time an email waits for its batch
 
 # SMS configuration (example: Twilio)
 SMS_PROVIDER = os.getenv("SMS_PROVIDER", "")  # twilio, aws-sns, etc.
@@ -39,27 +59,205 @@ PUSH_NOTIFICATION_SERVICE = os.getenv("PUSH_NOTIFICATION_SERVICE", "")  # fireba
 PUSH_API_KEY = os.getenv("PUSH_API_KEY", "")
 
 
-def send_webhook_notification(transaction: TxHistory, recipient_address: str) -> bool:
+# Longest Retry-After asked for by an endpoint that refused the current send (see send_event)
+_retry_after: ContextVar[Optional[float]] = ContextVar("notification_retry_after", default=None)
+
+
+def _note_retry_after(seconds: Optional[float]) -> None:
+    if seconds is not None:
+        _retry_after.set(max(_retry_after.get() or 0.0, seconds))
+
+
+async def send_event(notify, subject, recipient_address: Optional[str], channels: Iterable[str], contact: Optional[Contact] = None) -> Tuple[Dict[str, Optional[bool]], Optional[float]]:
+    """
+    Send one event over the given channels with a notify_* function, to the
+    recipient's contact for the user-facing channels.
+
+    Returns:
+        (channel results, longest Retry-After in seconds a failed channel was given, if any)
+    """
+    token = _retry_after.set(None)
+    try:
+        results = await notify(subject, recipient_address, channels=channels, contact=contact)
+        return results, _retry_after.get()
+    finally:
+        _retry_after.reset(token)
+
+
+def _event_tx_hash(payload: Dict[str, Any]) -> Optional[str]:
+    return (payload.get("transaction") or payload.get("swap") or {}).get("tx_hash")
+
+
+async def _post_webhook(url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> Tuple[bool, Optional[float]]:
+    """POST one event; returns whether it was delivered and the endpoint's Retry-After"""
+    response = await http_client.post_json(url, payload, headers)
+    if response.status != 200:
+        logger.error(f"Webhook notification failed: {response.status} - {response.text}")
+        return False, http_client.retry_after_seconds(response.headers)
+    return True, None
+
+
+class _Batcher(ABC):
+    """
+    Collects items submitted concurrently and sends them together (_send), once
+    `size` items are waiting or `wait_ms` after the first one. Each submit resolves
+    to the outcome _send sets on its future.
+    """
+
+    def __init__(self, size: int, wait_ms: int):
+        self.size = size
+        self.wait_ms = wait_ms
+        self._items: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._items.append((item, future))
+        if len(self._items) >= self.size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if items:
+            task = asyncio.get_running_loop().create_task(self._send(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @abstractmethod
+    async def _send(self, items: List[Tuple[Any, asyncio.Future]]) -> None:
+        """Send a batch and set the outcome of each item on its future"""
+
+
+class WebhookBatcher(_Batcher):
+    """
+    Accumulates the events for one webhook URL and posts them as one batch:
+    {"event": "batch", "count": n, "events": [<event payload>, ...]}, once
+    WEBHOOK_BATCH_SIZE events are waiting or WEBHOOK_BATCH_WAIT_MS after the first.
+
+    A 200 delivers the whole batch. The receiver may answer 207 with
+    {"failed": [tx_hash, ...]} to reject some events; those, or every event of a
+    batch that failed outright, are retried individually - unless the receiver
+    sent a Retry-After, which applies to every event of the batch.
+    """
+
+    def __init__(self, url: str, headers: Dict[str, str]):
+        super().__init__(WEBHOOK_BATCH_SIZE, WEBHOOK_BATCH_WAIT_MS)
+        self.url = url
+        self.headers = headers
+
+    async def submit(self, payload: Dict[str, Any]) -> Tuple[bool, Optional[float]]:
+        """Add an event to the next batch; returns whether it was delivered and the endpoint's Retry-After"""
+        return await super().submit(payload)
+
+    async def _send(self, events: List[Tuple[Dict[str, Any], asyncio.Future]]) -> None:
+        payloads = [payload for payload, _ in events]
+        failed = set(range(len(events)))
+        try:
+            response = await http_client.post_json(
+                self.url, {"event": "batch", "count": len(payloads), "events": payloads}, self.headers
+            )
+            retry_after = http_client.retry_after_seconds(response.headers) if response.status != 200 else None
+            if response.status == 200:
+                failed = set()
+            elif response.status == 207:
+                rejected = set(json.loads(response.text or "{}").get("failed") or [])
+                failed = {i for i, payload in enumerate(payloads) if _event_tx_hash(payload) in rejected}
+            elif retry_after is not None:
+                # The receiver asked us to back off: don't hit it with every event of the batch
+                logger.warning(f"Webhook batch of {len(payloads)} refused ({response.status}), retry after {retry_after:.0f}s")
+                self._resolve(events, {i: (False, retry_after) for i in failed})
+                return
+            else:
+                logger.warning(f"Webhook batch of {len(payloads)} failed ({response.status}), retrying its events one by one")
+        except Exception as e:
+            logger.warning(f"Webhook batch of {len(payloads)} failed ({str(e)}), retrying its events one by one")
+
+        async def retry(payload):
+            try:
+                return await _post_webhook(self.url, payload, self.headers)
+            except Exception as e:
+                logger.error(f"Error sending webhook notification: {str(e)}")
+                return False, None
+
+        self._resolve(events, dict(zip(sorted(failed), await asyncio.gather(*(retry(payloads[i]) for i in sorted(failed))))))
+
+    @staticmethod
+    def _resolve(events: List[Tuple[Dict[str, Any], asyncio.Future]], outcomes: Dict[int, Tuple[bool, Optional[float]]]) -> None:
+        """Complete every event's future; events without an outcome were delivered"""
+        for i, (_, future) in enumerate(events):
+            if not future.done():
+                future.set_result(outcomes.get(i, (True, None)))
+
+
+_batchers: Dict[Tuple[asyncio.AbstractEventLoop, str], WebhookBatcher] = {}
+
+
+async def deliver_webhook(url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> bool:
+    """
+    POST an event to a webhook, in a batch when WEBHOOK_BATCH_ENABLED; returns whether
+    it was delivered. A Retry-After from the endpoint is recorded for send_event.
+    """
+    if not WEBHOOK_BATCH_ENABLED:
+        delivered, retry_after = await _post_webhook(url, payload, headers)
+    else:
+        key = (asyncio.get_running_loop(), url)
+        if key not in _batchers:
+            _batchers[key] = WebhookBatcher(url, headers)
+        delivered, retry_after = await _batchers[key].submit(payload)
+    _note_retry_after(retry_after)
+    return delivered
+
+
+def _transaction_payload(transaction: TxHistory, recipient_address: str, event: str) -> Dict[str, Any]:
+    return {
+        "event": event,
+        "transaction": {
+            "tx_hash": transaction.tx_hash,
+            "from_address": transaction.from_address,
+            "to_address": transaction.to_address,
+            "recipient": recipient_address,
+            "amount": transaction.amount,
+            "token_symbol": transaction.token_symbol,
+            "chain": transaction.chain,
+            "status": transaction.status,
+            "created_at": transaction.created_at.isoformat() if transaction.created_at else None,
+            "seen_pending_at": transaction.seen_pending_at.isoformat() if transaction.seen_pending_at else None
+        }
+    }
+
+
+def _swap_payload(swap: SwapHistory) -> Dict[str, Any]:
+    return {
+        "event": "swap_success",
+        "swap": {
+            "tx_hash": swap.tx_hash,
+            "address": swap.address,
+            "from_token_network": swap.from_token_network,
+            "to_token_network": swap.to_token_network,
+            "from_amount": swap.from_amount,
+            "to_amount": swap.to_amount,
+            "status": swap.status,
+            "created_at": swap.created_at.isoformat() if swap.created_at else None
+        }
+    }
+
+
+async def send_webhook_notification(transaction: TxHistory, recipient_address: str, event: str = "transaction_success") -> Optional[bool]:
     """Send notification via webhook"""
     if not WEBHOOK_URL:
         logger.warning("WEBHOOK_URL not configured, skipping webhook notification")
-        return False
+        return None
     
     try:
-        payload = {
-            "event": "transaction_success",
-            "transaction": {
-                "tx_hash": transaction.tx_hash,
-                "from_address": transaction.from_address,
-                "to_address": transaction.to_address,
-                "recipient": recipient_address,
-                "amount": transaction.amount,
-                "token_symbol": transaction.token_symbol,
-                "chain": transaction.chain,
-                "status": transaction.status,
-                "created_at": transaction.created_at.isoformat() if transaction.created_at else None
-            }
-        }
+        payload = _transaction_payload(transaction, recipient_address, event)
         
         headers = {
             "Content-Type": "application/json"
@@ -68,86 +266,122 @@ def send_webhook_notification(transaction: TxHistory, recipient_address: str) ->
         if WEBHOOK_SECRET:
             headers["X-Webhook-Secret"] = WEBHOOK_SECRET
         
-        response = requests.post(
-            WEBHOOK_URL,
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            logger.info(f"Webhook notification sent successfully for tx {transaction.tx_hash}")
+        if await deliver_webhook(WEBHOOK_URL, payload, headers):
+            logger.info(f"Webhook notification ({event}) sent successfully for tx {transaction.tx_hash}")
             return True
-        else:
-            logger.error(f"Webhook notification failed: {response.status_code} - {response.text}")
-            return False
+        return False
             
     except Exception as e:
         logger.error(f"Error sending webhook notification: {str(e)}")
         return False
 
 
-def send_email_notification(transaction: TxHistory, recipient_address: str, recipient_email: Optional[str] = None) -> bool:
-    """Send notification via email"""
+def _email_message(transaction: TxHistory, recipient_address: str, recipient_email: Optional[str]):
+    """The notification email, or None when email doesn't apply (not configured, no address)"""
     if not SMTP_HOST or not SMTP_USER or not SMTP_PASSWORD:
         logger.warning("SMTP not configured, skipping email notification")
-        return False
+        return None
     
     # If recipient_email is not provided, you might need to look it up from a user database
     if not recipient_email:
         logger.warning(f"No email address provided for recipient {recipient_address}")
-        return False
+        return None
+    
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
     
+    msg = MIMEMultipart()
+    msg['From'] = SMTP_FROM_EMAIL
+    msg['To'] = recipient_email
+    msg['Subject'] = f"Transaction Successful - {transaction.tx_hash[:10]}..."
+    
+    body = f"""
+    Your transaction has been successfully confirmed!
+    
+    Transaction Details:
+    - Hash: {transaction.tx_hash}
+    - From: {transaction.from_address}
+    - To: {transaction.to_address}
+    - Amount: {transaction.amount} {transaction.token_symbol}
+    - Chain: {transaction.chain}
+    - Status: {transaction.status}
+    - Time: {transaction.created_at}
+    
+    View on explorer: https://etherscan.io/tx/{transaction.tx_hash}
+    """
+    
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def send_email_notification(transaction: TxHistory, recipient_address: str, recipient_email: Optional[str] = None) -> Optional[bool]:
+    """Send notification via email (blocking; the dispatcher uses queue_email_notification)"""
     try:
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_FROM_EMAIL
-        msg['To'] = recipient_email
-        msg['Subject'] = f"Transaction Successful - {transaction.tx_hash[:10]}..."
-        
-        body = f"""
-        Your transaction has been successfully confirmed!
-        
-        Transaction Details:
-        - Hash: {transaction.tx_hash}
-        - From: {transaction.from_address}
-        - To: {transaction.to_address}
-        - Amount: {transaction.amount} {transaction.token_symbol}
-        - Chain: {transaction.chain}
-        - Status: {transaction.status}
-        - Time: {transaction.created_at}
-        
-        View on explorer: https://etherscan.io/tx/{transaction.tx_hash}
-        """
-        
-        msg.attach(MIMEText(body, 'plain'))
-        
-        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
-        server.starttls()
-        server.login(SMTP_USER, SMTP_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+        msg = _email_message(transaction, recipient_address, recipient_email)
+        if msg is None:
+            return None
+        if smtp_pool.send_messages([msg])[0]:
+            logger.info(f"Email notification sent to {recipient_email} for tx {transaction.tx_hash}")
+            return True
+        return False
         
-        logger.info(f"Email notification sent to {recipient_email} for tx {transaction.tx_hash}")
-        return True
+    except Exception as e:
+        logger.error(f"Error sending email notification: {str(e)}")
+        return False
+
+
+class EmailBatcher(_Batcher):
+    """
+    Collects the emails of concurrently sent events and sends up to SMTP_BATCH_SIZE
+    of them over one pooled SMTP connection (in a thread), instead of one
+    connection per email.
+    """
+
+    def __init__(self):
+        super().__init__(SMTP_BATCH_SIZE, SMTP_BATCH_WAIT_MS)
+
+    async def _send(self, items: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await asyncio.to_thread(smtp_pool.send_messages, [message for message, _ in items])
+        except Exception as e:
+            logger.error(f"Error sending {len(items)} email notification(s): {str(e)}")
+            results = [False] * len(items)
+        for (_, future), sent in zip(items, results):
+            if not future.done():
+                future.set_result(sent)
+
+
+_email_batchers: Dict[asyncio.AbstractEventLoop, EmailBatcher] = {}
+
+
+async def queue_email_notification(transaction: TxHistory, recipient_address: str, recipient_email: Optional[str] = None) -> Optional[bool]:
+    """Send notification via email, in a batch with the other emails being sent"""
+    try:
+        msg = _email_message(transaction, recipient_address, recipient_email)
+        if msg is None:
+            return None
+        loop = asyncio.get_running_loop()
+        if loop not in _email_batchers:
+            _email_batchers[loop] = EmailBatcher()
+        if await _email_batchers[loop].submit(msg):
+            logger.info(f"Email notification sent to {recipient_email} for tx {transaction.tx_hash}")
+            return True
+        return False
         
     except Exception as e:
         logger.error(f"Error sending email notification: {str(e)}")
         return False
 
 
-def send_sms_notification(transaction: TxHistory, recipient_address: str, recipient_phone: Optional[str] = None) -> bool:
+def send_sms_notification(transaction: TxHistory, recipient_address: str, recipient_phone: Optional[str] = None) -> Optional[bool]:
     """Send notification via SMS"""
     if not SMS_PROVIDER or not SMS_API_KEY:
         logger.warning("SMS not configured, skipping SMS notification")
-        return False
+        return None
     
     if not recipient_phone:
         logger.warning(f"No phone number provided for recipient {recipient_address}")
-        return False
+        return None
     
     try:
         if SMS_PROVIDER.lower() == "twilio":
@@ -163,22 +397,29 @@ def send_sms_notification(transaction: TxHistory, recipient_address: str, recipi
             return True
         else:
             logger.warning(f"Unsupported SMS provider: {SMS_PROVIDER}")
-            return False
+            return None
             
     except Exception as e:
         logger.error(f"Error sending SMS notification: {str(e)}")
         return False
 
 
-def send_push_notification(transaction: TxHistory, recipient_address: str, device_token: Optional[str] = None) -> bool:
-    """Send push notification"""
+async def send_push_notification(transaction: TxHistory, recipient_address: str, device_token: Optional[str] = None) -> Tuple[Optional[bool], Optional[float]]:
+    """
+    Send push notification.
+
+    Returns:
+        (sent, the push service's Retry-After in seconds if it sent one). The caller
+        records the Retry-After: this runs in its own task (see _push_to_devices),
+        whose context changes send_event wouldn't see.
+    """
     if not PUSH_NOTIFICATION_SERVICE or not PUSH_API_KEY:
         logger.warning("Push notifications not configured, skipping push notification")
-        return False
+        return None, None
     
     if not device_token:
         logger.warning(f"No device token provided for recipient {recipient_address}")
-        return False
+        return None, None
     
     try:
         if PUSH_NOTIFICATION_SERVICE.lower() == "firebase":
@@ -204,29 +445,66 @@ def send_push_notification(transaction: TxHistory, recipient_address: str, devic
                 }
             }
             
-            response = requests.post(fcm_url, json=payload, headers=headers, timeout=10)
-            if response.status_code == 200:
+            response = await http_client.post_json(fcm_url, payload, headers)
+            if response.status == 200:
                 logger.info(f"Push notification sent for tx {transaction.tx_hash}")
-                return True
+                return True, None
             else:
-                logger.error(f"Push notification failed: {response.status_code}")
-                return False
+                logger.error(f"Push notification failed: {response.status}")
+                return False, http_client.retry_after_seconds(response.headers)
         else:
             logger.warning(f"Unsupported push notification service: {PUSH_NOTIFICATION_SERVICE}")
-            return False
+            return None, None
             
     except Exception as e:
         logger.error(f"Error sending push notification: {str(e)}")
-        return False
+        return False, None
 
 
-def notify_transaction_success(transaction: TxHistory, recipient_address: Optional[str] = None) -> Dict[str, bool]:
+async def notify_subscribers(event: str, payload: Dict[str, Any], chain: Optional[str], addresses: Iterable[Optional[str]], channels: Optional[Iterable[str]] = None) -> Dict[str, Optional[bool]]:
+    """
+    Send an event to the webhook subscriptions that match it, concurrently.
+    
+    Args:
+        channels: On a retry, the subscriber channels ("webhook:<id>") still to deliver; None for all
+    
+    Returns:
+        Result per subscriber channel
+    """
+    subscriptions = webhook_subscriptions.match(event, chain, addresses)
+    if channels is not None:
+        channels = set(channels)
+        subscriptions = [subscription for subscription in subscriptions if subscription.channel in channels]
+    outcomes = await asyncio.gather(*(webhook_subscriptions.deliver(subscription, payload) for subscription in subscriptions))
+    for _, retry_after in outcomes:
+        _note_retry_after(retry_after)
+    return {subscription.channel: delivered for subscription, (delivered, _) in zip(subscriptions, outcomes)}
+
+
+async def _push_to_devices(transaction: TxHistory, recipient_address: str, device_tokens: Iterable[str]) -> Optional[bool]:
+    """Push to every device of the recipient; delivered if any device got it"""
+    outcomes = await asyncio.gather(*(
+        send_push_notification(transaction, recipient_address, token) for token in device_tokens or [None]
+    ))
+    for _, retry_after in outcomes:
+        _note_retry_after(retry_after)
+    results = [sent for sent, _ in outcomes]
+    if all(result is None for result in results):
+        return None
+    return any(results)
+
+
+async def notify_transaction_success(transaction: TxHistory, recipient_address: Optional[str] = None, channels: Optional[Iterable[str]] = None, contact: Optional[Contact] = None) -> Dict[str, Optional[bool]]:
     """
     Send notifications when a transaction is successful.
     
     Args:
         transaction: The TxHistory object that was marked as successful
         recipient_address: The recipient address (usually transaction.to_address)
+        channels: Channels to send on (default NOTIFICATION_CHANNELS, and every matching subscription);
+            a retry only resends the failed ones
+        contact: The recipient's contact details; email, SMS and push are only sent
+            on the channels it opted into
     
     Returns:
         Dictionary with notification channel results
@@ -238,35 +516,69 @@ def notify_transaction_success(transaction: TxHistory, recipient_address: Option
     # Use transaction.to_address as recipient if not provided
     recipient = recipient_address or transaction.to_address
     
+    requested = None if channels is None else list(channels)
+    channels = NOTIFICATION_CHANNELS if requested is None else requested
     results = {}
     
     # Send notifications via configured channels
-    if "webhook" in NOTIFICATION_CHANNELS:
-        results["webhook"] = send_webhook_notification(transaction, recipient)
+    if "webhook" in channels:
+        results["webhook"] = await send_webhook_notification(transaction, recipient)
     
-    if "email" in NOTIFICATION_CHANNELS:
-        # Note: You'll need to implement a way to get email from address
-        # This could be from a user database or user preferences
-        results["email"] = send_email_notification(transaction, recipient)
+    if "email" in channels and (contact is None or contact.wants("email")):
+        results["email"] = await queue_email_notification(transaction, recipient, contact.email if contact else None)
     
-    if "sms" in NOTIFICATION_CHANNELS:
-        # Note: You'll need to implement a way to get phone number from address
-        results["sms"] = send_sms_notification(transaction, recipient)
+    if "sms" in channels and (contact is None or contact.wants("sms")):
+        results["sms"] = await asyncio.to_thread(send_sms_notification, transaction, recipient, contact.phone if contact else None)
     
-    if "push" in NOTIFICATION_CHANNELS:
-        # Note: You'll need to implement a way to get device token from address
-        results["push"] = send_push_notification(transaction, recipient)
+    if "push" in channels and (contact is None or contact.wants("push")):
+        results["push"] = await _push_to_devices(transaction, recipient, contact.device_tokens if contact else [])
     
+    results.update(await notify_subscribers(
+        "transaction_success", _transaction_payload(transaction, recipient, "transaction_success"),
+        transaction.chain, [transaction.to_address, transaction.from_address], requested
+    ))
     return results
 
 
-def notify_swap_success(swap: SwapHistory, recipient_address: Optional[str] = None) -> Dict[str, bool]:
+async def notify_payment_incoming(transaction: TxHistory, recipient_address: Optional[str] = None, channels: Optional[Iterable[str]] = None, contact: Optional[Contact] = None) -> Dict[str, Optional[bool]]:
+    """
+    Early signal for a deposit seen in the mempool (status "incoming"), before it is
+    included. Sent once per transaction, over the webhook channel; the usual
+    transaction_success notification follows when the deposit is recorded in a block.
+    
+    Args:
+        transaction: The TxHistory row of the pending deposit
+        recipient_address: The recipient address (usually transaction.to_address)
+        channels: Channels to send on (default NOTIFICATION_CHANNELS, and every matching subscription)
+        contact: Unused (webhook only)
+    
+    Returns:
+        Dictionary with notification channel results
+    """
+    if not ENABLE_NOTIFICATIONS:
+        return {}
+    
+    recipient = recipient_address or transaction.to_address
+    requested = None if channels is None else list(channels)
+    results = {}
+    if "webhook" in (NOTIFICATION_CHANNELS if requested is None else requested):
+        results["webhook"] = await send_webhook_notification(transaction, recipient, event="payment_incoming")
+    results.update(await notify_subscribers(
+        "payment_incoming", _transaction_payload(transaction, recipient, "payment_incoming"),
+        transaction.chain, [transaction.to_address, transaction.from_address], requested
+    ))
+    return results
+
+
+async def notify_swap_success(swap: SwapHistory, recipient_address: Optional[str] = None, channels: Optional[Iterable[str]] = None, contact: Optional[Contact] = None) -> Dict[str, Optional[bool]]:
     """
     Send notifications when a swap transaction is successful.
     
     Args:
         swap: The SwapHistory object that was marked as successful
         recipient_address: The recipient address
+        channels: Channels to send on (default: all); swaps are only sent by webhook, global and subscribed
+        contact: Unused (webhook only)
     
     Returns:
         Dictionary with notification channel results
@@ -274,35 +586,22 @@ def notify_swap_success(swap: SwapHistory, recipient_address: Optional[str] = No
     if not ENABLE_NOTIFICATIONS:
         return {}
     
-    recipient = recipient_address or swap.address
+    requested = None if channels is None else list(channels)
+    payload = _swap_payload(swap)
+    results = {}
     
-    # Convert SwapHistory to notification format
     # For now, we'll use webhook as the primary method
-    if WEBHOOK_URL:
+    if WEBHOOK_URL and (requested is None or "webhook" in requested):
         try:
-            payload = {
-                "event": "swap_success",
-                "swap": {
-                    "tx_hash": swap.tx_hash,
-                    "address": swap.address,
-                    "from_token_network": swap.from_token_network,
-                    "to_token_network": swap.to_token_network,
-                    "from_amount": swap.from_amount,
-                    "to_amount": swap.to_amount,
-                    "status": swap.status,
-                    "created_at": swap.created_at.isoformat() if swap.created_at else None
-                }
-            }
-            
             headers = {"Content-Type": "application/json"}
             if WEBHOOK_SECRET:
                 headers["X-Webhook-Secret"] = WEBHOOK_SECRET
             
-            response = requests.post(WEBHOOK_URL, json=payload, headers=headers, timeout=10)
-            return {"webhook": response.status_code == 200}
+            results["webhook"] = await deliver_webhook(WEBHOOK_URL, payload, headers)
         except Exception as e:
             logger.error(f"Error sending swap notification: {str(e)}")
-            return {"webhook": False}
+            results["webhook"] = False
     
-    return {}
-
+    # Swaps have no single chain, so only subscriptions without a chain filter get them
+    results.update(await notify_subscribers("swap_success", payload, None, [recipient_address or swap.address], requested))
+    return results
@@ -0,0 +1,350 @@
+"""
+Notification outbox - notifications are written to the database, then sent by a dispatcher.
+
+Code that changes a status enqueues the notification (enqueue_notification) in the
+same session, so it is committed - or rolled back - together with the change, and
+never waits on an external endpoint. (event_type, tx_hash) is unique: re-detecting
+a deposit or re-confirming a tx after a reorg doesn't notify twice.
+
+The dispatcher (run_dispatcher, started by the worker and by an API that runs the
+background jobs) claims batches of due rows with FOR UPDATE SKIP LOCKED, so several
+instances can drain the table without sending a row twice, and sends up to
+OUTBOX_CONCURRENCY notifications at a time over the shared HTTP client
+(services/http_client.py) and SMTP pool (services/smtp_pool.py). It is woken right
+after a commit that enqueued something and otherwise polls every
+OUTBOX_POLL_SECONDS; rows left in "sending" by a dispatcher that died are claimed
+again after OUTBOX_CLAIM_TIMEOUT_SECONDS.
+
+Retries are scheduled, never slept: a failed send goes back to pending with
+next_attempt_at set by exponential backoff with jitter (OUTBOX_RETRY_SECONDS doubling
+per attempt, up to OUTBOX_RETRY_MAX_SECONDS), or later if the endpoint sent a
+Retry-After. Only the channels that failed are sent again, and fresh notifications
+are claimed before retries. After OUTBOX_MAX_ATTEMPTS the row is moved to the
+notification_dead_letters table, from which replay_dead_letters puts it back.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import event, func, or_, and_
+from models import NotificationOutbox, NotificationDeadLetter, TxHistory, SwapHistory
+from database import SessionLocal
+from services import http_client, smtp_pool, contacts, webhook_subscriptions
+from services.address_index import normalize_address
+from services.notification import ENABLE_NOTIFICATIONS, NOTIFICATION_CHANNELS, WEBHOOK_BATCH_ENABLED, WEBHOOK_BATCH_SIZE, SMTP_BATCH_SIZE, send_event, notify_transaction_success, notify_swap_success, notify_payment_incoming
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import random
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "8"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+OUTBOX_RETRY_SECONDS = int(os.getenv("OUTBOX_RETRY_SECONDS", "60"))  # first retry delay, doubled per attempt
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "3600"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_CLAIM_TIMEOUT_SECONDS = int(os.getenv("OUTBOX_CLAIM_TIMEOUT_SECONDS", "300"))
+
+# event_type -> (model the tx_hash refers to, sender)
+EVENTS = {
+    "transaction_success": (TxHistory, notify_transaction_success),
+    "payment_incoming": (TxHistory, notify_payment_incoming),
+    "swap_success": (SwapHistory, notify_swap_success),
+}
+
+
+def enqueue_notification(db: Session, event_type: str, tx_hash: str, recipient_address: Optional[str]) -> None:
+    """
+    Add a notification to the outbox in the session's transaction; it is sent after
+    the caller commits. A notification already in the outbox is left as is.
+    """
+    if not ENABLE_NOTIFICATIONS:
+        return
+    _insert(db, {
+        "event_type": event_type,
+        "tx_hash": tx_hash,
+        "recipient_address": recipient_address,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": datetime.utcnow(),
+        "created_at": datetime.utcnow(),
+    })
+
+
+def _insert(db: Session, values: Dict[str, Any]) -> None:
+    """Insert an outbox row unless (event_type, tx_hash) is already there"""
+    event_type, tx_hash = values["event_type"], values["tx_hash"]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        db.execute(insert(NotificationOutbox).values(**values).on_conflict_do_nothing(
+            index_elements=["event_type", "tx_hash"]
+        ))
+    elif not db.query(NotificationOutbox.id).filter(
+        NotificationOutbox.event_type == event_type, NotificationOutbox.tx_hash == tx_hash
+    ).first():
+        db.add(NotificationOutbox(**values))
+    db.info["outbox_enqueued"] = True
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_wake_event: Optional[asyncio.Event] = None
+
+
+def wake() -> None:
+    """Let this process's dispatcher look at the outbox now (callable from any thread)"""
+    if _loop is not None and _wake_event is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wake_event.set)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_after_commit(session) -> None:
+    if session.info.pop("outbox_enqueued", False):
+        wake()
+
+
+def claim_batch(db: Session, limit: int = OUTBOX_BATCH_SIZE) -> List[NotificationOutbox]:
+    """
+    Claim due notifications (status sending, attempts + 1) and commit the claim.
+    Rows locked by another dispatcher's claim are skipped. First attempts are
+    claimed before retries, so a backlog of retries doesn't hold up new notifications.
+    """
+    now = datetime.utcnow()
+    rows = db.query(NotificationOutbox).filter(or_(
+        and_(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now),
+        and_(
+            NotificationOutbox.status == "sending",
+            NotificationOutbox.claimed_at < now - timedelta(seconds=OUTBOX_CLAIM_TIMEOUT_SECONDS)
+        )
+    )).order_by(NotificationOutbox.attempts, NotificationOutbox.id).limit(limit).with_for_update(skip_locked=True).all()
+    for row in rows:
+        row.status = "sending"
+        row.claimed_at = now
+        row.attempts = (row.attempts or 0) + 1
+    ids = [row.id for row in rows]
+    db.commit()
+    # Reload the (expired) rows in one query and detach them for the senders
+    rows = db.query(NotificationOutbox).filter(NotificationOutbox.id.in_(ids)).order_by(NotificationOutbox.id).all() if ids else []
+    for row in rows:
+        db.expunge(row)
+    return rows
+
+
+def _load_subjects(db: Session, rows: List[NotificationOutbox]) -> Dict[tuple, object]:
+    """The TxHistory / SwapHistory rows the notifications are about, one IN (...) query per model"""
+    hashes_by_model: Dict[type, List[str]] = {}
+    for row in rows:
+        model = EVENTS[row.event_type][0] if row.event_type in EVENTS else None
+        if model is not None:
+            hashes_by_model.setdefault(model, []).append(row.tx_hash)
+    subjects = {}
+    for model, tx_hashes in hashes_by_model.items():
+        for subject in db.query(model).filter(model.tx_hash.in_(tx_hashes)):
+            db.expunge(subject)
+            subjects[(model, subject.tx_hash)] = subject
+    return subjects
+
+
+# (error, or None once delivered; channels to retry, None for all; Retry-After in seconds)
+Outcome = Tuple[Optional[str], Optional[str], Optional[float]]
+
+
+def _recipient(row: NotificationOutbox, subject) -> Optional[str]:
+    """The wallet a notification is for (the tx recipient / swap owner unless the row names one)"""
+    return row.recipient_address or getattr(subject, "to_address", None) or getattr(subject, "address", None)
+
+
+async def _send(row: NotificationOutbox, subject, contact: Optional[contacts.Contact] = None) -> Outcome:
+    """Send one notification on the channels it still has to go out on"""
+    if subject is None:
+        return f"{row.tx_hash} not found for {row.event_type}", row.retry_channels, None
+    channels = row.retry_channels.split(",") if row.retry_channels else None
+    try:
+        results, retry_after = await send_event(EVENTS[row.event_type][1], subject, row.recipient_address, channels, contact)
+    except Exception as e:
+        return str(e), row.retry_channels, None
+    # Channels that don't apply (None, e.g. no email address for the recipient) aren't retried
+    failed = [channel for channel, sent in results.items() if sent is False]
+    if failed:
+        return f"channel(s) failed: {', '.join(failed)}", ",".join(failed), retry_after
+    return None, None, None
+
+
+def retry_delay(attempts: int, retry_after: Optional[float] = None) -> float:
+    """
+    Seconds until the next attempt: OUTBOX_RETRY_SECONDS doubled per attempt made,
+    capped at OUTBOX_RETRY_MAX_SECONDS, with jitter (a random 50-100% of it) so
+    notifications that failed together don't retry together - and never less than
+    the endpoint's Retry-After.
+    """
+    delay = min(OUTBOX_RETRY_MAX_SECONDS, OUTBOX_RETRY_SECONDS * 2 ** min(max(attempts - 1, 0), 32))
+    delay = random.uniform(delay / 2, delay)
+    return max(delay, retry_after) if retry_after is not None else delay
+
+
+def _finish(db: Session, row_id: int, outcome: Outcome) -> None:
+    error, retry_channels, retry_after = outcome
+    row = db.query(NotificationOutbox).filter(NotificationOutbox.id == row_id).first()
+    if row is None:
+        return
+    if error is None:
+        row.status = "sent"
+        row.sent_at = datetime.utcnow()
+        row.last_error = None
+        row.retry_channels = None
+    elif row.attempts >= OUTBOX_MAX_ATTEMPTS:
+        db.add(NotificationDeadLetter(
+            event_type=row.event_type,
+            tx_hash=row.tx_hash,
+            recipient_address=row.recipient_address,
+            channels=retry_channels,
+            attempts=row.attempts,
+            last_error=error,
+            created_at=row.created_at,
+            dead_at=datetime.utcnow(),
+        ))
+        db.delete(row)
+        logger.error(f"Giving up on {row.event_type} notification for {row.tx_hash} after {row.attempts} attempt(s), dead-lettered: {error}")
+    else:
+        delay = retry_delay(row.attempts, retry_after)
+        row.status = "pending"
+        row.last_error = error
+        row.retry_channels = retry_channels
+        row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        logger.warning(f"{row.event_type} notification for {row.tx_hash} failed, retrying in {delay:.0f}s: {error}")
+    db.commit()
+
+
+def _claim() -> tuple:
+    """Claim a batch, with the rows it is about and its recipients' contacts (one query each)"""
+    db = SessionLocal()
+    try:
+        webhook_subscriptions.refresh_if_stale(db)
+        rows = claim_batch(db)
+        subjects = _load_subjects(db, rows)
+        recipients = [
+            _recipient(row, subjects.get((EVENTS[row.event_type][0], row.tx_hash))) for row in rows if row.event_type in EVENTS
+        ]
+        return rows, subjects, contacts.resolve_contacts(db, recipients)
+    finally:
+        db.close()
+
+
+def _record_outcome(row: NotificationOutbox, outcome: Outcome) -> None:
+    """Record the outcome of a send (runs in a thread)"""
+    db = SessionLocal()
+    try:
+        _finish(db, row.id, outcome)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error recording the outcome of notification {row.id}: {str(e)}")
+    finally:
+        db.close()
+
+
+async def dispatch_once() -> int:
+    """
+    Claim one batch and send it, OUTBOX_CONCURRENCY notifications at a time.
+
+    Returns:
+        Number of notifications claimed
+    """
+    loop = asyncio.get_running_loop()
+    rows, subjects, recipient_contacts = await loop.run_in_executor(None, _claim)
+    # With batched webhooks / emails a whole batch of events waits on one request
+    batch = max(
+        WEBHOOK_BATCH_SIZE if WEBHOOK_BATCH_ENABLED else 1,
+        SMTP_BATCH_SIZE if "email" in NOTIFICATION_CHANNELS else 1,
+    )
+    semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY * batch)
+
+    async def deliver(row):
+        async with semaphore:
+            subject = subjects.get((EVENTS[row.event_type][0], row.tx_hash)) if row.event_type in EVENTS else None
+            recipient = _recipient(row, subject)
+            outcome = await _send(row, subject, recipient_contacts.get(normalize_address(recipient)) if recipient else None)
+        await loop.run_in_executor(None, _record_outcome, row, outcome)
+
+    await asyncio.gather(*(deliver(row) for row in rows))
+    return len(rows)
+
+
+async def run_dispatcher() -> None:
+    """Drain the outbox forever; a full batch is followed by the next one right away"""
+    global _loop, _wake_event
+    _loop = asyncio.get_running_loop()
+    _wake_event = asyncio.Event()
+    try:
+        while True:
+            _wake_event.clear()
+            try:
+                claimed = await dispatch_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {str(e)}")
+                claimed = 0
+            if claimed >= OUTBOX_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(_wake_event.wait(), timeout=OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await http_client.close()
+        await asyncio.to_thread(smtp_pool.get_pool().close)
+
+
+def outbox_counts(db: Session) -> Dict[str, int]:
+    """Notifications per outbox status, plus the dead letters awaiting replay"""
+    counts = dict(db.query(NotificationOutbox.status, func.count(NotificationOutbox.id)).group_by(NotificationOutbox.status))
+    counts["dead_letter"] = db.query(func.count(NotificationDeadLetter.id)).filter(NotificationDeadLetter.replayed_at.is_(None)).scalar()
+    return counts
+
+
+def get_dead_letters(db: Session, event_type: Optional[str] = None, include_replayed: bool = False, limit: int = 100) -> List[NotificationDeadLetter]:
+    """Dead-lettered notifications, most recent first"""
+    query = db.query(NotificationDeadLetter)
+    if event_type:
+        query = query.filter(NotificationDeadLetter.event_type == event_type)
+    if not include_replayed:
+        query = query.filter(NotificationDeadLetter.replayed_at.is_(None))
+    return query.order_by(NotificationDeadLetter.dead_at.desc()).limit(limit).all()
+
+
+def replay_dead_letters(db: Session, ids: Optional[List[int]] = None, event_type: Optional[str] = None, limit: int = 1000) -> int:
+    """
+    Put dead-lettered notifications back in the outbox as fresh pending rows (sent
+    on the channels that never delivered), and mark them replayed. Without ids,
+    every dead letter not yet replayed is replayed, optionally only of event_type.
+
+    Returns:
+        Number of notifications replayed
+    """
+    query = db.query(NotificationDeadLetter).filter(NotificationDeadLetter.replayed_at.is_(None))
+    if ids is not None:
+        query = query.filter(NotificationDeadLetter.id.in_(ids))
+    if event_type:
+        query = query.filter(NotificationDeadLetter.event_type == event_type)
+    letters = query.order_by(NotificationDeadLetter.id).limit(limit).with_for_update(skip_locked=True).all()
+    now = datetime.utcnow()
+    for letter in letters:
+        _insert(db, {
+            "event_type": letter.event_type,
+            "tx_hash": letter.tx_hash,
+            "recipient_address": letter.recipient_address,
+            "status": "pending",
+            "attempts": 0,
+            "retry_channels": letter.channels,
+            "next_attempt_at": now,
+            "created_at": now,
+        })
+        letter.replayed_at = now
+    db.commit()
+    if letters:
+        logger.info(f"Replayed {len(letters)} dead-lettered notification(s)")
+    return len(letters)
@@ -0,0 +1,171 @@
+"""
+Pending transaction index - in-memory set of pending tx hashes per chain.
+
+The block watcher intersects every block's tx hashes with this index instead of
+querying tx_histories once per transaction. The index is loaded from the database
+at startup, updated whenever a pending row is inserted, and periodically re-synced
+so rows resolved by other code paths (or other instances) drop out. Hashes added or
+discarded while a re-sync reads the database are replayed onto the set it loaded,
+so a re-sync never loses a transaction registered in the meantime.
+"""
+from sqlalchemy.orm import Session
+from models import TxHistory, SwapHistory
+from database import SessionLocal
+from typing import Dict, Iterable, Optional, Set, Tuple
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_pending_hashes: Dict[str, Set[str]] = {}
+# Changes made while a reload reads the database: (chain, hash) added, hashes discarded
+_reload_lock = threading.Lock()
+_changes_during_reload: Optional[Tuple[Set[Tuple[str, str]], Set[str]]] = None
+
+
+def _normalize_hash(tx_hash) -> str:
+    """Normalize a tx hash (str or HexBytes) to a lowercase 0x-prefixed string"""
+    tx_hash_str = tx_hash.hex() if hasattr(tx_hash, 'hex') else str(tx_hash)
+    if not tx_hash_str.startswith('0x'):
+        tx_hash_str = f"0x{tx_hash_str}"
+    return tx_hash_str.lower()
+
+
+def sibling_chains(chain: str) -> Set[str]:
+    """
+    Chains that share the same underlying network as `chain`.
+    sepolia and insoblok both live on chainId 11155111, so a Sepolia block can
+    include transactions recorded under either name.
+    """
+    from services.networks.evm import NETWORK_CONFIGS
+    config = NETWORK_CONFIGS.get(chain)
+    if not config:
+        return {chain}
+    return {
+        name for name, other in NETWORK_CONFIGS.items()
+        if other["chainId"] == config["chainId"]
+    }
+
+
+def _query_pending(db: Session) -> Dict[str, Set[str]]:
+    """Read every pending TxHistory and SwapHistory hash from the database, grouped by chain"""
+    from services.swap import get_swap_chain
+
+    pending: Dict[str, Set[str]] = {}
+    for tx_hash, chain in db.query(TxHistory.tx_hash, TxHistory.chain).filter(TxHistory.status == "pending"):
+        if tx_hash and chain:
+            pending.setdefault(chain, set()).add(_normalize_hash(tx_hash))
+    for tx_hash, to_token_network in db.query(SwapHistory.tx_hash, SwapHistory.to_token_network).filter(SwapHistory.status == "pending"):
+        if tx_hash and to_token_network:
+            pending.setdefault(get_swap_chain(to_token_network), set()).add(_normalize_hash(tx_hash))
+    return pending
+
+
+def load_pending_hashes(db: Session = None) -> int:
+    """
+    (Re)load the index from the database, replacing its current contents.
+
+    Args:
+        db: Database session (a new one is opened if not provided)
+
+    Returns:
+        Number of pending hashes loaded
+    """
+    global _changes_during_reload
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    with _reload_lock:
+        with _lock:
+            _changes_during_reload = (set(), set())
+        try:
+            pending = _query_pending(db)
+        finally:
+            if own_session:
+                db.close()
+            with _lock:
+                added, discarded = _changes_during_reload
+                _changes_during_reload = None
+        
+        # Replay what changed while the query ran, then swap the new sets in
+        for hashes in pending.values():
+            hashes -= discarded
+        for chain, tx_hash in added:
+            pending.setdefault(chain, set()).add(tx_hash)
+        with _lock:
+            _pending_hashes.clear()
+            _pending_hashes.update(pending)
+    count = sum(len(hashes) for hashes in pending.values())
+    logger.info(f"Loaded {count} pending tx hash(es) into the pending index")
+    return count
+
+
+def resync_pending_hashes():
+    """Scheduled job: re-sync the index with the database"""
+    try:
+        load_pending_hashes()
+    except Exception as e:
+        logger.error(f"Error re-syncing pending tx index: {str(e)}")
+
+
+def add_pending_hash(chain: str, tx_hash) -> None:
+    """Register a newly inserted pending transaction"""
+    if not chain or not tx_hash:
+        return
+    normalized = _normalize_hash(tx_hash)
+    with _lock:
+        _pending_hashes.setdefault(chain, set()).add(normalized)
+        if _changes_during_reload is not None:
+            _changes_during_reload[0].add((chain, normalized))
+            _changes_during_reload[1].discard(normalized)
+
+
+def discard_pending_hash(tx_hash) -> None:
+    """Remove a resolved transaction from the index (on every chain)"""
+    if not tx_hash:
+        return
+    normalized = _normalize_hash(tx_hash)
+    with _lock:
+        for hashes in _pending_hashes.values():
+            hashes.discard(normalized)
+        if _changes_during_reload is not None:
+            _changes_during_reload[1].add(normalized)
+            _changes_during_reload[0].difference_update(
+                {change for change in _changes_during_reload[0] if change[1] == normalized}
+            )
+
+
+def match_pending_hashes(chain: str, tx_hashes: Iterable) -> Set[str]:
+    """
+    Intersect a block's tx hashes with the pending hashes of `chain`
+    (and of the chains sharing its network).
+
+    Args:
+        chain: Chain name the block belongs to
+        tx_hashes: Tx hashes from the block (str or HexBytes)
+
+    Returns:
+        Set of normalized tx hashes that we are waiting for
+    """
+    with _lock:
+        pending = set()
+        for name in sibling_chains(chain):
+            pending |= _pending_hashes.get(name, set())
+    if not pending:
+        return set()
+    return {h for h in (_normalize_hash(tx_hash) for tx_hash in tx_hashes) if h in pending}
+
+
+def has_pending(chain: str) -> bool:
+    """Whether we are waiting for any tx on `chain` (or the chains sharing its network)"""
+    with _lock:
+        return any(_pending_hashes.get(name) for name in sibling_chains(chain))
+
+
+def pending_count(chain: str = None) -> int:
+    """Number of indexed pending hashes, for one chain or in total"""
+    with _lock:
+        if chain:
+            return len(_pending_hashes.get(chain, set()))
+        return sum(len(hashes) for hashes in _pending_hashes.values())
@@ -0,0 +1,122 @@
+"""
+Pipeline - stages connected by bounded asyncio queues.
+
+Each stage has its own queue and a fixed number of worker tasks. A stage handler
+receives an item and an `emit` coroutine that puts results on the next stage's
+queue; when that queue is full `emit` waits, so backpressure propagates upstream
+to whoever submits into the first stage.
+
+Per-stage queue depth, throughput and handler latency are kept in memory and
+exposed through get_metrics() (served by the worker's /metrics endpoint).
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default capacity of a stage's input queue
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+
+Emit = Callable[[Any], Awaitable[None]]
+Handler = Callable[[Any, Emit], Awaitable[None]]
+
+
+class Stage:
+    """One pipeline stage: a bounded input queue and `concurrency` workers running `handler`"""
+
+    def __init__(self, name: str, handler: Handler, concurrency: int = 1, maxsize: int = PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.handler = handler
+        self.concurrency = max(1, concurrency)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.next: Optional["Stage"] = None
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._tasks: List[asyncio.Task] = []
+
+    async def put(self, item: Any) -> None:
+        await self.queue.put(item)
+
+    async def _emit(self, item: Any) -> None:
+        if self.next is not None:
+            await self.next.put(item)
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self.queue.get()
+            started = time.monotonic()
+            self.busy += 1
+            try:
+                await self.handler(item, self._emit)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Pipeline stage {self.name} failed: {str(e)}")
+            finally:
+                elapsed = time.monotonic() - started
+                self.busy -= 1
+                self.processed += 1
+                self.total_seconds += elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+                self.queue.task_done()
+
+    def start(self) -> List[asyncio.Task]:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        return self._tasks
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "concurrency": self.concurrency,
+            "busy": self.busy,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_latency_ms": round(self.total_seconds / self.processed * 1000, 2) if self.processed else 0.0,
+            "max_latency_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+class Pipeline:
+    """A linear chain of stages"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: List[Stage] = []
+        _pipelines[name] = self
+
+    def add_stage(self, name: str, handler: Handler, concurrency: int = 1, maxsize: int = PIPELINE_QUEUE_SIZE) -> Stage:
+        stage = Stage(name, handler, concurrency, maxsize)
+        if self.stages:
+            self.stages[-1].next = stage
+        self.stages.append(stage)
+        return stage
+
+    async def submit(self, item: Any) -> None:
+        """Put an item into the first stage; waits while it is full"""
+        await self.stages[0].put(item)
+
+    def start(self) -> List[asyncio.Task]:
+        """Start every stage's workers (needs a running event loop)"""
+        tasks = []
+        for stage in self.stages:
+            tasks += stage.start()
+        return tasks
+
+    def metrics(self) -> Dict[str, Any]:
+        return {stage.name: stage.metrics() for stage in self.stages}
+
+
+_pipelines: Dict[str, Pipeline] = {}
+
+
+def get_metrics() -> Dict[str, Any]:
+    """Metrics of every pipeline, by pipeline and stage name"""
+    return {name: pipeline.metrics() for name, pipeline in _pipelines.items()}
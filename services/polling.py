@@ -0,0 +1,137 @@
+"""
+Polling manager - the subscription manager for endpoints without a WebSocket.
+
+Same consumers and downstream pipeline as services.subscriptions, fed by polling
+server-side filters over HTTP every POLL_INTERVAL_SECONDS:
+
+- heads: an eth_newBlockFilter, polled with eth_getFilterChanges; the newest
+  block of each poll is handed to the head consumers (the skipped ones are a gap,
+  processed through the consumers' backfill as for the WebSocket source)
+- logs: an eth_newFilter per log consumer
+- pending transactions (chains watching the mempool): an eth_newPendingTransactionFilter
+
+Nodes drop filters that aren't polled for a while (and forget them on restart);
+a filter that errors is recreated transparently. On nodes without filter support
+heads come from eth_blockNumber and logs from eth_getLogs range queries instead;
+without pending filter support the mempool isn't watched over HTTP.
+"""
+from web3 import AsyncWeb3
+from web3.middleware import ExtraDataToPOAMiddleware
+from services.subscriptions import SubscriptionManager
+from typing import Any, Dict, List, Optional
+import asyncio
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = float(os.getenv("POLL_INTERVAL_SECONDS", "4"))
+
+_UNSUPPORTED_MESSAGES = ["method not found", "not supported", "does not exist", "not available", "-32601"]
+
+
+def _is_unsupported(error: Exception) -> bool:
+    message = str(error).lower()
+    return any(keyword in message for keyword in _UNSUPPORTED_MESSAGES)
+
+
+class PollingManager(SubscriptionManager):
+    """Polls one HTTP endpoint for new heads and logs"""
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.filters_supported = True
+        self.pending_supported = True
+        self._block_filter: Optional[str] = None
+        self._pending_filter: Optional[str] = None
+        self._log_filters: Dict[int, Optional[str]] = {}
+        self._logs_polled_through: Optional[int] = None
+        # One provider for the manager's lifetime, so its HTTP session is pooled
+        self._w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(self.url, request_kwargs={"timeout": 30}))
+        self._w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+
+    async def _new_filter(self, w3: AsyncWeb3, params) -> Optional[str]:
+        """Create a server-side filter; None (and polling without filters from now on) if unsupported"""
+        try:
+            return (await w3.eth.filter(params)).filter_id
+        except Exception as e:
+            if not _is_unsupported(e):
+                raise
+            if params == "pending":
+                logger.warning(f"{self.url_label} doesn't support pending transaction filters, not watching its mempool")
+                self.pending_supported = False
+            else:
+                logger.warning(f"{self.url_label} doesn't support filters, polling with eth_blockNumber/eth_getLogs")
+                self.filters_supported = False
+            return None
+
+    async def _filter_changes(self, w3: AsyncWeb3, filter_id: Optional[str], params) -> tuple:
+        """Changes of a filter, recreating it if the node dropped it. Returns (filter_id, changes)"""
+        if filter_id is not None:
+            try:
+                return filter_id, await w3.eth.get_filter_changes(filter_id)
+            except Exception as e:
+                logger.info(f"Filter {filter_id} on {self.url_label} expired or failed ({str(e)}), recreating it")
+        # Heads missed while the old filter was gone show up as a gap of the next head
+        return await self._new_filter(w3, params), []
+
+    async def _poll_heads(self, w3: AsyncWeb3) -> None:
+        if self.filters_supported:
+            self._block_filter, block_hashes = await self._filter_changes(w3, self._block_filter, "latest")
+            if block_hashes:
+                await self._handle_head(w3, await w3.eth.get_block(block_hashes[-1]))
+            if self.filters_supported:
+                return
+        number = await w3.eth.block_number
+        if self.last_block is None or number > self.last_block:
+            await self._handle_head(w3, await w3.eth.get_block(number))
+
+    async def _poll_pending(self, w3: AsyncWeb3) -> None:
+        self._pending_filter, tx_hashes = await self._filter_changes(w3, self._pending_filter, "pending")
+        for tx_hash in tx_hashes:
+            await self._handle_pending(w3, tx_hash)
+
+    async def _poll_logs(self, w3: AsyncWeb3) -> None:
+        if self.filters_supported:
+            for index, (chain, filter_params, callback) in enumerate(self._log_consumers):
+                filter_id, logs = await self._filter_changes(w3, self._log_filters.get(index), filter_params)
+                self._log_filters[index] = filter_id
+                await self._dispatch_logs(w3, chain, callback, logs)
+            if self.filters_supported:
+                return
+        head = await w3.eth.block_number
+        start = head if self._logs_polled_through is None else self._logs_polled_through + 1
+        if start > head:
+            return
+        for chain, filter_params, callback in self._log_consumers:
+            logs = await w3.eth.get_logs({**filter_params, "fromBlock": start, "toBlock": head})
+            await self._dispatch_logs(w3, chain, callback, logs)
+        self._logs_polled_through = head
+
+    async def _dispatch_logs(self, w3: AsyncWeb3, chain: str, callback, logs: List[Any]) -> None:
+        for log in logs:
+            try:
+                await callback(w3, chain, log)
+            except Exception as e:
+                logger.error(f"Log consumer for {chain} failed: {str(e)}")
+
+    async def _session(self) -> None:
+        """Poll until a request fails; run() then retries with backoff"""
+        w3 = self._w3
+        self._block_filter = self._pending_filter = None
+        self._log_filters = {}
+        self.connected = True
+        logger.info(f"Polling {self.url_label} for {', '.join(self.chains)} every {POLL_INTERVAL_SECONDS}s")
+        while True:
+            if self._head_consumers:
+                await self._poll_heads(w3)
+            if self._log_consumers:
+                await self._poll_logs(w3)
+            if self._pending_consumers and self.pending_supported:
+                await self._poll_pending(w3)
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    @property
+    def url_label(self) -> str:
+        """Endpoint without its path (which carries the API key)"""
+        return self.url.split("//", 1)[-1].split("/", 1)[0]
@@ -3,11 +3,14 @@ Receiving module - Detects and processes incoming transactions to monitored addr
 """
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from models import TxHistory, TokenBalance
-from services.notification import notify_transaction_success
+from models import TxHistory, TokenBalance, MonitoredAddress, BackfillJob
+from services import address_index, backfill, sharding
+from services import block_tracker
+from services.block_tracker import normalize_hex
+from services.outbox import enqueue_notification
 from web3 import Web3
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +27,230 @@ def _get_erc20_abi():
     return ERC20_ABI
 
 
+# Rows per IN (...) existence check and per multi-row INSERT
+RECORD_BATCH_SIZE = 1000
+
+# Deposits recorded from the mempool, completed in place once they are seen in a block
+MEMPOOL_STATUSES = ("incoming", "dropped")
+
+# (symbol, decimals) by (chain, token address); a token contract never changes them
+_token_metadata: Dict[Tuple[str, str], Tuple[str, int]] = {}
+
+
+def get_token_metadata(chain: str, token_address: str) -> Tuple[str, int]:
+    """
+    Symbol and decimals of a token: from TOKEN_CONFIG, else from the contract (once
+    per token, then cached). Unreadable tokens are recorded as UNKNOWN with 18 decimals.
+    """
+    key = (chain, token_address.lower())
+    if key in _token_metadata:
+        return _token_metadata[key]
+    # Lazy import to avoid circular dependency
+    from services.swap import TOKEN_CONFIG
+    for symbol, chains in TOKEN_CONFIG.items():
+        info = chains.get(chain) or {}
+        if info.get("token_address") and info["token_address"].lower() == key[1]:
+            _token_metadata[key] = (symbol, info["decimals"])
+            return _token_metadata[key]
+    try:
+        contract = _get_w3_lazy(chain).eth.contract(
+            address=Web3.to_checksum_address(token_address),
+            abi=_get_erc20_abi()
+        )
+        metadata = (contract.functions.symbol().call(), contract.functions.decimals().call())
+    except Exception as e:
+        logger.warning(f"Error getting token info for {token_address}: {str(e)}")
+        metadata = ("UNKNOWN", 18)
+    _token_metadata[key] = metadata
+    return metadata
+
+
+def _insert_new_rows(db: Session, rows: List[Dict[str, Any]]) -> List[TxHistory]:
+    """
+    INSERT ... ON CONFLICT (tx_hash) DO NOTHING RETURNING. Passed as parameter sets, the
+    rows are sent as multi-row INSERTs (insertmanyvalues) from one cached statement.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # No ON CONFLICT: rely on the existence check done by the caller
+        new_rows = [TxHistory(**row) for row in rows]
+        db.add_all(new_rows)
+        db.flush()
+        return new_rows
+    statement = insert(TxHistory).on_conflict_do_nothing(index_elements=["tx_hash"]).returning(TxHistory)
+    return list(db.scalars(statement, rows))
+
+
+def _transfer_fields(chain: str, transfer: Dict[str, Any]) -> Dict[str, Any]:
+    """TxHistory columns describing a transfer (symbol and human-readable amount)"""
+    value = transfer["value"]
+    if transfer.get("token_address"):
+        # ERC20 token transfer
+        symbol, decimals = get_token_metadata(chain, transfer["token_address"])
+        amount = float(value) / (10 ** decimals)
+    else:
+        # Native token (ETH, etc.)
+        symbol = "ETH"
+        amount = float(Web3.from_wei(value, "ether"))
+    return {
+        "from_address": transfer["from_address"],
+        "to_address": transfer["to_address"],
+        "token_symbol": symbol,
+        "amount": amount,
+        "received_amount": amount,
+    }
+
+
+def _block_fields(transfer: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """
+    Status and block columns of a transfer seen in a block. Like our own transactions
+    (see services.confirmation), a deposit is "included" until it is CONFIRMATION_DEPTH
+    blocks deep; advance_confirmations then marks it "success" and sends its
+    notification, and rollback_reorged sends it back to pending if its block is reorged
+    out. Transfers without a block number and hash can't be tracked and are final
+    right away.
+    """
+    block_number = transfer.get("block_number") or None
+    block_hash = normalize_hex(transfer.get("block_hash"))
+    final = block_tracker.CONFIRMATION_DEPTH <= 1 or block_number is None or block_hash is None
+    return {
+        "status": "success" if final else "included",
+        "block_number": block_number,
+        "block_hash": block_hash,
+        "confirmed_at": now if final else None,
+    }
+
+
+def _existing_statuses(db: Session, tx_hashes: List[str]) -> Dict[str, str]:
+    """Status of the given transactions that are already recorded"""
+    existing = {}
+    for start in range(0, len(tx_hashes), RECORD_BATCH_SIZE):
+        existing.update(
+            db.query(TxHistory.tx_hash, TxHistory.status)
+            .filter(TxHistory.tx_hash.in_(tx_hashes[start:start + RECORD_BATCH_SIZE]))
+            .all()
+        )
+    return existing
+
+
+def record_incoming_transfers(db: Session, chain: str, transfers: List[Dict[str, Any]], commit: bool = True) -> List[TxHistory]:
+    """
+    Record a batch of incoming transfers (a block's or a backfill range's detections)
+    with one existence query and one INSERT per RECORD_BATCH_SIZE rows.
+    Transactions that are already recorded are skipped, except deposits first seen in
+    the mempool (see services.mempool), which are completed with the block's data.
+    
+    Args:
+        db: Database session
+        chain: Chain name
+        transfers: Dicts with tx_hash, from_address, to_address, value (wei, or token
+                   base units), block_number, block_hash and token_address (None for native)
+        commit: Commit right away. With False the rows and their outbox notifications
+                are only added to the session, so the caller can commit them together
+                with other changes (see services.outbox).
+    
+    Returns:
+        The newly recorded (or completed) TxHistory rows, "included" until they are
+        CONFIRMATION_DEPTH blocks deep (see _block_fields)
+    """
+    # One row per transaction (tx_hash is unique), first transfer wins. Callers pass
+    # hashes with or without 0x (HexBytes.hex() has none), so they're normalized here.
+    unique = {}
+    for transfer in transfers:
+        unique.setdefault(normalize_hex(transfer["tx_hash"]), transfer)
+    existing = _existing_statuses(db, list(unique))
+    
+    now = datetime.utcnow()
+    rows = []
+    for tx_hash, transfer in unique.items():
+        if tx_hash in existing:
+            continue
+        rows.append(dict(
+            _transfer_fields(chain, transfer),
+            **_block_fields(transfer, now),
+            tx_hash=tx_hash,
+            chain=chain,
+            created_at=now,
+        ))
+    
+    recorded = []
+    for start in range(0, len(rows), RECORD_BATCH_SIZE):
+        recorded += _insert_new_rows(db, rows[start:start + RECORD_BATCH_SIZE])
+    
+    # Mempool sightings, including ones the mempool watcher inserted since the existence check
+    inserted = {row.tx_hash for row in recorded}
+    sighted = [tx_hash for tx_hash, status in existing.items() if status in MEMPOOL_STATUSES]
+    sighted += [row["tx_hash"] for row in rows if row["tx_hash"] not in inserted]
+    for start in range(0, len(sighted), RECORD_BATCH_SIZE):
+        for row in db.query(TxHistory).filter(
+            TxHistory.tx_hash.in_(sighted[start:start + RECORD_BATCH_SIZE]),
+            TxHistory.status.in_(MEMPOOL_STATUSES)
+        ):
+            transfer = unique[row.tx_hash]
+            for column, value in dict(_transfer_fields(chain, transfer), **_block_fields(transfer, now)).items():
+                setattr(row, column, value)
+            recorded.append(row)
+    
+    for row in recorded:
+        logger.info(f"Recorded incoming transaction {row.tx_hash} ({row.status}): {row.amount} {row.token_symbol} to {row.to_address}")
+        if row.status == "success":
+            enqueue_notification(db, "transaction_success", row.tx_hash, row.to_address)
+    
+    if commit:
+        db.commit()
+    return recorded
+
+
+def record_pending_transfers(db: Session, chain: str, transfers: List[Dict[str, Any]]) -> List[TxHistory]:
+    """
+    Record deposits seen in the mempool, with status "incoming" and seen_pending_at,
+    and send their payment_incoming event. Transactions already recorded (from the
+    mempool or from a block) are skipped, so a deposit gets at most one early event
+    and no early event once it is confirmed.
+    
+    Args:
+        db: Database session
+        chain: Chain name
+        transfers: Same dicts as record_incoming_transfers, without block_number
+    
+    Returns:
+        The newly recorded TxHistory rows
+    """
+    # In bloom mode the watcher matched against the filter; confirm against the table
+    monitored = address_index.confirm_monitored(db, chain, [transfer["to_address"] for transfer in transfers])
+    unique = {}
+    for transfer in transfers:
+        if address_index.address_key(transfer["to_address"]) in monitored:
+            unique.setdefault(normalize_hex(transfer["tx_hash"]), transfer)
+    existing = _existing_statuses(db, list(unique))
+    
+    now = datetime.utcnow()
+    rows = [
+        dict(
+            _transfer_fields(chain, transfer),
+            tx_hash=tx_hash,
+            status="incoming",
+            chain=chain,
+            created_at=now,
+            seen_pending_at=now,
+        )
+        for tx_hash, transfer in unique.items() if tx_hash not in existing
+    ]
+    recorded = []
+    for start in range(0, len(rows), RECORD_BATCH_SIZE):
+        recorded += _insert_new_rows(db, rows[start:start + RECORD_BATCH_SIZE])
+    for row in recorded:
+        logger.info(f"Incoming transaction {row.tx_hash} in the mempool: {row.amount} {row.token_symbol} to {row.to_address}")
+        enqueue_notification(db, "payment_incoming", row.tx_hash, row.to_address)
+    
+    db.commit()
+    return recorded
+
+
 def detect_incoming_transaction(
     db: Session,
     tx_hash: str,
@@ -32,7 +259,9 @@ def detect_incoming_transaction(
     to_address: str,
     value: int,
     block_number: int,
-    token_address: Optional[str] = None
+    token_address: Optional[str] = None,
+    commit: bool = True,
+    block_hash: Optional[str] = None
 ) -> Optional[TxHistory]:
     """
     Detect and record an incoming transaction.
@@ -46,232 +275,200 @@ def detect_incoming_transaction(
         value: Transaction value in wei (for native tokens) or token amount
         block_number: Block number
         token_address: Token contract address (None for native token)
+        commit: Commit right away (see record_incoming_transfers)
+        block_hash: Block hash (without it the deposit skips the confirmation depth)
     
     Returns:
-        TxHistory object if transaction was recorded, None otherwise
+        TxHistory object if transaction was recorded (or already existed), None on error
     """
     try:
-        # Check if transaction already exists
-        existing_tx = db.query(TxHistory).filter(TxHistory.tx_hash == tx_hash).first()
-        if existing_tx:
-            logger.debug(f"Transaction {tx_hash} already exists in database")
-            return existing_tx
-        
-        w3 = _get_w3_lazy(chain)
-        
-        # Determine token symbol and amount
-        if token_address:
-            # ERC20 token transfer
-            try:
-                erc20_abi = _get_erc20_abi()
-                contract = w3.eth.contract(
-                    address=Web3.to_checksum_address(token_address),
-                    abi=erc20_abi
-                )
-                decimals = contract.functions.decimals().call()
-                symbol = contract.functions.symbol().call()
-                amount = float(value) / (10 ** decimals)
-            except Exception as e:
-                logger.warning(f"Error getting token info for {token_address}: {str(e)}")
-                symbol = "UNKNOWN"
-                amount = float(value) / (10 ** 18)  # Default to 18 decimals
-        else:
-            # Native token (ETH, etc.)
-            symbol = "ETH" if chain == "ethereum" else "ETH"  # Adjust based on chain
-            amount = float(Web3.from_wei(value, "ether"))
-        
-        # Create transaction record
-        new_tx = TxHistory(
-            from_address=from_address,
-            to_address=to_address,
-            token_symbol=symbol,
-            amount=amount,
-            tx_hash=tx_hash,
-            status="success",  # If we're detecting it, it's already confirmed
-            chain=chain
-        )
-        
-        db.add(new_tx)
-        db.commit()
-        db.refresh(new_tx)
-        
-        logger.info(f"Recorded incoming transaction {tx_hash}: {amount} {symbol} to {to_address}")
-        
-        # Send notification to recipient
-        try:
-            notify_transaction_success(new_tx, to_address)
-        except Exception as e:
-            logger.error(f"Error sending notification for incoming tx {tx_hash}: {str(e)}")
-        
-        return new_tx
-        
+        recorded = record_incoming_transfers(db, chain, [{
+            "tx_hash": tx_hash,
+            "from_address": from_address,
+            "to_address": to_address,
+            "value": value,
+            "block_number": block_number,
+            "block_hash": block_hash,
+            "token_address": token_address,
+        }], commit=commit)
+        if recorded:
+            return recorded[0]
+        logger.debug(f"Transaction {tx_hash} already exists in database")
+        return db.query(TxHistory).filter(TxHistory.tx_hash == normalize_hex(tx_hash)).first()
     except Exception as e:
         logger.error(f"Error detecting incoming transaction {tx_hash}: {str(e)}")
-        db.rollback()
+        if commit:
+            db.rollback()
         return None
 
 
-def process_block_transactions(db: Session, block_transactions: List[Dict], chain: str, monitored_addresses: List[str]) -> int:
+def _topic_to_address(topic) -> str:
+    """Extract the checksum address from an indexed address topic (str or HexBytes)"""
+    topic_hex = topic.hex() if hasattr(topic, 'hex') else str(topic)
+    return Web3.to_checksum_address('0x' + topic_hex[-40:])
+
+
+def process_block_transactions(
+    db: Session,
+    block_transactions: List[Dict],
+    chain: str,
+    transfer_logs: Optional[List[Dict]] = None,
+    commit: bool = True
+) -> int:
     """
     Process transactions in a block and detect incoming transactions to monitored addresses.
+    All of the block's detections are recorded together (see record_incoming_transfers).
     
     Args:
         db: Database session
         block_transactions: List of transaction dictionaries from the block
         chain: Chain name
-        monitored_addresses: List of addresses to monitor for incoming transactions
+        transfer_logs: ERC20 Transfer logs of the block, from eth_getLogs
+                       (see services.token_transfers)
+        commit: Commit the detections right away (see record_incoming_transfers)
     
     Returns:
         Number of incoming transactions detected
     """
-    if not monitored_addresses:
+    if not address_index.has_addresses(chain):
         return 0
     
-    detected_count = 0
-    w3 = _get_w3_lazy(chain)
-    
-    # Normalize monitored addresses to checksum format
-    monitored_checksum = [Web3.to_checksum_address(addr) for addr in monitored_addresses]
+    # Confirm the recipients of this block against the monitored addresses in one go
+    # (in-memory, or a batched IN (...) query when the index is a Bloom filter)
+    transfer_logs = [log for log in transfer_logs or [] if len(log['topics']) > 2]
+    monitored = address_index.confirm_monitored(
+        db, chain,
+        [tx.get('to') for tx in block_transactions if tx.get('to')] + [log['topics'][2] for log in transfer_logs]
+    )
     
+    transfers = []
     for tx in block_transactions:
         try:
-            tx_hash = tx['hash'].hex() if hasattr(tx['hash'], 'hex') else tx['hash']
             to_address = tx.get('to')
-            from_address = tx.get('from')
             value = tx.get('value', 0)
             
-            # Check if this is an incoming transaction to a monitored address
-            if to_address and Web3.to_checksum_address(to_address) in monitored_checksum:
-                # Native token transfer
-                if value > 0:
-                    detect_incoming_transaction(
-                        db=db,
-                        tx_hash=tx_hash,
-                        chain=chain,
-                        from_address=from_address,
-                        to_address=to_address,
-                        value=value,
-                        block_number=tx.get('blockNumber', 0),
-                        token_address=None
-                    )
-                    detected_count += 1
-                
-                # Check for ERC20 token transfers in transaction logs
-                if tx.get('logs'):
-                    for log in tx['logs']:
-                        # ERC20 Transfer event signature: Transfer(address,address,uint256)
-                        # topics[0] = event signature
-                        # topics[1] = from address (indexed)
-                        # topics[2] = to address (indexed)
-                        # data = amount (uint256)
-                        if len(log.get('topics', [])) == 3 and log.get('topics', [])[0].hex() == '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef':
-                            try:
-                                # Extract sender from topics[1] (actual token sender, not transaction sender)
-                                sender = '0x' + log['topics'][1].hex()[-40:] if hasattr(log['topics'][1], 'hex') else log['topics'][1][-20:].hex()
-                                sender_checksum = Web3.to_checksum_address(sender)
-                                
-                                # Extract recipient from topics[2]
-                                recipient = '0x' + log['topics'][2].hex()[-40:] if hasattr(log['topics'][2], 'hex') else log['topics'][2][-20:].hex()
-                                recipient_checksum = Web3.to_checksum_address(recipient)
-                                
-                                if recipient_checksum in monitored_checksum:
-                                    token_address = log.get('address')
-                                    # Extract amount from data
-                                    amount_hex = log.get('data', '0x0')
-                                    amount = int(amount_hex, 16) if amount_hex != '0x0' else 0
-                                    
-                                    if amount > 0:
-                                        detect_incoming_transaction(
-                                            db=db,
-                                            tx_hash=tx_hash,
-                                            chain=chain,
-                                            from_address=sender_checksum,  # Use token sender from event, not transaction sender
-                                            to_address=recipient_checksum,
-                                            value=amount,
-                                            block_number=tx.get('blockNumber', 0),
-                                            token_address=token_address
-                                        )
-                                        detected_count += 1
-                            except Exception as e:
-                                logger.warning(f"Error processing ERC20 transfer log: {str(e)}")
-                                continue
-                                
+            # Native token transfer to a monitored address
+            if to_address and value > 0 and address_index.address_key(to_address) in monitored:
+                transfers.append({
+                    # Same form as the mempool watcher's sightings (HexBytes.hex() has no 0x)
+                    "tx_hash": normalize_hex(tx['hash']),
+                    "from_address": tx.get('from'),
+                    "to_address": to_address,
+                    "value": value,
+                    "block_number": tx.get('blockNumber', 0),
+                    "block_hash": tx.get('blockHash'),
+                    "token_address": None,
+                })
         except Exception as e:
             logger.error(f"Error processing transaction in block: {str(e)}")
             continue
     
-    return detected_count
+    # ERC20 token transfers, from the block's Transfer logs
+    # topics[0] = event signature, topics[1] = from (indexed), topics[2] = to (indexed), data = amount
+    for log in transfer_logs:
+        try:
+            if address_index.address_key(log['topics'][2]) not in monitored:
+                continue
+            amount_hex = log.get('data') or '0x0'
+            amount = int(amount_hex, 16) if amount_hex not in ('0x', '0x0') else 0
+            if amount > 0:
+                transfers.append({
+                    "tx_hash": log['transactionHash'],
+                    "from_address": _topic_to_address(log['topics'][1]),  # Token sender from the event, not the tx sender
+                    "to_address": _topic_to_address(log['topics'][2]),
+                    "value": amount,
+                    "block_number": log.get('blockNumber') or 0,
+                    "block_hash": log.get('blockHash'),
+                    "token_address": log.get('address'),
+                })
+        except Exception as e:
+            logger.warning(f"Error processing ERC20 transfer log: {str(e)}")
+            continue
+    
+    # With sharded workers, only record the addresses of this worker's shard
+    transfers = [transfer for transfer in transfers if sharding.owns(transfer["to_address"])]
+    if not transfers:
+        return 0
+    return len(record_incoming_transfers(db, chain, transfers, commit=commit))
 
 
-def get_monitored_addresses(db: Session) -> List[str]:
+def get_monitored_addresses(db: Session, chain: Optional[str] = None) -> List[MonitoredAddress]:
     """
-    Get list of addresses that should be monitored for incoming transactions.
-    This can be extended to use a dedicated table for monitored addresses.
-    For now, we'll use addresses from TxHistory where this address is the recipient.
+    Get the active monitored addresses.
     
     Args:
         db: Database session
+        chain: Only addresses monitored on this chain (or on all chains)
     
     Returns:
-        List of unique addresses to monitor
+        List of MonitoredAddress rows
     """
-    # Get all unique recipient addresses from transaction history
-    # In a production system, you might want a dedicated MonitoredAddress table
-    addresses = db.query(TxHistory.to_address).distinct().all()
-    return [addr[0] for addr in addresses if addr[0]]
+    query = db.query(MonitoredAddress).filter(MonitoredAddress.active.is_(True))
+    if chain:
+        query = query.filter(MonitoredAddress.chain.in_([chain, address_index.ALL_CHAINS]))
+    return query.order_by(MonitoredAddress.created_at).all()
+
 
+def add_monitored_address(db: Session, address: str, chain: Optional[str] = None) -> MonitoredAddress:
+    """Start monitoring an address (re-activating it if it was removed)"""
+    address = address_index.normalize_address(address)
+    chain = chain or address_index.ALL_CHAINS
+    monitored = db.query(MonitoredAddress).filter(
+        MonitoredAddress.address == address, MonitoredAddress.chain == chain
+    ).first()
+    if monitored is None:
+        monitored = MonitoredAddress(address=address, chain=chain)
+        db.add(monitored)
+    monitored.active = True
+    monitored.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(monitored)
+    address_index.refresh(db)
+    return monitored
 
-def check_address_for_incoming(db: Session, address: str, chain: str, from_block: Optional[int] = None) -> List[TxHistory]:
+
+def remove_monitored_address(db: Session, address: str, chain: Optional[str] = None) -> bool:
+    """Stop monitoring an address; returns False if it wasn't monitored"""
+    monitored = db.query(MonitoredAddress).filter(
+        MonitoredAddress.address == address_index.normalize_address(address),
+        MonitoredAddress.chain == (chain or address_index.ALL_CHAINS),
+        MonitoredAddress.active.is_(True)
+    ).first()
+    if monitored is None:
+        return False
+    monitored.active = False
+    monitored.updated_at = datetime.utcnow()
+    db.commit()
+    address_index.refresh(db)
+    return True
+
+
+def check_address_for_incoming(db: Session, address: str, chain: str, from_block: Optional[int] = None) -> BackfillJob:
     """
-    Check a specific address for incoming transactions.
-    Useful for manual checks or initial sync.
+    Start a background scan of an address for incoming transactions (native and ERC20).
+    Useful for manual checks or initial sync; progress is tracked on the returned job
+    (see services.backfill).
     
     Args:
         db: Database session
         address: Address to check
         chain: Chain name
-        from_block: Block number to start from (None = latest)
+        from_block: Block number to start from (None = the last 100 blocks)
     
     Returns:
-        List of detected incoming transactions
+        The queued BackfillJob
+    
+    Raises:
+        ValueError: If the range is longer than BACKFILL_MAX_BLOCKS
     """
-    try:
-        w3 = _get_w3_lazy(chain)
-        address_checksum = Web3.to_checksum_address(address)
-        
-        if from_block is None:
-            from_block = w3.eth.block_number - 100  # Check last 100 blocks
-        
-        detected = []
-        
-        # Get transactions from the address (sent transactions)
-        # Note: This is a simplified check. For production, you'd want to use event logs
-        for block_num in range(from_block, w3.eth.block_number + 1):
-            try:
-                block = w3.eth.get_block(block_num, full_transactions=True)
-                for tx in block.get('transactions', []):
-                    if tx.get('to') and Web3.to_checksum_address(tx['to']) == address_checksum:
-                        # Native token received
-                        if tx.get('value', 0) > 0:
-                            incoming_tx = detect_incoming_transaction(
-                                db=db,
-                                tx_hash=tx['hash'].hex(),
-                                chain=chain,
-                                from_address=tx.get('from'),
-                                to_address=address_checksum,
-                                value=tx.get('value', 0),
-                                block_number=block_num,
-                                token_address=None
-                            )
-                            if incoming_tx:
-                                detected.append(incoming_tx)
-            except Exception as e:
-                logger.warning(f"Error checking block {block_num}: {str(e)}")
-                continue
-        
-        return detected
-        
-    except Exception as e:
-        logger.error(f"Error checking address {address} for incoming transactions: {str(e)}")
-        return []
-
+    w3 = _get_w3_lazy(chain)
+    latest_block = w3.eth.block_number
+    if from_block is None:
+        from_block = latest_block - 100  # Check last 100 blocks
+    from_block = max(0, from_block)
+    if latest_block - from_block + 1 > backfill.BACKFILL_MAX_BLOCKS:
+        raise ValueError(f"Block range too large: at most {backfill.BACKFILL_MAX_BLOCKS} blocks can be checked at once")
+    
+    job = backfill.create_job(db, Web3.to_checksum_address(address), chain, from_block, latest_block)
+    backfill.start_job(job.id)
+    return job
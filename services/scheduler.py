@@ -0,0 +1,151 @@
+"""
+Scheduler - leader-elected background jobs for multi-instance deployments.
+
+With App Engine autoscaling every instance starts the same BackgroundScheduler.
+Jobs that touch shared state (DB rows, RPC quota) are registered with
+add_leader_job: on each run they first make sure this process holds a Postgres
+session-level advisory lock, so only one instance does the work. The lock is
+held on a dedicated connection. Stepping down unlocks it before the connection goes
+back to the pool (or, if that fails, discards the connection so its session ends);
+Postgres also releases it when the instance goes away. Another instance then takes over.
+
+Each job also carries an overlap guard (a run is skipped while the previous one
+is still going) and an optional time budget passed to the job as a deadline.
+"""
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import text
+from database import engine
+from typing import Callable, Optional
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key shared by every instance of the service
+SCHEDULER_LOCK_KEY = int(os.getenv("SCHEDULER_LOCK_KEY", "727100001"))
+
+
+class LeaderElection:
+    """Holds (or tries to acquire) a Postgres advisory lock on a dedicated connection"""
+
+    def __init__(self, bind=engine, lock_key: int = SCHEDULER_LOCK_KEY):
+        self.bind = bind
+        self.lock_key = lock_key
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _release_connection(self):
+        """
+        Release the advisory lock and the connection holding it. Closing alone would
+        return the connection to the pool with the session-level lock still held.
+        """
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key})
+            self._conn.commit()
+            self._conn.close()
+        except Exception:
+            # Broken connection: drop it from the pool so the session (and the lock) ends
+            try:
+                self._conn.invalidate()
+            except Exception:
+                pass
+        self._conn = None
+
+    def is_leader(self) -> bool:
+        """
+        Check leadership, acquiring the lock if nobody holds it.
+        Non-Postgres databases (local development) have a single instance, which is always leader.
+        """
+        if self.bind.dialect.name != "postgresql":
+            return True
+        with self._lock:
+            try:
+                if self._conn is not None:
+                    # Still leader as long as the connection holding the lock is alive
+                    self._conn.execute(text("SELECT 1"))
+                    # End the probe's transaction so the connection isn't left idle in transaction
+                    self._conn.commit()
+                    return True
+                conn = self.bind.connect()
+                acquired = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key}
+                ).scalar()
+                conn.commit()
+                if acquired:
+                    self._conn = conn
+                    logger.info(f"Acquired scheduler leadership (advisory lock {self.lock_key})")
+                    return True
+                conn.close()
+                return False
+            except Exception as e:
+                logger.warning(f"Lost scheduler leadership: {str(e)}")
+                self._release_connection()
+                return False
+
+    def release(self):
+        """Give up leadership (on shutdown)"""
+        with self._lock:
+            self._release_connection()
+
+
+leader = LeaderElection()
+
+
+def guarded_job(func: Callable, job_id: str, leader_only: bool = True, budget_seconds: Optional[float] = None) -> Callable:
+    """
+    Wrap a job with the leader check, an overlap guard and a time budget.
+
+    Args:
+        func: Job function; it receives `deadline` (a time.monotonic() value) when a budget is set
+        job_id: Job name used in logs
+        leader_only: Only run on the instance holding the leader lock
+        budget_seconds: Time budget for one run
+
+    Returns:
+        Callable to register with the scheduler
+    """
+    running = threading.Lock()
+
+    def run():
+        if leader_only and not leader.is_leader():
+            logger.debug(f"Skipping {job_id}: not the scheduler leader")
+            return
+        if not running.acquire(blocking=False):
+            logger.warning(f"Skipping {job_id}: previous run still in progress")
+            return
+        started = time.monotonic()
+        try:
+            if budget_seconds:
+                func(deadline=started + budget_seconds)
+            else:
+                func()
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+        finally:
+            running.release()
+            elapsed = time.monotonic() - started
+            if budget_seconds and elapsed > budget_seconds:
+                logger.warning(f"Job {job_id} ran {elapsed:.1f}s, over its {budget_seconds}s budget")
+
+    return run
+
+
+def add_leader_job(scheduler, func: Callable, seconds: int, job_id: str, leader_only: bool = True, budget_seconds: Optional[float] = None):
+    """
+    Register an interval job that runs at most once at a time and, by default,
+    only on the leader instance. Missed runs are coalesced into one.
+    """
+    scheduler.add_job(
+        guarded_job(func, job_id, leader_only=leader_only, budget_seconds=budget_seconds),
+        trigger=IntervalTrigger(seconds=seconds),
+        id=job_id,
+        name=job_id,
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=seconds,
+    )
@@ -0,0 +1,234 @@
+"""
+Address sharding - splits the monitored addresses across ingestion workers.
+
+With SHARD_WORKERS=true every worker receives the full block stream, but only
+looks for the deposits of the addresses it owns: its eth_getLogs Transfer filters
+(and the logsBloom pre-screen) cover only its shard's recipients, and only the
+coordinator fetches receipts for our pending txs. Block bodies, when native deposits
+are scanned, can't be split by address and are fetched by every worker that owns
+any; in bloom mode the addresses aren't held, so logs are filtered by token contract
+and matched locally. Ownership comes from a consistent
+hash ring over the live workers (SHARD_VIRTUAL_NODES points each), keyed on the
+address bytes, so a worker joining or leaving only moves its neighbours' share.
+
+Membership is a lease per worker in the worker_leases table, renewed by heartbeat();
+a lease not renewed for WORKER_LEASE_TTL_SECONDS expires and its worker drops out
+of the ring. Work that isn't per address (our pending txs, confirmations, reorg
+rollbacks) is done by the coordinator only: the owner of a fixed ring position.
+
+Each worker has its own chain cursor. When a worker leaves, the others rewind
+to its cursor so the blocks it hadn't processed yet are scanned for the addresses
+they inherit (deposits are recorded once per tx_hash, so re-scanning is safe).
+A joining worker starts from the lowest cursor of the live workers.
+WORKER_ID must be set (and stable across restarts) when sharding, so a restarted
+worker keeps its cursor instead of leaving a stale one behind.
+"""
+from sqlalchemy.orm import Session
+from models import WorkerLease, ChainCursor
+from database import SessionLocal
+from services import address_index
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+import bisect
+import hashlib
+import socket
+import threading
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHARDING_ENABLED = os.getenv("SHARD_WORKERS", "false").lower() == "true"
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+if SHARDING_ENABLED and not os.getenv("WORKER_ID"):
+    # A per-process fallback id would change on every restart and orphan this worker's cursors
+    raise RuntimeError("SHARD_WORKERS=true requires WORKER_ID, a stable id for this worker")
+WORKER_LEASE_TTL_SECONDS = int(os.getenv("WORKER_LEASE_TTL_SECONDS", "30"))
+SHARD_HEARTBEAT_SECONDS = int(os.getenv("SHARD_HEARTBEAT_SECONDS", "10"))
+SHARD_VIRTUAL_NODES = int(os.getenv("SHARD_VIRTUAL_NODES", "64"))
+
+# Ring position whose owner does the non-sharded work
+COORDINATOR_KEY = b"coordinator"
+
+
+def _hash(data: bytes) -> int:
+    """Stable 64-bit hash (the same in every process, unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hash ring of worker ids"""
+
+    def __init__(self, workers: List[str]):
+        self.workers = sorted(set(workers))
+        points = sorted(
+            (_hash(f"{worker}#{i}".encode()), worker)
+            for worker in self.workers
+            for i in range(SHARD_VIRTUAL_NODES)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [worker for _, worker in points]
+
+    def owner(self, key: bytes) -> Optional[str]:
+        """Worker owning a key: the first ring point at or after the key's hash"""
+        if not self._owners:
+            return None
+        index = bisect.bisect_left(self._hashes, _hash(key)) % len(self._owners)
+        return self._owners[index]
+
+
+_lock = threading.Lock()
+_ring = HashRing([WORKER_ID])
+# Last owned_keys() result: (ring, worker id, keys) it was computed for, and the owned keys
+_owned_cache: Optional[tuple] = None
+_rewinds: Dict[str, int] = {}  # chain -> block to re-process from, after a worker left
+
+
+def cursor_name(chain: str) -> str:
+    """Name of this worker's cursor for a chain"""
+    return f"{chain}@{WORKER_ID}" if SHARDING_ENABLED else chain
+
+
+def _worker_cursors(db: Session, chain: str, workers: List[str]) -> List[int]:
+    names = [f"{chain}@{worker}" for worker in workers]
+    return [number for (number,) in db.query(ChainCursor.block_number).filter(ChainCursor.chain.in_(names)) if number is not None]
+
+
+def heartbeat(db: Session = None) -> List[str]:
+    """
+    Renew this worker's lease, expire stale ones and rebuild the ring if the
+    membership changed.
+
+    Returns:
+        The live worker ids
+    """
+    global _ring
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        lease = db.query(WorkerLease).filter(WorkerLease.worker_id == WORKER_ID).first()
+        if lease is None:
+            lease = WorkerLease(worker_id=WORKER_ID, started_at=now)
+            db.add(lease)
+        lease.heartbeat_at = now
+        db.query(WorkerLease).filter(
+            WorkerLease.heartbeat_at < now - timedelta(seconds=WORKER_LEASE_TTL_SECONDS)
+        ).delete(synchronize_session=False)
+        db.commit()
+        workers = sorted(worker_id for (worker_id,) in db.query(WorkerLease.worker_id))
+
+        with _lock:
+            previous = _ring.workers
+        if workers == previous:
+            return workers
+        left = [worker for worker in previous if worker not in workers]
+        if left:
+            # Re-process what the departed workers hadn't reached, for the addresses we inherit
+            for (chain,) in db.query(ChainCursor.chain).filter(ChainCursor.chain.like(f"%@{WORKER_ID}")):
+                chain = chain[:-len(f"@{WORKER_ID}")]
+                cursors = _worker_cursors(db, chain, left)
+                if cursors:
+                    rewind = min(cursors) + 1
+                    with _lock:
+                        _rewinds[chain] = min(rewind, _rewinds.get(chain, rewind))
+        with _lock:
+            _ring = HashRing(workers)
+        logger.info(f"Worker {WORKER_ID}: shard ring is now {', '.join(workers)} (left: {', '.join(left) or 'none'})")
+        return workers
+    finally:
+        if own_session:
+            db.close()
+
+
+def release(db: Session = None) -> None:
+    """Give up this worker's lease (on shutdown), so the others take over its share right away"""
+    if not SHARDING_ENABLED:
+        return
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        db.query(WorkerLease).filter(WorkerLease.worker_id == WORKER_ID).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error releasing worker lease: {str(e)}")
+    finally:
+        if own_session:
+            db.close()
+
+
+def initial_cursor(db: Session, chain: str) -> Optional[int]:
+    """
+    Block this worker resumes after: its own cursor, or for a worker new to the
+    ring the lowest cursor of the live workers (falling back to the unsharded cursor).
+    """
+    own = db.query(ChainCursor.block_number).filter(ChainCursor.chain == cursor_name(chain)).scalar()
+    if own is not None or not SHARDING_ENABLED:
+        return own
+    live = [worker_id for (worker_id,) in db.query(WorkerLease.worker_id) if worker_id != WORKER_ID]
+    cursors = _worker_cursors(db, chain, live)
+    if cursors:
+        return min(cursors)
+    return db.query(ChainCursor.block_number).filter(ChainCursor.chain == chain).scalar()
+
+
+def take_rewind(chain: str) -> Optional[int]:
+    """Block to re-process a chain from, once after a worker left"""
+    with _lock:
+        return _rewinds.pop(chain, None)
+
+
+def owns(address) -> bool:
+    """Whether this worker records the deposits of an address"""
+    if not SHARDING_ENABLED:
+        return True
+    key = address_index.address_key(address)
+    if key is None:
+        return False
+    with _lock:
+        return _ring.owner(key) == WORKER_ID
+
+
+def owned_keys(keys: Set[bytes]) -> Set[bytes]:
+    """
+    The address keys of this worker's shard (every key when not sharded). The result
+    is kept until the ring or the keys change, since it is asked for every block.
+    """
+    global _owned_cache
+    if not SHARDING_ENABLED:
+        return keys
+    with _lock:
+        ring = _ring
+        cached = _owned_cache
+    if cached is not None and cached[0] is ring and cached[1] == WORKER_ID and cached[2] == keys:
+        return cached[3]
+    owned = {key for key in keys if ring.owner(key) == WORKER_ID}
+    with _lock:
+        _owned_cache = (ring, WORKER_ID, set(keys), owned)
+    return owned
+
+
+def owns_any(chain: str) -> bool:
+    """Whether this worker's shard has any address monitored on a chain"""
+    if not SHARDING_ENABLED:
+        return address_index.has_addresses(chain)
+    keys = address_index.monitored_keys(chain)
+    if keys is None:
+        # Bloom mode: the addresses aren't held, so any worker may own some
+        return address_index.has_addresses(chain)
+    return bool(owned_keys(keys))
+
+
+def is_coordinator() -> bool:
+    """Whether this worker does the non-sharded block work"""
+    if not SHARDING_ENABLED:
+        return True
+    with _lock:
+        return _ring.owner(COORDINATOR_KEY) == WORKER_ID
+
+
+def ring_workers() -> List[str]:
+    with _lock:
+        return list(_ring.workers)
@@ -0,0 +1,187 @@
+"""
+Pool of authenticated SMTP connections for email notifications.
+
+Connecting, STARTTLS and login cost several round trips, so connections are kept
+open and reused: at most SMTP_POOL_SIZE at a time, shared by the threads that send
+email. A connection idle for more than SMTP_HEALTHCHECK_SECONDS is checked with a
+NOOP before it is reused, one idle for more than SMTP_IDLE_SECONDS is closed (servers
+drop idle clients anyway), and one that sent SMTP_MAX_MESSAGES_PER_CONNECTION
+messages is replaced. A send that finds its connection dropped reconnects and
+sends again once.
+
+send_messages sends a list of messages over one connection; the notification
+service collects the emails of concurrent events into such lists (SMTP_BATCH_SIZE).
+"""
+from email.message import Message
+from contextlib import contextmanager
+from typing import List, Optional
+import smtplib
+import threading
+import queue
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "10"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "8"))
+SMTP_HEALTHCHECK_SECONDS = float(os.getenv("SMTP_HEALTHCHECK_SECONDS", "30"))
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "240"))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+
+
+def _connection_lost(error: OSError) -> bool:
+    """Whether an error means the connection is gone rather than the message was refused (SMTPException is an OSError too)"""
+    return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException)
+
+
+class _Connection:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+        self.broken = False
+
+    def close(self) -> None:
+        try:
+            self.smtp.quit()
+        except Exception:
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+
+class SMTPPool:
+    """Up to `size` open connections; callers beyond that wait for a free one"""
+
+    def __init__(self, size: int = SMTP_POOL_SIZE):
+        self._idle: "queue.LifoQueue[_Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connects = 0
+
+    def _connect(self) -> _Connection:
+        smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT_SECONDS)
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USER:
+            smtp.login(SMTP_USER, SMTP_PASSWORD)
+        self.connects += 1
+        return _Connection(smtp)
+
+    def _healthy(self, connection: _Connection) -> bool:
+        idle = time.monotonic() - connection.last_used
+        if idle > SMTP_IDLE_SECONDS or connection.sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+            return False
+        if idle <= SMTP_HEALTHCHECK_SECONDS:
+            return True
+        try:
+            return connection.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> _Connection:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._healthy(connection):
+                return connection
+            connection.close()
+
+    @contextmanager
+    def connection(self):
+        """A healthy connection for the duration of the block; it's returned to the pool unless it broke"""
+        self._slots.acquire()
+        connection: Optional[_Connection] = None
+        try:
+            connection = self._checkout()
+            yield connection
+        except Exception:
+            if connection is not None:
+                connection.close()
+                connection = None
+            raise
+        finally:
+            if connection is not None and connection.broken:
+                connection.close()
+            elif connection is not None:
+                connection.last_used = time.monotonic()
+                self._idle.put(connection)
+            self._slots.release()
+
+    def _reconnect(self, connection: _Connection) -> None:
+        connection.close()
+        fresh = self._connect()
+        connection.smtp, connection.sent = fresh.smtp, 0
+
+    def send_messages(self, messages: List[Message]) -> List[bool]:
+        """
+        Send messages over one connection, in order.
+
+        Returns:
+            Whether each message was accepted
+        """
+        results = []
+        with self.connection() as connection:
+            for message in messages:
+                for attempt in range(2):
+                    try:
+                        if connection.sent >= SMTP_MAX_MESSAGES_PER_CONNECTION:
+                            self._reconnect(connection)
+                        connection.smtp.send_message(message)
+                        connection.sent += 1
+                        results.append(True)
+                        break
+                    except OSError as e:
+                        if not _connection_lost(e):
+                            logger.error(f"Email to {message['To']} refused: {str(e)}")
+                            results.append(False)
+                            break
+                        if attempt == 0:
+                            logger.warning(f"SMTP connection lost, reconnecting: {str(e)}")
+                            try:
+                                self._reconnect(connection)
+                                continue
+                            except Exception as e:
+                                logger.error(f"SMTP reconnect failed: {str(e)}")
+                        # The server can't be reached: fail this message and the rest
+                        connection.broken = True
+                        return results + [False] * (len(messages) - len(results))
+                    except Exception as e:
+                        logger.error(f"Email to {message['To']} could not be sent: {str(e)}")
+                        results.append(False)
+                        break
+        return results
+
+    def close(self) -> None:
+        """Close the idle connections (on shutdown)"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool: Optional[SMTPPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPPool()
+        return _pool
+
+
+def send_messages(messages: List[Message]) -> List[bool]:
+    """Send messages over one of the shared pool's connections"""
+    return get_pool().send_messages(messages)
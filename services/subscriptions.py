@@ -0,0 +1,175 @@
+"""
+Subscription manager - one resilient WebSocket per distinct RPC endpoint.
+
+Chains that share an endpoint (sepolia/insoblok both use SEPOLIA_WS_URL) share a
+single socket: `newHeads` (and `newPendingTransactions`, when a chain watches the
+mempool) is subscribed once and `logs` subscriptions are multiplexed onto the same
+connection, with results fanned out to the chain consumers registered on the manager.
+
+When the socket drops the manager reconnects with exponential backoff and jitter.
+Heads are dispatched in order: if the next head skips numbers (after a reconnect,
+a restart resumed from the chain cursor, or a failed block) the missing range is
+handed to the consumer's backfill callback, or replayed head by head, first.
+A head whose consumer failed is not counted as processed, so it is retried
+as part of the next head's gap.
+"""
+from web3 import AsyncWeb3
+from web3.middleware import ExtraDataToPOAMiddleware
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import random
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the backoff between reconnect attempts
+RECONNECT_MAX_SECONDS = int(os.getenv("WATCHER_RECONNECT_MAX_SECONDS", "60"))
+# Larger gaps are not replayed head by head (consumers with a backfill callback catch up fully)
+BACKFILL_MAX_BLOCKS = int(os.getenv("SUBSCRIPTION_BACKFILL_MAX_BLOCKS", "500"))
+
+# callback(w3, chain, payload)
+Consumer = Callable[[AsyncWeb3, str, Any], Awaitable[None]]
+# backfill(w3, chain, start, end): process blocks [start, end)
+Backfill = Callable[[AsyncWeb3, str, int, int], Awaitable[None]]
+
+
+class SubscriptionManager:
+    """Owns the WebSocket connection of one endpoint and its subscriptions"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.connected = False
+        self.last_block: Optional[int] = None
+        self._head_consumers: Dict[str, Consumer] = {}
+        self._backfills: Dict[str, Backfill] = {}
+        self._log_consumers: List[Tuple[str, Dict[str, Any], Consumer]] = []
+        self._pending_consumers: Dict[str, Consumer] = {}
+
+    def add_head_consumer(self, chain: str, callback: Consumer, backfill: Optional[Backfill] = None) -> None:
+        """
+        Call `callback(w3, chain, header)` for every new head.
+        `backfill(w3, chain, start, end)` processes a missed range in bulk, if given.
+        """
+        self._head_consumers[chain] = callback
+        if backfill:
+            self._backfills[chain] = backfill
+
+    def resume_from(self, block_number: int) -> None:
+        """Treat `block_number` as the last processed head (e.g. from a persisted cursor)"""
+        if self.last_block is None or block_number < self.last_block:
+            self.last_block = block_number
+
+    def add_log_consumer(self, chain: str, filter_params: Dict[str, Any], callback: Consumer) -> None:
+        """Call `callback(w3, chain, log)` for every log matching an eth_subscribe('logs') filter"""
+        self._log_consumers.append((chain, filter_params, callback))
+
+    def add_pending_consumer(self, chain: str, callback: Consumer) -> None:
+        """Call `callback(w3, chain, tx_hash)` for every transaction entering the node's mempool"""
+        self._pending_consumers[chain] = callback
+
+    async def _handle_pending(self, w3: AsyncWeb3, tx_hash) -> None:
+        for chain, callback in list(self._pending_consumers.items()):
+            try:
+                await callback(w3, chain, tx_hash)
+            except Exception as e:
+                logger.error(f"Pending tx consumer for {chain} failed: {str(e)}")
+
+    async def _backfill(self, w3: AsyncWeb3, chain: str, callback: Consumer, start: int, end: int) -> None:
+        """Process the missed blocks [start, end) for one consumer"""
+        if chain in self._backfills:
+            await self._backfills[chain](w3, chain, start, end)
+            return
+        if end - start > BACKFILL_MAX_BLOCKS:
+            logger.warning(f"Missed {end - start} blocks on {chain}; replaying only the last {BACKFILL_MAX_BLOCKS}")
+            start = end - BACKFILL_MAX_BLOCKS
+        for number in range(start, end):
+            await callback(w3, chain, await w3.eth.get_block(number))
+
+    async def _handle_head(self, w3: AsyncWeb3, header) -> None:
+        number = header["number"]
+        gap_start = self.last_block + 1 if self.last_block is not None and number > self.last_block + 1 else None
+        failed = False
+        for chain, callback in list(self._head_consumers.items()):
+            try:
+                if gap_start is not None:
+                    logger.info(f"Backfilling {chain} blocks {gap_start}-{number - 1}")
+                    await self._backfill(w3, chain, callback, gap_start, number)
+                await callback(w3, chain, header)
+            except Exception as e:
+                failed = True
+                logger.error(f"Head consumer for {chain} failed on block {number}: {str(e)}")
+        if not failed:
+            self.last_block = number if self.last_block is None else max(self.last_block, number)
+
+    async def _session(self) -> None:
+        """One connection lifetime: subscribe everything, then process messages until it drops"""
+        async with AsyncWeb3(AsyncWeb3.WebSocketProvider(self.url, websocket_kwargs={'max_size': 10 * 1024 * 1024})) as w3:
+            w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+            handlers: Dict[str, Tuple[str, Optional[str], Optional[Consumer]]] = {}
+            if self._head_consumers:
+                handlers[await w3.eth.subscribe("newHeads")] = ("head", None, None)
+            for chain, filter_params, callback in self._log_consumers:
+                handlers[await w3.eth.subscribe("logs", filter_params)] = ("log", chain, callback)
+            if self._pending_consumers:
+                handlers[await w3.eth.subscribe("newPendingTransactions")] = ("pending", None, None)
+            self.connected = True
+            logger.info(f"Subscribed to {len(handlers)} stream(s) for {', '.join(self.chains)}")
+
+            async for response in w3.socket.process_subscriptions():
+                kind, chain, callback = handlers.get(response.get("subscription"), (None, None, None))
+                if kind == "head":
+                    await self._handle_head(w3, response["result"])
+                elif kind == "pending":
+                    await self._handle_pending(w3, response["result"])
+                elif kind == "log":
+                    try:
+                        await callback(w3, chain, response["result"])
+                    except Exception as e:
+                        logger.error(f"Log consumer for {chain} failed: {str(e)}")
+
+    @property
+    def chains(self) -> List[str]:
+        return sorted(
+            set(self._head_consumers) | set(self._pending_consumers) | {chain for chain, _, _ in self._log_consumers}
+        )
+
+    async def run(self) -> None:
+        """Keep the connection up forever, reconnecting with exponential backoff and jitter"""
+        delay = 1
+        while True:
+            started = time.monotonic()
+            try:
+                await self._session()
+                logger.warning(f"Subscription stream for {', '.join(self.chains)} closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Subscription stream for {', '.join(self.chains)} failed: {str(e)}")
+            finally:
+                self.connected = False
+            # A connection that stayed up for a while starts over with a short backoff
+            if time.monotonic() - started > RECONNECT_MAX_SECONDS:
+                delay = 1
+            await asyncio.sleep(delay + random.uniform(0, delay))
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+
+_managers: Dict[str, SubscriptionManager] = {}
+
+
+def get_manager(url: str) -> SubscriptionManager:
+    """Get (or create) the manager of an endpoint: subscriptions for ws(s)://, filter polling for http(s)://"""
+    if url not in _managers:
+        if url.startswith(("http://", "https://")):
+            # Lazy import to avoid circular dependency
+            from services.polling import PollingManager
+            _managers[url] = PollingManager(url)
+        else:
+            _managers[url] = SubscriptionManager(url)
+    return _managers[url]
+
+
+def get_managers() -> List[SubscriptionManager]:
+    return list(_managers.values())
@@ -12,6 +12,7 @@ from schemas.swap import (
 from models import SwapHistory, TokenBalance
 from services.networks import evm as evm_service
 from services.networks.evm import _get_w3, NETWORK_CONFIGS, ERC20_ABI
+from services import pending_index, confirmation, block_tracker
 from web3 import Web3
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -104,6 +105,21 @@ def is_token_available_on_chain(token: str, chain: str) -> bool:
     return get_token_info(token, chain) is not None
 
 
+def get_swap_chain(to_token_network: str) -> str:
+    """
+    Get the destination chain of a swap from its stored to_token_network.
+    Cross-chain swaps are stored as "token:chain", same-chain swaps as "token".
+    """
+    to_token_network = to_token_network.lower()
+    if ":" in to_token_network:
+        _, chain = to_token_network.split(":", 1)
+        return chain
+    token_configs = TOKEN_CONFIG.get(to_token_network.upper(), {})
+    if token_configs:
+        return list(token_configs.keys())[0]
+    return "ethereum"  # Default fallback
+
+
 def get_swap_rate(from_token: str, to_token: str) -> float:
     """
     Get swap rate between two tokens.
@@ -479,6 +495,7 @@ def execute_swap(req: SwapExecuteRequest, db: Session) -> SwapExecuteResponse:
         db.add(swap_history)
         db.commit()
         db.refresh(swap_history)
+        pending_index.add_pending_hash(get_swap_chain(to_token_network), tx_hash_str)
         
         # Return chain of the destination token for cross-chain swaps
         return_chain = to_chain if is_cross_chain else req.chain
@@ -518,54 +535,28 @@ def get_swap_status(tx_hash: str, db: Session) -> SwapStatusResponse:
                 detail="Transaction not found"
             )
         
-        # Get transaction details from blockchain if pending
-        block_number = None
-        confirmations = None
-        actual_to_amount = None
-        completed_at = None
+        chain = get_swap_chain(swap.to_token_network)
         
-        if swap.status == "pending":
-            # Try to get transaction receipt
+        # Not seen on chain yet: look for its receipt once (staged via the confirmation engine)
+        if swap.status == "pending" and chain in NETWORK_CONFIGS:
             try:
-                # Parse chain from token network (format: "token:chain" or "token")
-                to_token_network = swap.to_token_network.lower()
-                if ":" in to_token_network:
-                    # Cross-chain swap format: "token:chain"
-                    _, chain = to_token_network.split(":", 1)
-                else:
-                    # Same-chain swap: extract chain from TOKEN_CONFIG
-                    token_symbol = to_token_network.upper()
-                    token_configs = TOKEN_CONFIG.get(token_symbol, {})
-                    if token_configs:
-                        chain = list(token_configs.keys())[0]
-                    else:
-                        chain = "ethereum"  # Default fallback
-                
-                if chain in NETWORK_CONFIGS:
-                    w3 = _get_w3(chain)
-                    receipt = w3.eth.get_transaction_receipt(tx_hash)
-                    
-                    if receipt:
-                        block_number = receipt.blockNumber
-                        current_block = w3.eth.block_number
-                        confirmations = max(0, current_block - block_number)
-                        
-                        # Update status based on receipt
-                        if receipt.status == 1:
-                            swap.status = "success"
-                            actual_to_amount = swap.to_amount  # Could calculate from logs
-                            completed_at = datetime.utcnow().isoformat() + "Z"
-                        else:
-                            swap.status = "failed"
-                            completed_at = datetime.utcnow().isoformat() + "Z"
-                        
-                        db.commit()
+                w3 = _get_w3(chain)
+                confirmation.resolve_pending(db, w3, chain, [tx_hash])
+                db.refresh(swap)
             except Exception as e:
+                db.rollback()
                 logger.warning(f"Could not fetch transaction receipt: {str(e)}")
         
+        # Confirmations are computed in memory from the tracked chain head
+        block_number = swap.block_number
+        confirmations = block_tracker.get_confirmations(chain, block_number) if chain in NETWORK_CONFIGS else None
+        actual_to_amount = None
+        completed_at = swap.confirmed_at.isoformat() + "Z" if swap.confirmed_at else None
+        
         if swap.status == "success":
-            actual_to_amount = swap.to_amount
-            completed_at = swap.created_at.isoformat() + "Z" if swap.created_at else None
+            actual_to_amount = swap.actual_to_amount if swap.actual_to_amount is not None else swap.to_amount
+            if not completed_at:
+                completed_at = swap.created_at.isoformat() + "Z" if swap.created_at else None
         
         # Parse token and chain from token_network
         to_token_network = swap.to_token_network.lower()
@@ -0,0 +1,227 @@
+"""
+Token transfer detector - ERC20 Transfer events of monitored addresses via eth_getLogs.
+
+Instead of fetching every receipt of a block to find token deposits, the Transfer
+logs are requested directly, for a whole block range at a time:
+
+- topic0 = Transfer and topic2 (recipient) in the monitored addresses (with sharded
+  workers, those of this worker's shard), in chunks of TRANSFER_LOGS_TOPIC_CHUNK
+  addresses per filter; or
+- topic0 = Transfer emitted by our tracked token contracts (TOKEN_CONFIG), when the
+  watch list is too large to send (or is only held as a Bloom filter). The
+  recipients are then matched locally.
+
+Providers cap the size of an eth_getLogs result. When a range is rejected as too
+large it is split in half and retried, and the smaller span is remembered for
+the chain so the following queries start from it.
+
+Logs come back in the same plain-dict shape as services.confirmation receipt logs,
+so process_block_transactions takes them unchanged.
+
+Before querying a single block, its logsBloom (in the header) is tested against the
+Transfer topic and the filtered recipients or contracts (logs_may_match): a block
+the bloom rules out can't contain a log we would fetch, so no query is made.
+"""
+from services import address_index, sharding
+from services.block_tracker import normalize_hex
+from services.confirmation import TRANSFER_EVENT_TOPIC, _to_int
+from eth_utils import keccak
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Recipient addresses per topic2 filter
+TRANSFER_LOGS_TOPIC_CHUNK = int(os.getenv("TRANSFER_LOGS_TOPIC_CHUNK", "1000"))
+# Above this many monitored addresses, filter on the token contracts instead
+TRANSFER_LOGS_MAX_TOPIC_ADDRESSES = int(os.getenv("TRANSFER_LOGS_MAX_TOPIC_ADDRESSES", "10000"))
+# Largest block span of one eth_getLogs request
+TRANSFER_LOGS_MAX_BLOCKS = int(os.getenv("TRANSFER_LOGS_MAX_BLOCKS", "2000"))
+
+# Error messages providers use for results (or ranges) that are too large
+_TOO_LARGE_MESSAGES = [
+    "query returned more than", "response size", "too many", "exceed",
+    "range is too large", "block range", "timeout", "timed out",
+]
+
+# Block span that last went through, per chain
+_block_span: Dict[str, int] = {}
+
+
+def address_topic(key: bytes) -> str:
+    """Indexed address topic (32 bytes, left-padded) of a 20-byte address key"""
+    return "0x" + key.rjust(32, b"\x00").hex()
+
+
+def tracked_token_contracts(chain: str) -> List[str]:
+    """Token contract addresses configured for a chain (or its siblings)"""
+    # Lazy imports to avoid circular dependency
+    from services.swap import TOKEN_CONFIG
+    from services.pending_index import sibling_chains
+    chains = sibling_chains(chain)
+    return sorted({
+        info["token_address"].lower()
+        for networks in TOKEN_CONFIG.values()
+        for name, info in networks.items()
+        if name in chains and info.get("token_address")
+    })
+
+
+def transfer_log_filters(chain: str, recipients: Optional[Iterable] = None) -> List[Dict[str, Any]]:
+    """
+    eth_getLogs filters (without block range) covering the Transfer logs to detect.
+
+    Args:
+        chain: Chain name
+        recipients: Only these recipient addresses (default: the monitored addresses
+                    of this worker's shard)
+
+    Returns:
+        Filter params; empty when there is nothing to look for
+    """
+    if recipients is not None:
+        keys = {key for key in (address_index.address_key(r) for r in recipients) if key is not None}
+    elif not address_index.has_addresses(chain):
+        return []
+    else:
+        keys = address_index.monitored_keys(chain)
+        if keys is not None:
+            keys = sharding.owned_keys(keys)
+            if not keys:
+                return []
+    if keys is None or len(keys) > TRANSFER_LOGS_MAX_TOPIC_ADDRESSES:
+        contracts = tracked_token_contracts(chain)
+        return [{"address": contracts, "topics": [TRANSFER_EVENT_TOPIC]}] if contracts else []
+    topics = sorted(address_topic(key) for key in keys)
+    return [
+        {"topics": [TRANSFER_EVENT_TOPIC, None, topics[i:i + TRANSFER_LOGS_TOPIC_CHUNK]]}
+        for i in range(0, len(topics), TRANSFER_LOGS_TOPIC_CHUNK)
+    ]
+
+
+@lru_cache(maxsize=65536)
+def _bloom_bits(value: bytes) -> Tuple[Tuple[int, int], ...]:
+    """(byte index, mask) of the 3 bits a log address or topic sets in a 2048-bit logsBloom"""
+    digest = keccak(value)
+    bits = [((digest[i] << 8) | digest[i + 1]) & 2047 for i in (0, 2, 4)]
+    return tuple((255 - bit // 8, 1 << (bit % 8)) for bit in bits)
+
+
+def _in_bloom(bloom: bytes, value: str) -> bool:
+    return all(bloom[index] & mask for index, mask in _bloom_bits(bytes.fromhex(value[2:])))
+
+
+def logs_may_match(chain: str, logs_bloom) -> bool:
+    """
+    Whether a block with this logsBloom may hold a Transfer log to monitored addresses.
+    False means it certainly doesn't; True may be a bloom false positive.
+    """
+    if not logs_bloom:
+        return True
+    bloom = bytes(logs_bloom) if isinstance(logs_bloom, (bytes, bytearray)) else bytes.fromhex(normalize_hex(logs_bloom)[2:])
+    if len(bloom) != 256:
+        return True
+    if not _in_bloom(bloom, TRANSFER_EVENT_TOPIC):
+        return False
+    for params in transfer_log_filters(chain):
+        candidates = params["address"] if "address" in params else params["topics"][2]
+        if any(_in_bloom(bloom, candidate) for candidate in candidates):
+            return True
+    return False
+
+
+def _is_result_too_large(error: Exception) -> bool:
+    """Check whether an eth_getLogs error asks for a smaller range"""
+    message = str(error).lower()
+    return "-32005" in message or any(keyword in message for keyword in _TOO_LARGE_MESSAGES)
+
+
+def _block_ranges(chain: str, from_block: int, to_block: int) -> List[Tuple[int, int]]:
+    """Inclusive ranges of at most the chain's current span, last range first (used as a stack)"""
+    span = _block_span.get(chain, TRANSFER_LOGS_MAX_BLOCKS)
+    ranges = [(start, min(start + span - 1, to_block)) for start in range(from_block, to_block + 1, span)]
+    return ranges[::-1]
+
+
+def _split_range(chain: str, start: int, end: int, error: Exception) -> List[Tuple[int, int]]:
+    """Halve a rejected range (raising if it is a single block or the error is unrelated)"""
+    if start == end or not _is_result_too_large(error):
+        raise error
+    middle = (start + end) // 2
+    _block_span[chain] = min(_block_span.get(chain, TRANSFER_LOGS_MAX_BLOCKS), middle - start + 1)
+    logger.info(f"eth_getLogs range {start}-{end} too large on {chain}, splitting")
+    return [(middle + 1, end), (start, middle)]
+
+
+def decode_transfer_logs(logs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Plain-dict ERC20 Transfer logs out of raw eth_getLogs results, deduplicated and in chain order"""
+    normalized = {}
+    for log in logs:
+        topics = [normalize_hex(topic) for topic in log.get("topics", [])]
+        # ERC721 Transfer has the same signature with an indexed token id (4 topics)
+        if log.get("removed") or len(topics) != 3 or topics[0] != TRANSFER_EVENT_TOPIC:
+            continue
+        entry = {
+            "address": normalize_hex(log.get("address")),
+            "topics": topics,
+            "data": normalize_hex(log.get("data")) or "0x",
+            "logIndex": _to_int(log.get("logIndex")),
+            "transactionHash": normalize_hex(log.get("transactionHash")),
+            "blockNumber": _to_int(log.get("blockNumber")),
+            "blockHash": normalize_hex(log.get("blockHash")),
+        }
+        normalized[(entry["blockHash"], entry["logIndex"])] = entry
+    return sorted(normalized.values(), key=lambda log: (log["blockNumber"] or 0, log["logIndex"] or 0))
+
+
+def get_transfer_logs(w3, chain: str, from_block: int, to_block: int, recipients: Optional[Iterable] = None) -> List[Dict[str, Any]]:
+    """
+    Transfer logs to monitored addresses (or `recipients`) in blocks [from_block, to_block].
+
+    Args:
+        w3: Web3 instance (HTTP provider)
+        chain: Chain name
+        from_block: First block
+        to_block: Last block (inclusive)
+        recipients: Only these recipient addresses (default: the monitored addresses)
+
+    Returns:
+        Normalized Transfer logs
+    """
+    logs = []
+    for params in transfer_log_filters(chain, recipients):
+        ranges = _block_ranges(chain, from_block, to_block)
+        while ranges:
+            start, end = ranges.pop()
+            try:
+                logs.extend(w3.eth.get_logs({**params, "fromBlock": start, "toBlock": end}))
+            except Exception as e:
+                ranges += _split_range(chain, start, end, e)
+    return decode_transfer_logs(logs)
+
+
+async def async_get_transfer_logs(w3, chain: str, from_block: int, to_block: int, recipients: Optional[Iterable] = None) -> List[Dict[str, Any]]:
+    """Async variant of get_transfer_logs for AsyncWeb3 providers"""
+    logs = []
+    for params in transfer_log_filters(chain, recipients):
+        ranges = _block_ranges(chain, from_block, to_block)
+        while ranges:
+            start, end = ranges.pop()
+            try:
+                logs.extend(await w3.eth.get_logs({**params, "fromBlock": start, "toBlock": end}))
+            except Exception as e:
+                ranges += _split_range(chain, start, end, e)
+    return decode_transfer_logs(logs)
+
+
+async def async_get_block_transfer_logs(w3, chain: str, block_hash: str) -> List[Dict[str, Any]]:
+    """
+    Raw Transfer logs to monitored addresses in one block, by hash (so a reorg
+    can't mix in logs of another block). Decode them with decode_transfer_logs.
+    """
+    logs = []
+    for params in transfer_log_filters(chain):
+        logs.extend(await w3.eth.get_logs({**params, "blockHash": block_hash}))
+    return logs
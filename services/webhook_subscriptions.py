@@ -0,0 +1,271 @@
+"""
+Partner webhook subscriptions - events fanned out to every matching subscriber.
+
+A subscription is an endpoint with a signing secret and optional filters: the
+addresses it follows (webhook_subscription_addresses; none = every address), chains
+and event types. Routing uses an in-memory index of address -> subscription ids,
+rebuilt from the tables when they change (checked every
+WEBHOOK_SUBSCRIPTIONS_REFRESH_SECONDS, from the dispatcher's thread), so matching an
+event is a few set lookups.
+
+Each delivery is signed: X-Webhook-Signature is "t=<unix time>,v1=<hex HMAC-SHA256 of
+'<t>.<body>' with the secret>". A subscriber gets at most its max_concurrency
+(WEBHOOK_SUBSCRIBER_CONCURRENCY) requests at a time; a delivery that waits longer than
+WEBHOOK_SUBSCRIBER_WAIT_SECONDS for a slot fails and is retried later by the outbox,
+so a slow partner's backlog doesn't hold the dispatcher's slots from the others.
+Every subscriber is its own channel ("webhook:<id>") for the outbox, so only the
+subscribers that failed are retried.
+"""
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from models import WebhookSubscription, WebhookSubscriptionAddress
+from services import http_client
+from services.address_index import normalize_address
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+import asyncio
+import hashlib
+import hmac
+import json
+import threading
+import time
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_SUBSCRIBER_CONCURRENCY = int(os.getenv("WEBHOOK_SUBSCRIBER_CONCURRENCY", "4"))
+WEBHOOK_SUBSCRIBER_WAIT_SECONDS = float(os.getenv("WEBHOOK_SUBSCRIBER_WAIT_SECONDS", "5"))
+WEBHOOK_SUBSCRIPTIONS_REFRESH_SECONDS = float(os.getenv("WEBHOOK_SUBSCRIPTIONS_REFRESH_SECONDS", "30"))
+
+
+class Subscription(NamedTuple):
+    id: int
+    url: str
+    secret: str
+    chains: Optional[FrozenSet[str]]       # None: every chain
+    event_types: Optional[FrozenSet[str]]  # None: every event
+    max_concurrency: int
+
+    @property
+    def channel(self) -> str:
+        return f"webhook:{self.id}"
+
+
+class _Index(NamedTuple):
+    subscriptions: Dict[int, Subscription]
+    by_address: Dict[str, FrozenSet[int]]
+    any_address: FrozenSet[int]
+    version: Tuple[Any, int]  # (latest updated_at, subscription rows) it was built from
+
+
+_index = _Index({}, {}, frozenset(), (None, 0))
+_checked_at = 0.0
+_refresh_lock = threading.Lock()
+
+
+def _split(value: Optional[str]) -> Optional[FrozenSet[str]]:
+    if value is None:
+        return None
+    return frozenset(item.strip() for item in value.split(",") if item.strip())
+
+
+def _version(db: Session) -> Tuple[Any, int]:
+    latest, count = db.query(func.max(WebhookSubscription.updated_at), func.count(WebhookSubscription.id)).one()
+    return latest, count
+
+
+def rebuild(db: Session) -> int:
+    """Rebuild the address -> subscribers index from the tables; returns the active subscriptions"""
+    global _index
+    version = _version(db)
+    subscriptions = {
+        row.id: Subscription(
+            id=row.id,
+            url=row.url,
+            secret=row.secret or "",
+            chains=_split(row.chains),
+            event_types=_split(row.event_types),
+            max_concurrency=row.max_concurrency or WEBHOOK_SUBSCRIBER_CONCURRENCY,
+        )
+        for row in db.query(WebhookSubscription).filter(WebhookSubscription.active.is_(True))
+    }
+    by_address: Dict[str, Set[int]] = {}
+    followed: Set[int] = set()
+    if subscriptions:
+        for subscription_id, address in db.query(
+            WebhookSubscriptionAddress.subscription_id, WebhookSubscriptionAddress.address
+        ).filter(WebhookSubscriptionAddress.subscription_id.in_(list(subscriptions))):
+            by_address.setdefault(address, set()).add(subscription_id)
+            followed.add(subscription_id)
+    _index = _Index(
+        subscriptions,
+        {address: frozenset(ids) for address, ids in by_address.items()},
+        frozenset(set(subscriptions) - followed),
+        version,
+    )
+    return len(subscriptions)
+
+
+def refresh_if_stale(db: Session) -> None:
+    """Rebuild the index if the subscriptions changed (checked at most every WEBHOOK_SUBSCRIPTIONS_REFRESH_SECONDS)"""
+    global _checked_at
+    if time.monotonic() - _checked_at < WEBHOOK_SUBSCRIPTIONS_REFRESH_SECONDS:
+        return
+    with _refresh_lock:
+        if time.monotonic() - _checked_at < WEBHOOK_SUBSCRIPTIONS_REFRESH_SECONDS:
+            return
+        if _version(db) != _index.version:
+            count = rebuild(db)
+            logger.info(f"Webhook subscription index rebuilt: {count} subscription(s)")
+        _checked_at = time.monotonic()
+
+
+def invalidate() -> None:
+    """Check for changes on the next refresh_if_stale (after a change made here)"""
+    global _checked_at
+    _checked_at = 0.0
+
+
+def match(event_type: str, chain: Optional[str], addresses: Iterable[Optional[str]]) -> List[Subscription]:
+    """Subscriptions that want an event about these addresses on this chain"""
+    index = _index
+    ids = set(index.any_address)
+    for address in addresses:
+        if address:
+            ids |= index.by_address.get(normalize_address(address), frozenset())
+    matched = []
+    for subscription_id in sorted(ids):
+        subscription = index.subscriptions[subscription_id]
+        if subscription.event_types is not None and event_type not in subscription.event_types:
+            continue
+        if subscription.chains is not None and chain not in subscription.chains:
+            continue
+        matched.append(subscription)
+    return matched
+
+
+def _join(values: Optional[Iterable[str]]) -> Optional[str]:
+    return ",".join(values) if values is not None else None
+
+
+def save_subscription(
+    db: Session,
+    subscription: Optional[WebhookSubscription],
+    name: str,
+    url: str,
+    secret: str,
+    addresses: Optional[List[str]] = None,
+    chains: Optional[List[str]] = None,
+    event_types: Optional[List[str]] = None,
+    max_concurrency: Optional[int] = None,
+) -> WebhookSubscription:
+    """Create a subscription (subscription=None) or replace one's settings and addresses"""
+    if subscription is None:
+        subscription = WebhookSubscription(active=True)
+        db.add(subscription)
+    subscription.name = name
+    subscription.url = url
+    subscription.secret = secret
+    subscription.chains = _join(chains)
+    subscription.event_types = _join(event_types)
+    subscription.max_concurrency = max_concurrency
+    subscription.updated_at = datetime.utcnow()
+    db.flush()
+    db.query(WebhookSubscriptionAddress).filter(WebhookSubscriptionAddress.subscription_id == subscription.id).delete()
+    db.add_all([
+        WebhookSubscriptionAddress(subscription_id=subscription.id, address=address)
+        for address in sorted({normalize_address(address) for address in addresses or []})
+    ])
+    db.commit()
+    db.refresh(subscription)
+    invalidate()
+    return subscription
+
+
+def remove_subscription(db: Session, subscription: WebhookSubscription) -> None:
+    """Stop delivering to a subscription (soft, so every instance's index drops it)"""
+    subscription.active = False
+    subscription.updated_at = datetime.utcnow()
+    db.commit()
+    invalidate()
+
+
+def get_subscription(db: Session, subscription_id: int) -> Optional[WebhookSubscription]:
+    return db.query(WebhookSubscription).filter(
+        WebhookSubscription.id == subscription_id, WebhookSubscription.active.is_(True)
+    ).first()
+
+
+def list_subscriptions(db: Session) -> List[WebhookSubscription]:
+    return db.query(WebhookSubscription).filter(WebhookSubscription.active.is_(True)).order_by(WebhookSubscription.id).all()
+
+
+def subscription_addresses(db: Session, subscription_id: int) -> List[str]:
+    return [address for (address,) in db.query(WebhookSubscriptionAddress.address).filter(
+        WebhookSubscriptionAddress.subscription_id == subscription_id
+    ).order_by(WebhookSubscriptionAddress.address)]
+
+
+def sign(secret: str, body: str, timestamp: Optional[int] = None) -> str:
+    """X-Webhook-Signature value for a body"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+_limits: Dict[Tuple[asyncio.AbstractEventLoop, int, int], asyncio.Semaphore] = {}
+_stats: Dict[int, Dict[str, int]] = {}
+
+
+def _limit(subscription: Subscription) -> asyncio.Semaphore:
+    key = (asyncio.get_running_loop(), subscription.id, subscription.max_concurrency)
+    if key not in _limits:
+        _limits[key] = asyncio.Semaphore(subscription.max_concurrency)
+    return _limits[key]
+
+
+async def deliver(subscription: Subscription, payload: Dict[str, Any]) -> Tuple[bool, Optional[float]]:
+    """
+    POST a signed event to a subscriber.
+
+    Returns:
+        (delivered, the subscriber's Retry-After in seconds if it sent one)
+    """
+    stats = _stats.setdefault(subscription.id, {"delivered": 0, "failed": 0, "deferred": 0})
+    limit = _limit(subscription)
+    try:
+        await asyncio.wait_for(limit.acquire(), timeout=WEBHOOK_SUBSCRIBER_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        stats["deferred"] += 1
+        logger.warning(f"Webhook subscriber {subscription.id} has {subscription.max_concurrency} request(s) in flight, deferring")
+        return False, None
+    try:
+        body = json.dumps(payload, separators=(",", ":"))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Subscription": str(subscription.id),
+            "X-Webhook-Signature": sign(subscription.secret, body),
+        }
+        response = await http_client.post_body(subscription.url, body.encode(), headers)
+    except Exception as e:
+        stats["failed"] += 1
+        logger.error(f"Error sending webhook to subscriber {subscription.id}: {str(e)}")
+        return False, None
+    finally:
+        limit.release()
+    if not 200 <= response.status < 300:
+        stats["failed"] += 1
+        logger.error(f"Webhook to subscriber {subscription.id} failed: {response.status} - {response.text}")
+        return False, http_client.retry_after_seconds(response.headers)
+    stats["delivered"] += 1
+    return True, None
+
+
+def get_metrics() -> Dict[str, Any]:
+    """Subscriptions in the index and per-subscriber delivery counts"""
+    return {
+        "subscriptions": len(_index.subscriptions),
+        "addresses": len(_index.by_address),
+        "subscribers": {str(subscription_id): dict(stats) for subscription_id, stats in _stats.items()},
+    }
@@ -0,0 +1,54 @@
+"""
+Checks for the Bloom filter used by the monitored address index in "bloom" mode:
+no false negatives, and a false-positive rate close to the one it was sized for.
+Pure in-memory, no database or RPC.
+
+    python test_address_filter.py
+"""
+import random
+
+from services.address_filter import BloomFilter
+
+
+def random_keys(count: int, seed: int):
+    rng = random.Random(seed)
+    return [rng.randbytes(20) for _ in range(count)]
+
+
+def test_no_false_negatives():
+    keys = random_keys(20_000, seed=1)
+    bloom = BloomFilter(capacity=len(keys), false_positive_rate=0.001)
+    bloom.update(keys)
+    assert len(bloom) == len(keys)
+    assert all(key in bloom for key in keys)
+
+
+def test_false_positive_rate_near_configured():
+    members = random_keys(20_000, seed=2)
+    others = set(random_keys(200_000, seed=3)) - set(members)
+    for rate in (0.01, 0.001):
+        bloom = BloomFilter(capacity=len(members), false_positive_rate=rate)
+        bloom.update(members)
+        observed = sum(key in bloom for key in others) / len(others)
+        # Sampling noise aside, a filter at capacity stays close to its target rate
+        assert observed < rate * 1.5, f"false-positive rate {observed:.5f} for a target of {rate}"
+
+
+def test_empty_filter_matches_nothing():
+    bloom = BloomFilter(capacity=1_000)
+    assert not any(key in bloom for key in random_keys(1_000, seed=4))
+
+
+def test_full_past_capacity():
+    bloom = BloomFilter(capacity=100)
+    bloom.update(random_keys(100, seed=5))
+    assert not bloom.full
+    bloom.add(random_keys(1, seed=6)[0])
+    assert bloom.full
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"OK: {name}")
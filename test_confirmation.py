@@ -0,0 +1,201 @@
+"""
+Checks for the confirmation engine: reorg detection in the block ring, and pending
+rows going pending -> included -> success, back to pending when their block is
+forked out, then re-confirmed on the new chain.
+
+The BlockRing checks need nothing else. The others run against the configured
+database (DB_* / INSTANCE_CONNECTION_NAME) with synthetic rows (tx hashes prefixed
+0xc0f1) on a test network registered for the run, so confirming and rolling back
+never touches real chains' rows; the rows are deleted afterwards. Notifications are
+disabled for the run.
+
+    python test_confirmation.py
+"""
+import os
+
+os.environ["ENABLE_NOTIFICATIONS"] = "false"
+
+from services.block_tracker import BlockRing
+
+CHAIN = "confirmation-test"
+CHAIN_ID = 0xc0f1
+BASE = 1_000
+RECIPIENT = "0x00000000000000000000000000000000000000c1"
+TX_HASH = "0xc0f1" + "00" * 29 + "01"
+SWAP_HASH = "0xc0f1" + "00" * 29 + "02"
+DEPOSIT_HASH = "0xc0f1" + "00" * 29 + "03"
+
+
+def block_hash(number: int, fork: str = "a") -> str:
+    """Synthetic hash of a block on fork "a" or "b\""""
+    return "0x" + (fork * 8) + f"{number:056x}"
+
+
+def receipt(tx_hash: str, number: int, fork: str = "a", status: int = 1):
+    return {
+        "transactionHash": tx_hash,
+        "blockNumber": number,
+        "blockHash": block_hash(number, fork),
+        "from": RECIPIENT,
+        "to": RECIPIENT,
+        "status": status,
+        "gasUsed": 21000,
+        "effectiveGasPrice": 10 ** 9,
+        "logs": [],
+    }
+
+
+def test_block_ring_detects_replaced_height():
+    ring = BlockRing(size=16)
+    for number in range(100, 105):
+        assert ring.observe(number, block_hash(number), block_hash(number - 1)) is None
+    # Block 103 replaced by a block of another fork
+    assert ring.observe(103, block_hash(103, "b"), block_hash(102)) == 103
+    assert ring.hash_at(103) == block_hash(103, "b")
+    assert ring.hash_at(104) is None
+    assert ring.head == 103
+
+
+def test_block_ring_detects_parent_mismatch():
+    ring = BlockRing(size=16)
+    for number in range(100, 105):
+        ring.observe(number, block_hash(number), block_hash(number - 1))
+    # A new head whose parent isn't the block we have at 104
+    assert ring.observe(105, block_hash(105, "b"), block_hash(104, "b")) == 104
+    assert ring.hash_at(104) == block_hash(104, "b")
+    assert ring.hash_at(103) == block_hash(103)
+
+
+def test_block_ring_is_bounded():
+    ring = BlockRing(size=8)
+    for number in range(100, 120):
+        ring.observe(number, block_hash(number), block_hash(number - 1))
+    assert ring.hash_at(111) is None
+    assert ring.hash_at(112) == block_hash(112)
+    assert ring.head == 119
+
+
+def _register_chain():
+    """A network of its own, with its own block ring and rows"""
+    from services.networks.evm import NETWORK_CONFIGS
+    NETWORK_CONFIGS.setdefault(CHAIN, {"https_rpc_url": "", "wss_url": "", "chainId": CHAIN_ID, "token_address": ""})
+
+
+def _cleanup(db):
+    from models import SwapHistory, TxHistory
+    db.query(TxHistory).filter(TxHistory.tx_hash.like("0xc0f1%")).delete(synchronize_session=False)
+    db.query(SwapHistory).filter(SwapHistory.tx_hash.like("0xc0f1%")).delete(synchronize_session=False)
+    db.commit()
+
+
+def _observe(start: int, end: int, fork: str = "a", parent_fork: str = None):
+    """Feed blocks [start, end] of a fork to the chain's ring; returns the first reorg reported"""
+    from services import block_tracker
+    reorg_from = None
+    for number in range(start, end + 1):
+        parent = block_hash(number - 1, parent_fork if number == start and parent_fork else fork)
+        found = block_tracker.observe_block(CHAIN, number, block_hash(number, fork), parent)
+        reorg_from = reorg_from if reorg_from is not None else found
+    return reorg_from
+
+
+def test_fork_rolls_back_and_reconfirms():
+    from database import SessionLocal
+    from models import SwapHistory, TxHistory
+    from services import block_tracker, confirmation, pending_index
+
+    _register_chain()
+    depth = block_tracker.CONFIRMATION_DEPTH
+    db = SessionLocal()
+    try:
+        _cleanup(db)
+        db.add(TxHistory(tx_hash=TX_HASH, status="pending", chain=CHAIN, to_address=RECIPIENT, amount=1.0, token_symbol="ETH"))
+        db.add(SwapHistory(tx_hash=SWAP_HASH, status="pending", address=RECIPIENT,
+                           from_token_network="eth", to_token_network=f"inso:{CHAIN}", to_amount=2.0))
+        db.commit()
+
+        # Both mined in block BASE of fork a
+        _observe(BASE - 2, BASE)
+        resolved = confirmation.apply_receipts(db, CHAIN, [receipt(TX_HASH, BASE), receipt(SWAP_HASH, BASE)])
+        expected = "success" if depth <= 1 else "included"
+        assert resolved[expected] == 2
+        tx = db.query(TxHistory).filter(TxHistory.tx_hash == TX_HASH).one()
+        swap = db.query(SwapHistory).filter(SwapHistory.tx_hash == SWAP_HASH).one()
+        assert (tx.status, tx.block_hash, tx.gas_used, tx.received_amount) == (expected, block_hash(BASE), 21000, 1.0)
+        assert (swap.status, swap.actual_to_amount) == (expected, 2.0)
+        if depth <= 1:
+            return
+
+        # Not deep enough yet
+        _observe(BASE + 1, BASE + depth - 2)
+        assert confirmation.advance_confirmations(db, CHAIN, BASE + depth - 2)["confirmed"] == 0
+
+        # Fork b replaces block BASE: both rows go back to pending, receipt data dropped
+        reorg_from = _observe(BASE, BASE + 1, fork="b", parent_fork="a")
+        assert reorg_from == BASE
+        assert confirmation.rollback_reorged(db, CHAIN, reorg_from) == 2
+        db.expire_all()
+        for row in (db.query(TxHistory).filter(TxHistory.tx_hash == TX_HASH).one(),
+                    db.query(SwapHistory).filter(SwapHistory.tx_hash == SWAP_HASH).one()):
+            assert row.status == "pending"
+            assert (row.block_number, row.block_hash, row.gas_used, row.effective_gas_price) == (None, None, None, None)
+        assert tx.received_amount is None and swap.actual_to_amount is None
+        assert pending_index.match_pending_hashes(CHAIN, [TX_HASH, SWAP_HASH]) == {TX_HASH, SWAP_HASH}
+
+        # Mined again on fork b, then confirmed once deep enough
+        confirmation.apply_receipts(db, CHAIN, [receipt(TX_HASH, BASE + 1, "b"), receipt(SWAP_HASH, BASE + 1, "b")])
+        _observe(BASE + 2, BASE + depth, fork="b")
+        assert confirmation.advance_confirmations(db, CHAIN, BASE + depth) == {"confirmed": 2, "rolled_back": 0}
+        db.expire_all()
+        tx = db.query(TxHistory).filter(TxHistory.tx_hash == TX_HASH).one()
+        assert (tx.status, tx.block_hash, tx.confirmed_at is not None) == ("success", block_hash(BASE + 1, "b"), True)
+        assert db.query(SwapHistory).filter(SwapHistory.tx_hash == SWAP_HASH).one().status == "success"
+    finally:
+        _cleanup(db)
+        db.close()
+
+
+def test_deposit_on_orphaned_block_goes_back_to_pending():
+    from database import SessionLocal
+    from models import TxHistory
+    from services import block_tracker, confirmation
+    from services.receiving import record_incoming_transfers
+
+    _register_chain()
+    depth = block_tracker.CONFIRMATION_DEPTH
+    db = SessionLocal()
+    try:
+        _cleanup(db)
+        number = BASE + 1000
+        recorded = record_incoming_transfers(db, CHAIN, [{
+            "tx_hash": DEPOSIT_HASH,
+            "from_address": RECIPIENT,
+            "to_address": RECIPIENT,
+            "value": 10 ** 18,
+            "block_number": number,
+            "block_hash": block_hash(number, "b"),
+            "token_address": None,
+        }])
+        if depth <= 1:
+            assert recorded[0].status == "success"
+            return
+        assert recorded[0].status == "included"
+
+        # The canonical chain has fork a's block at that height
+        result = confirmation.advance_confirmations(
+            db, CHAIN, number + depth, get_block_hash=lambda height: block_hash(height, "a")
+        )
+        assert result == {"confirmed": 0, "rolled_back": 1}
+        db.expire_all()
+        deposit = db.query(TxHistory).filter(TxHistory.tx_hash == DEPOSIT_HASH).one()
+        assert (deposit.status, deposit.block_number, deposit.confirmed_at) == ("pending", None, None)
+    finally:
+        _cleanup(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"OK: {name}")
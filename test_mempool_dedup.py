@@ -0,0 +1,85 @@
+"""
+Check that a native deposit first seen in the mempool ends up as one TxHistory row
+once its block is processed.
+
+The mempool watcher records its sighting under the hash as pending_index normalizes
+it (0x-prefixed), while the block's transaction carries a HexBytes hash, whose
+.hex() has no 0x. Block detection must complete the "incoming" row in place rather
+than insert a second row (and send a second notification).
+
+Runs against the configured database (DB_* / INSTANCE_CONNECTION_NAME) with a
+synthetic monitored address and tx hash (prefixed 0xde0d), both deleted afterwards.
+Notifications are disabled for the run.
+
+    python test_mempool_dedup.py
+"""
+import os
+
+os.environ["ENABLE_NOTIFICATIONS"] = "false"
+
+from hexbytes import HexBytes
+
+from database import SessionLocal
+from models import MonitoredAddress, TxHistory
+from services import address_index, block_tracker
+from services.pending_index import _normalize_hash
+from services.receiving import add_monitored_address, process_block_transactions, record_pending_transfers
+
+TX_HASH = "0xde0d" + "00" * 29 + "01"
+BLOCK_HASH = "0xde0d" + "00" * 29 + "b1"
+RECIPIENT = "0x00000000000000000000000000000000000000D1"
+SENDER = "0x00000000000000000000000000000000000000B1"
+CHAIN = "sepolia"
+
+
+def cleanup(db):
+    db.query(TxHistory).filter(TxHistory.tx_hash.like("0xde0d%")).delete(synchronize_session=False)
+    db.query(MonitoredAddress).filter(MonitoredAddress.address == address_index.normalize_address(RECIPIENT)).delete(synchronize_session=False)
+    db.commit()
+    address_index.refresh(db)
+
+
+def test_mempool_sighting_completed_by_block():
+    db = SessionLocal()
+    try:
+        cleanup(db)
+        add_monitored_address(db, RECIPIENT, CHAIN)
+
+        # What PendingWatcher records for a pending transaction to the address
+        sighted = record_pending_transfers(db, CHAIN, [{
+            "tx_hash": _normalize_hash(HexBytes(TX_HASH)),
+            "from_address": SENDER,
+            "to_address": RECIPIENT,
+            "value": 10 ** 18,
+            "token_address": None,
+        }])
+        assert [row.status for row in sighted] == ["incoming"]
+
+        # The same transaction in a block, as web3 returns it
+        detected = process_block_transactions(db, [{
+            "hash": HexBytes(TX_HASH),
+            "from": SENDER,
+            "to": RECIPIENT,
+            "value": 10 ** 18,
+            "blockNumber": 1_000_000,
+            "blockHash": HexBytes(BLOCK_HASH),
+        }], CHAIN)
+        assert detected == 1
+
+        db.expire_all()
+        rows = db.query(TxHistory).filter(TxHistory.tx_hash.like("0xde0d%")).all()
+        assert len(rows) == 1, f"expected one row, found {[row.tx_hash for row in rows]}"
+        assert rows[0].tx_hash == TX_HASH
+        # Completed with the block's data; final once CONFIRMATION_DEPTH blocks deep
+        assert rows[0].status == ("success" if block_tracker.CONFIRMATION_DEPTH <= 1 else "included")
+        assert rows[0].block_number == 1_000_000
+        assert rows[0].block_hash == BLOCK_HASH
+        assert rows[0].seen_pending_at is not None
+    finally:
+        cleanup(db)
+        db.close()
+
+
+if __name__ == "__main__":
+    test_mempool_sighting_completed_by_block()
+    print("OK: mempool sighting completed by block detection, one row")
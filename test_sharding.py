@@ -0,0 +1,88 @@
+"""
+Checks for the consistent hash ring that shards monitored addresses across ingestion
+workers: ownership is deterministic, shares are balanced, and a worker joining or
+leaving only moves about its own share of the addresses. In-memory only (importing
+services.sharding loads the models, so the DB_* settings must be importable).
+
+    python test_sharding.py
+"""
+import random
+
+from services import sharding
+from services.sharding import HashRing
+
+WORKERS = [f"worker-{i}" for i in range(4)]
+
+
+def random_keys(count: int, seed: int):
+    rng = random.Random(seed)
+    return [rng.randbytes(20) for _ in range(count)]
+
+
+KEYS = random_keys(20_000, seed=7)
+
+
+def test_ownership_is_deterministic():
+    ring = HashRing(WORKERS)
+    # Same membership in another order (or with duplicates): same owners
+    other = HashRing(list(reversed(WORKERS)) + WORKERS[:1])
+    assert other.workers == ring.workers
+    assert all(ring.owner(key) == other.owner(key) for key in KEYS)
+    assert all(ring.owner(key) in WORKERS for key in KEYS)
+
+
+def test_empty_ring_owns_nothing():
+    assert HashRing([]).owner(KEYS[0]) is None
+
+
+def test_shares_are_balanced():
+    for count in (2, 4, 8):
+        workers = [f"worker-{i}" for i in range(count)]
+        ring = HashRing(workers)
+        shares = {worker: 0 for worker in workers}
+        for key in KEYS:
+            shares[ring.owner(key)] += 1
+        fair = len(KEYS) / count
+        assert all(0.7 * fair < share < 1.3 * fair for share in shares.values()), shares
+
+
+def test_join_moves_only_the_new_workers_share():
+    before = HashRing(WORKERS)
+    after = HashRing(WORKERS + ["worker-new"])
+    moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+    # Every moved key goes to the new worker, about 1/5 of them
+    assert all(after.owner(key) == "worker-new" for key in moved)
+    assert len(moved) < 1.5 * len(KEYS) / len(after.workers)
+
+
+def test_leave_moves_only_the_departed_workers_keys():
+    before = HashRing(WORKERS)
+    after = HashRing(WORKERS[1:])
+    moved = [key for key in KEYS if before.owner(key) != after.owner(key)]
+    assert all(before.owner(key) == WORKERS[0] for key in moved)
+    assert len(moved) == sum(before.owner(key) == WORKERS[0] for key in KEYS)
+
+
+def test_owned_keys_partition_the_addresses():
+    saved = (sharding.SHARDING_ENABLED, sharding.WORKER_ID, sharding._ring, sharding._owned_cache)
+    try:
+        sharding.SHARDING_ENABLED = True
+        sharding._ring = HashRing(WORKERS)
+        keys = set(KEYS)
+        owned = {}
+        for worker in WORKERS:
+            sharding.WORKER_ID = worker
+            owned[worker] = sharding.owned_keys(keys)
+            # Cached result for the same ring and keys
+            assert sharding.owned_keys(keys) == owned[worker]
+        assert set().union(*owned.values()) == keys
+        assert sum(len(shard) for shard in owned.values()) == len(keys)
+    finally:
+        sharding.SHARDING_ENABLED, sharding.WORKER_ID, sharding._ring, sharding._owned_cache = saved
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"OK: {name}")
@@ -0,0 +1,190 @@
+"""
+Chain ingestion worker - runs the background work outside the API process.
+
+    python -m worker
+
+Runs on one asyncio loop:
+- the block watchers, one resilient WebSocket per endpoint (see services/subscriptions.py)
+- the mempool watchers of the chains in PENDING_WATCH_CHAINS (see services/mempool.py)
+- the notification outbox dispatcher (see services/outbox.py)
+- receipt reconciliation (update_transaction_status), the pending index resync,
+  the restart of stalled address check jobs and the expiry of mempool sightings,
+  in a thread executor so blocking RPC/DB calls don't stall the watchers
+- with SHARD_WORKERS=true, the lease heartbeat that keeps this worker in the
+  address shard ring (see services/sharding.py)
+- a small health server on $PORT (/health, /ready, /metrics)
+
+The API and the worker share state only through the database. Deploy the API
+with RUN_BACKGROUND_JOBS=false so status polling isn't done twice.
+"""
+from aiohttp import web
+from sqlalchemy import text
+from dotenv import load_dotenv
+import asyncio
+import signal
+import time
+import os
+import logging
+
+load_dotenv()
+
+from database import engine, SessionLocal
+from services.networks import evm as evm_service
+from services.networks.evm import NETWORK_CONFIGS
+from services import pending_index, pipeline, backfill, sharding, mempool, outbox, contacts, webhook_subscriptions
+from services.scheduler import leader
+
+logger = logging.getLogger("worker")
+
+STATUS_UPDATE_PERIOD_SECONDS = int(os.getenv("TRANSACTION_STATUS_UPDATE_PERIOD_SECONDS", "30"))
+STATUS_UPDATE_BUDGET_SECONDS = float(os.getenv("TRANSACTION_STATUS_UPDATE_BUDGET_SECONDS", str(STATUS_UPDATE_PERIOD_SECONDS * 0.8)))
+WORKER_PORT = int(os.getenv("PORT", "8081"))
+
+
+def _watched_chains():
+    """Chains to watch: WATCH_CHAINS (comma separated) or every configured network"""
+    names = [name.strip() for name in os.getenv("WATCH_CHAINS", ",".join(NETWORK_CONFIGS)).split(",") if name.strip()]
+    unknown = [name for name in names if name not in NETWORK_CONFIGS]
+    if unknown:
+        logger.warning(f"Unknown chain(s) in WATCH_CHAINS: {', '.join(unknown)}")
+    return [name for name in names if name in NETWORK_CONFIGS]
+
+
+def _reconcile():
+    """
+    One reconciliation run (blocking; executed in a worker thread).
+    The API registers new pending txs in its own memory only, so the worker's
+    pending index is refreshed from the database on every run.
+    """
+    pending_index.resync_pending_hashes()
+    if not leader.is_leader():
+        return
+    evm_service.update_transaction_status(deadline=time.monotonic() + STATUS_UPDATE_BUDGET_SECONDS)
+    backfill.resume_stale_jobs()
+    if mempool.PENDING_WATCH_CHAINS:
+        mempool.expire_sightings()
+
+
+async def run_reconciliation():
+    """Periodically resolve pending rows the watchers haven't seen (e.g. while disconnected)"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        try:
+            await loop.run_in_executor(None, _reconcile)
+        except Exception as e:
+            logger.error(f"Reconciliation run failed: {str(e)}")
+        await asyncio.sleep(max(0, STATUS_UPDATE_PERIOD_SECONDS - (loop.time() - started)))
+
+
+async def run_shard_heartbeat():
+    """Renew this worker's shard lease and follow workers joining or leaving"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(sharding.SHARD_HEARTBEAT_SECONDS)
+        try:
+            await loop.run_in_executor(None, sharding.heartbeat)
+        except Exception as e:
+            logger.error(f"Shard heartbeat failed: {str(e)}")
+
+
+async def health(request):
+    return web.json_response({"status": "healthy", "service": "wallet-worker"})
+
+
+async def metrics(request):
+    """Per-stage queue depth, throughput and latency of the block pipelines"""
+    data = {"pipelines": pipeline.get_metrics(), "pending_index": pending_index.pending_count()}
+    if mempool.PENDING_WATCH_CHAINS:
+        data["mempool"] = mempool.get_metrics()
+    try:
+        data["outbox"] = await asyncio.get_running_loop().run_in_executor(None, _outbox_counts)
+    except Exception as e:
+        data["outbox"] = {"error": str(e)}
+    data["contact_cache"] = contacts.cache_stats()
+    data["webhook_subscriptions"] = webhook_subscriptions.get_metrics()
+    if sharding.SHARDING_ENABLED:
+        data["shard"] = {
+            "worker_id": sharding.WORKER_ID,
+            "workers": sharding.ring_workers(),
+            "coordinator": sharding.is_coordinator(),
+        }
+    return web.json_response(data)
+
+
+async def ready(request):
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _check_database)
+        return web.json_response({"status": "ready", "database": "connected"})
+    except Exception as e:
+        return web.json_response(
+            {"status": "not ready", "database": "disconnected", "error": str(e)},
+            status=503
+        )
+
+
+def _outbox_counts():
+    db = SessionLocal()
+    try:
+        return outbox.outbox_counts(db)
+    finally:
+        db.close()
+
+
+def _check_database():
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def create_health_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/health", health)
+    app.router.add_get("/ready", ready)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_get("/_ah/warmup", health)
+    return app
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows
+
+    runner = web.AppRunner(create_health_app())
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", WORKER_PORT).start()
+    logger.info(f"Worker health server listening on port {WORKER_PORT}")
+
+    try:
+        await loop.run_in_executor(None, pending_index.load_pending_hashes)
+    except Exception as e:
+        logger.error(f"Failed to load pending tx index: {str(e)}")
+
+    tasks = [asyncio.create_task(run_reconciliation()), asyncio.create_task(outbox.run_dispatcher())]
+    if sharding.SHARDING_ENABLED:
+        # Join the shard ring before the first block, so this worker never claims every address
+        try:
+            await loop.run_in_executor(None, sharding.heartbeat)
+        except Exception as e:
+            logger.error(f"Failed to join the shard ring: {str(e)}")
+        tasks.append(asyncio.create_task(run_shard_heartbeat()))
+
+    # One subscription manager per distinct WebSocket endpoint
+    tasks += evm_service.watch_blocks(_watched_chains())
+
+    await stop.wait()
+    logger.info("Shutting down worker")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await runner.cleanup()
+    leader.release()
+    sharding.release()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())